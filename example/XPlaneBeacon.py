@@ -0,0 +1,150 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+#
+# Tracking of the beacon (BECN) of X-Plane.
+#
+# X-Plane sends a beacon about once per second to the multicast group 239.255.1.1, port 49707.
+# The receivers hand every beacon they receive to beacon_tracker.update(): dg in dispatch() (XPlaneUdpDatagram.py)
+# and dr in GetValues() and FindIp() (XPlaneDatarefRx.py). So the tracker runs along with the reception, it never waits.
+#
+# The tracker keeps the last X-Plane seen: IP-address, port, hostname, version and role, and the time of its last beacon.
+# update() tells the caller what changed:
+#   BECN_SAME:    the same X-Plane, beacons did not stop
+#   BECN_NEW:     the first beacon (also if X-Plane was loaded from the NVM: the requests sent at the start
+#                 may have been lost if X-Plane was not running yet), or X-Plane at another IP-address or port
+#   BECN_RESTART: the same IP-address and port, but another version, or the beacons came back after a gap
+#                 of more than stale_t seconds (X-Plane has been restarted)
+# Then the caller sends its requests (DSEL, RPOS, RREF) again.
+#
+# With the setting BEACON_CACHE="1" the IP-address and port are kept in the NVM (microcontroller.nvm).
+# At the next start they are loaded, so the requests can be sent at once, without waiting for a beacon.
+# The NVM is only written when its contents change.
+#
+# NVM record (little endian), at offset NVM_OFS: struct "<4sIHiB" (15 bytes):
+#   4s: b"XPB1"
+#   I:  IPv4 address of X-Plane, e.g. 192.168.1.96 = 0xC0A80160
+#   H:  port X-Plane is listening on
+#   i:  X-Plane version, e.g. 120100
+#   B:  role (1 = master)
+#
+#type:ignore
+from common import *
+from XPlaneCapture import ip_to_int, int_to_ip
+import time
+import sys
+try:
+    import microcontroller
+except ImportError:
+    microcontroller = None
+
+BECN_SAME = 0
+BECN_NEW = 1
+BECN_RESTART = 2
+
+NVM_MAGIC = b"XPB1"
+NVM_OFS = 0
+nvm_rec = Struct("<4sIHiB")
+
+class BeaconTracker:
+    def __init__(self, use_nvm, stale_t=5):
+        TAG = tag_adjust("BeaconTracker(): ")
+        self.becn_struct = Struct("<BBiiIH")
+        self.stale_t = stale_t  # seconds without beacon: X-Plane is gone (or restarting)
+        self.use_nvm = use_nvm and microcontroller is not None
+        self.ip = None          # None = no X-Plane known
+        self.port = 0
+        self.hostname = ''
+        self.version = 0
+        self.role = 0
+        self.last_t = 0         # time.monotonic() of the last beacon. 0 = loaded from NVM, no beacon yet
+        self.becn_cnt = 0
+        self.change_cnt = 0
+        self.from_nvm = False
+        if self.use_nvm:
+            self.load()
+            if self.from_nvm:
+                print(TAG+f"last X-Plane (from NVM): {self.ip}, port {self.port}, version {self.version}", file=sys.stderr)
+
+    # Handle the beacon in buf (size bytes) received from sender. Returns BECN_SAME, BECN_NEW or BECN_RESTART,
+    # or -1 if it is not a beacon of an X-Plane master
+    def update(self, buf, size, sender):
+        TAG = tag_adjust("BeaconTracker.update(): ")
+        if size < 5 + self.becn_struct.size:
+            return -1
+        # struct becn_struct
+        # {
+        # 	uchar beacon_major_version;		// 1 at the time of X-Plane 10.40
+        # 	uchar beacon_minor_version;		// 1 at the time of X-Plane 10.40, 2 at the time of X-Plane 11
+        # 	xint application_host_id;		// 1 for X-Plane, 2 for PlaneMaker
+        # 	xint version_number;			// 104014 for X-Plane 10.40b14 - 113201 for X-Plane 11.32
+        # 	uint role;				        // 1 for master, 2 for extern visual, 3 for IOS
+        # 	ushort port;				    // port number X-Plane is listening on
+        # 	xchr	computer_name[strDIM];  // the hostname of the computer
+        # };
+        major, minor, host_id, version, role, port = self.becn_struct.unpack_from(buf, 5)
+        if host_id != 1 or role != 1:  # 1 = X-Plane (not PlaneMaker), 1 = master
+            return -1
+        curr_t = time.monotonic()
+        self.becn_cnt += 1
+        if sender[0] == self.ip and port == self.port and not self.from_nvm:
+            gap = curr_t - self.last_t > self.stale_t
+            self.last_t = curr_t
+            if version == self.version and not gap:
+                return BECN_SAME
+            change = BECN_RESTART
+        else:
+            self.last_t = curr_t
+            change = BECN_NEW
+        self.from_nvm = False
+        self.ip = sender[0]
+        self.port = port
+        self.version = version
+        self.role = role
+        start = 5 + self.becn_struct.size
+        end = start
+        while end < size and buf[end] != 0:  # the hostname ends with a NULL
+            end += 1
+        self.hostname = bytes(buf[start:end]).decode()
+        self.change_cnt += 1
+        print(TAG+"X-Plane {} at {}, port {}, host \'{}\' ({})".format(version, self.ip, port, self.hostname,
+              "new" if change == BECN_NEW else "restarted"), file=sys.stderr)
+        if self.use_nvm:
+            self.save()
+        return change
+
+    # Returns the (IP-address, port) of X-Plane, or None if no X-Plane is known
+    def dest(self):
+        if self.ip is None:
+            return None
+        return (self.ip, self.port)
+
+    def load(self):
+        TAG = tag_adjust("BeaconTracker.load(): ")
+        try:
+            magic, ip_int, port, version, role = nvm_rec.unpack_from(bytes(microcontroller.nvm[NVM_OFS:NVM_OFS + nvm_rec.size]), 0)
+        except (OSError, ValueError) as e:
+            print(TAG+f"Error: {e}", file=sys.stderr)
+            return False
+        if magic != NVM_MAGIC or port == 0:
+            return False
+        self.ip = int_to_ip(ip_int)
+        self.port = port
+        self.version = version
+        self.role = role
+        self.from_nvm = True
+        return True
+
+    def save(self):
+        TAG = tag_adjust("BeaconTracker.save(): ")
+        rec = bytearray(nvm_rec.size)
+        nvm_rec.pack_into(rec, 0, NVM_MAGIC, ip_to_int(self.ip), self.port, self.version, self.role)
+        try:
+            if bytes(microcontroller.nvm[NVM_OFS:NVM_OFS + nvm_rec.size]) != bytes(rec):
+                microcontroller.nvm[NVM_OFS:NVM_OFS + nvm_rec.size] = rec  # written only when changed (flash wear)
+        except (OSError, ValueError) as e:
+            print(TAG+f"Error: {e}", file=sys.stderr)
+
+beacon_tracker = BeaconTracker(myState.beacon_cache)
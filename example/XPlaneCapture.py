@@ -0,0 +1,247 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+#
+# Capture and replay of the UDP datagrams received from X-Plane.
+#
+# Capture (setting CAPTURE_FILE="/capture.xpc"):
+# dg.GetUDPDatagram() (XPlaneUdpDatagram.py) and dr.GetValues() (XPlaneDatarefRx.py) append each datagram
+# received to the capture file. The records are collected in a buffer in RAM and written in blocks,
+# so the flash (or the disk of the host) is not written for every packet.
+# Note: on the device the CIRCUITPY drive is read-only for code.py, unless boot.py remounts it
+# with: storage.remount("/", readonly=False). Then it is read-only for the computer connected via USB.
+# If the file cannot be written, the capture is switched off with a message.
+#
+# Replay (setting REPLAY_FILE="/capture.xpc"):
+# The socket of dg and dr is replaced by a ReplaySource. It has the socket methods used in this project
+# (recvfrom_into(), recvfrom(), settimeout(), ...) and returns the datagrams of the capture file, in the
+# original tempo (REPLAY_SPEED="1"), N times faster (REPLAY_SPEED="N") or as fast as possible (REPLAY_SPEED="0").
+# So the datagrams go through the same decode and display path as live ones.
+# At the end of the file the ReplaySource behaves like a socket that does not receive anything anymore:
+# OSError errno 116 (ETIMEDOUT), or errno 11 (EAGAIN) when non-blocking.
+#
+# File format (little endian):
+#   file header: 8 bytes: b"XPCAP" + 0x00 + version (1) + 0x00
+#   records:     16 bytes record header: struct "<QIHH":
+#                  Q: time.monotonic_ns() at reception
+#                  I: IPv4 address of the sender, e.g. 192.168.1.96 = 0xC0A80160
+#                  H: port of the sender
+#                  H: length of the datagram
+#                followed by the datagram (length bytes)
+#
+#type:ignore
+from common import *
+import time
+import sys
+
+CAPTURE_MAGIC = b"XPCAP\x00\x01\x00"
+rec_hdr = Struct("<QIHH")
+
+def ip_to_int(s):
+    p = s.split(".")
+    return (int(p[0]) << 24) | (int(p[1]) << 16) | (int(p[2]) << 8) | int(p[3])
+
+def int_to_ip(n):
+    return "{}.{}.{}.{}".format((n >> 24) & 0xFF, (n >> 16) & 0xFF, (n >> 8) & 0xFF, n & 0xFF)
+
+class CaptureWriter:
+    def __init__(self, fn, buf_size=4096):
+        TAG = tag_adjust("CaptureWriter(): ")
+        self.fn = fn
+        self.buf = bytearray(buf_size)
+        self.pos = 0
+        self.rec_cnt = 0
+        self.byte_cnt = 0
+        self.ip_str = None  # the IP-address of the last sender, as string and as int,
+        self.ip_int = 0     # so the string is converted only when the sender changes
+        try:
+            self.f = open(fn, "wb")
+            self.f.write(CAPTURE_MAGIC)
+            print(TAG+f"capturing datagrams to: \'{fn}\'", file=sys.stderr)
+        except OSError as e:
+            self.f = None
+            print(TAG+f"cannot write \'{fn}\': {e}. Capture switched off. Read-only filesystem? See: boot.py", file=sys.stderr)
+
+    def write(self, packet, size, sender):
+        if self.f is None:
+            return
+        t_ns = time.monotonic_ns()
+        if sender[0] != self.ip_str:
+            self.ip_str = sender[0]
+            self.ip_int = ip_to_int(sender[0])
+        n = rec_hdr.size + size
+        if self.pos + n > len(self.buf):
+            self.flush()
+        try:
+            if n > len(self.buf):
+                # larger than the buffer: write it directly
+                hdr = bytearray(rec_hdr.size)
+                rec_hdr.pack_into(hdr, 0, t_ns, self.ip_int, sender[1], size)
+                self.f.write(hdr)
+                self.f.write(memoryview(packet)[:size])
+            else:
+                rec_hdr.pack_into(self.buf, self.pos, t_ns, self.ip_int, sender[1], size)
+                self.pos += rec_hdr.size
+                self.buf[self.pos:self.pos + size] = memoryview(packet)[:size]
+                self.pos += size
+        except OSError as e:
+            self.fail(e)
+            return
+        self.rec_cnt += 1
+        self.byte_cnt += n
+
+    def flush(self):
+        if self.f is None or self.pos == 0:
+            return
+        try:
+            self.f.write(memoryview(self.buf)[:self.pos])
+        except OSError as e:
+            self.fail(e)
+        self.pos = 0
+
+    def fail(self, e):
+        TAG = tag_adjust("CaptureWriter.fail(): ")
+        print(TAG+f"writing \'{self.fn}\' failed: {e}. Capture switched off", file=sys.stderr)
+        try:
+            self.f.close()
+        except OSError:
+            pass
+        self.f = None
+
+    def close(self):
+        TAG = tag_adjust("CaptureWriter.close(): ")
+        if self.f is None:
+            return
+        self.flush()
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+        print(TAG+f"{self.rec_cnt} datagrams, {self.byte_cnt} bytes written to \'{self.fn}\'", file=sys.stderr)
+
+class ReplaySource:
+    def __init__(self, fn, speed=1.0):
+        TAG = tag_adjust("ReplaySource(): ")
+        self.fn = fn
+        self.speed = speed  # 0 = as fast as possible
+        self.timeout = None
+        self.hdr = bytearray(rec_hdr.size)
+        self.f = open(fn, "rb")
+        magic = self.f.read(len(CAPTURE_MAGIC))
+        if magic != CAPTURE_MAGIC:
+            self.f.close()
+            raise ValueError(f"\'{fn}\' is not a capture file")
+        self.rec_cnt = 0
+        self.t0_rec = None  # timestamp of the first record
+        self.t0 = 0         # time.monotonic_ns() when the first record was replayed
+        self.ip_int = None
+        self.sender = None
+        self.eof = False
+        self.read_hdr()
+        print(TAG+f"replaying \'{fn}\', speed: {'max' if speed <= 0 else speed}", file=sys.stderr)
+
+    def read_hdr(self):
+        if self.f.readinto(self.hdr) < rec_hdr.size:
+            self.eof = True
+            return
+        self.rec_t_ns, ip_int, self.rec_port, self.rec_size = rec_hdr.unpack_from(self.hdr, 0)
+        if ip_int != self.ip_int:
+            self.ip_int = ip_int
+            self.ip_str = int_to_ip(ip_int)
+        if self.t0_rec is None:
+            self.t0_rec = self.rec_t_ns
+            self.t0 = time.monotonic_ns()
+
+    # Wait until the next record is due. Raises OSError like a socket when there is nothing to receive
+    def wait(self):
+        if self.eof:
+            raise OSError(11, "EAGAIN") if self.timeout == 0 else OSError(116, "ETIMEDOUT")
+        if self.speed <= 0:
+            return
+        due_t = self.t0 + int((self.rec_t_ns - self.t0_rec) / self.speed)
+        wait_ns = due_t - time.monotonic_ns()
+        if wait_ns <= 0:
+            return
+        if self.timeout == 0:
+            raise OSError(11, "EAGAIN")
+        if self.timeout is not None and wait_ns > self.timeout * 1000000000:
+            time.sleep(self.timeout)
+            raise OSError(116, "ETIMEDOUT")
+        time.sleep(wait_ns / 1000000000)
+
+    def recvfrom_into(self, buf, bufsize=0):
+        self.wait()
+        size = self.rec_size
+        n = len(buf) if bufsize == 0 else min(bufsize, len(buf))
+        if size <= n:
+            self.f.readinto(memoryview(buf)[:size])
+        else:
+            self.f.readinto(memoryview(buf)[:n])  # truncated, like a socket
+            self.f.read(size - n)
+            size = n
+        if self.sender is None or self.sender[0] != self.ip_str or self.sender[1] != self.rec_port:
+            self.sender = (self.ip_str, self.rec_port)
+        self.rec_cnt += 1
+        self.read_hdr()
+        return size, self.sender
+
+    def recv_into(self, buf, bufsize=0):
+        return self.recvfrom_into(buf, bufsize)[0]
+
+    def recvfrom(self, bufsize):
+        buf = bytearray(bufsize)
+        size, sender = self.recvfrom_into(buf)
+        return bytes(buf[:size]), sender
+
+    def settimeout(self, value):
+        self.timeout = value
+
+    def setblocking(self, flag):
+        self.timeout = None if flag else 0
+
+    def bind(self, address):
+        pass
+
+    def connect(self, address):
+        pass
+
+    def sendto(self, buf, address):
+        return len(buf)  # requests (e.g. RREF) are not sent anywhere during a replay
+
+    # The socket of dg is closed and opened again for every pass of the main loop if PERSISTENT_RX="0".
+    # So close() keeps the file open and the replay continues where it was. See: close_capture()
+    def close(self):
+        pass
+
+    def release(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+capture_writer = None
+replay_sources = {}
+
+# Returns the CaptureWriter (shared by dg and dr), or None if CAPTURE_FILE is not set
+def get_capture_writer():
+    global capture_writer
+    if capture_writer is None and myState.capture_file:
+        capture_writer = CaptureWriter(myState.capture_file)
+    return capture_writer
+
+# Returns the ReplaySource for the receiver with this name (e.g. "dg", "dr"), or None if REPLAY_FILE is not set
+def get_replay_source(name):
+    if not myState.replay_file:
+        return None
+    if name not in replay_sources:
+        replay_sources[name] = ReplaySource(myState.replay_file, myState.replay_speed)
+    return replay_sources[name]
+
+# Called at the end of main(): write the rest of the capture buffer and close the files
+def close_capture():
+    global capture_writer
+    if capture_writer is not None:
+        capture_writer.close()
+        capture_writer = None
+    for name in replay_sources:
+        replay_sources[name].release()
@@ -42,9 +42,13 @@
 #
 #type:ignore
 from common import *
+from XPlaneCapture import get_capture_writer, get_replay_source
+from XPlaneBeacon import beacon_tracker, BECN_SAME
 import struct
 import sys
 import binascii
+import array
+import time
 #import socketpool
 
 # Class downloaded from Charlylima
@@ -55,6 +59,52 @@ class XPlaneIpNotFound(Exception):
 class XPlaneTimeout(Exception):
   args="XPlane timeout."
 
+# Class created by Paulsk
+# A view on the value table of dr, with the dataref as key. Like a (read-only) dict, but nothing is copied:
+# view["sim/flightmodel/position/latitude"] reads the value from dr.rref_values.
+# Only datarefs that are subscribed and for which a value has been received are in the view.
+class DatarefValues:
+    def __init__(self, rx):
+        self.rx = rx
+
+    def __getitem__(self, dataref):
+        idx = self.rx.dataref_idxs[dataref]
+        if not self.rx.rref_seen[idx]:
+            raise KeyError(dataref)
+        return self.rx.rref_values[idx]
+
+    def get(self, dataref, default=None):
+        idx = self.rx.dataref_idxs.get(dataref)
+        if idx is None or not self.rx.rref_seen[idx]:
+            return default
+        return self.rx.rref_values[idx]
+
+    def __contains__(self, dataref):
+        idx = self.rx.dataref_idxs.get(dataref)
+        return idx is not None and self.rx.rref_seen[idx] == 1
+
+    def items(self):
+        rx = self.rx
+        for dataref, idx in rx.dataref_idxs.items():
+            if rx.rref_seen[idx]:
+                yield dataref, rx.rref_values[idx]
+
+    def keys(self):
+        for dataref, _ in self.items():
+            yield dataref
+
+    def __iter__(self):
+        return self.keys()
+
+    def __len__(self):
+        n = 0
+        for idx in self.rx.datarefs:
+            n += self.rx.rref_seen[idx]
+        return n
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
 # Class created by Paulsk, content almost all by Charlylima
 class XPlaneDatarefRx():
 
@@ -62,9 +112,12 @@ class XPlaneDatarefRx():
         TAG = tag_adjust("dr.__init__(): ")
         self.my_DataRef_sock = None
 
-        # list of requested datarefs with index number
-        self.datarefidx = 0
-        self.datarefs = {} # key = idx, value = dataref
+        # Registry of the subscribed datarefs, with a lookup in both directions (no list searches):
+        self.datarefidx = 0      # next new index
+        self.datarefs = {}       # key = idx, value = dataref
+        self.dataref_idxs = {}   # key = dataref, value = idx
+        self.dataref_freqs = {}  # key = idx, value = frequency (packets/sec)
+        self.free_idxs = []      # indexes of unsubscribed datarefs, reused by the next subscriptions
         self.values = {}
         self.headerlen = 4
         self.packet_length = 191
@@ -89,14 +142,71 @@ class XPlaneDatarefRx():
 
         # values from xplane
         self.BeaconData = {}
-        self.xplaneValues = {}
+        # The RREF replies are received in rx_buf and the values are written in place in the table rref_values,
+        # at the index of the dataref. rref_seen[idx] is 1 when a value for that index has been received.
+        # The tables grow (only) when a new index is taken in AddDataRef(). Nothing is allocated per packet.
+        self.rx_buf_len = 1024
+        self.rx_buf = bytearray(self.rx_buf_len)
+        self.rref_pair = Struct("<if")  # index, value
+        self.rref_values = array.array("f")
+        self.rref_seen = bytearray()
+        self.rref_pkt_cnt = 0
+        self.xplaneValues = DatarefValues(self)  # the values with the dataref as key. See: GetValues()
+        # With a receiver (dg.attach_dr(dr)) the socket of the receiver is used: the RREF requests are sent from it
+        # and the receiver dispatches the RREF replies to rref_unpack(). Then dr opens no socket of its own.
+        self.rx = None
+        self.datarefs_wanted = myState.datarefs  # setting DATAREFS, subscribed by Subscribe()
+        self.subscribed = False
+        # Resubscription (see: resub_tick()). X-Plane forgets the RREF subscriptions when it is restarted or loads another aircraft.
+        # If no RREF reply arrived for gap_t seconds, all subscriptions are sent again in one burst, from the encoded
+        # requests in rref_frames (key = idx, value = the 413 bytes request). If still nothing arrives, the next burst
+        # waits twice as long as the previous one, up to resub_max_t seconds.
+        self.rref_frames = {}
+        self.rref_last_t = 0.0  # time.monotonic() of the last RREF reply, or of the last subscription sent
+        self.gap_t = None       # None = to be computed from the frequencies (the registry changed)
+        self.resub_min_t = 0.25
+        self.resub_max_t = 8.0
+        self.resub_wait_t = self.resub_min_t
+        self.resub_next_t = 0.0
+        self.resub_cnt = 0
+        # Encoded requests, one per dataref, made once by make_frame(). Only the numbers are patched (pack_into) before sending:
+        # RREF: "RREF\0" + int freq + int idx + char[400] dataref (413 bytes); the frequency and index at offset 5.
+        # DREF: "DREF\0" + float value + char[500] dataref (509 bytes); the value at offset 5. See: SetDataRef()
+        self.rref_req = Struct("<ii")
+        self.dref_val = Struct("<f")
+        self.dataref_frames = {}  # key = dataref, value = RREF request. Dropped after the unsubscription has been sent
+        self.dref_frames = {}     # key = dataref, value = DREF message. At most frames_max, then one is dropped
+        self.frames_max = 16
+        # Writer (see: WriteDataRef(), SendCommand() and write_tick()). The writes wait in dref_pending (key = dataref, value = the value)
+        # and the commands in cmnd_queue. Writes to the same dataref within write_window_t seconds are combined: only the last
+        # value is sent. write_tick() sends at most write_rate messages per second (token bucket, see: write_tokens).
+        self.write_rate = myState.write_rate
+        self.write_window_t = myState.write_window_t
+        self.write_burst = max(1, self.write_rate // 10)  # max nr of messages sent at once
+        self.write_tokens = self.write_burst
+        self.write_last_t = 0.0
+        self.dref_pending = {}
+        self.dref_pending_t = {}  # key = dataref, value = time.monotonic() of the first write not sent yet
+        self.write_due = []
+        self.cmnd_frames = {}     # key = command, value = CMND message: "CMND\0" + command. At most frames_max
+        self.cmnd_queue = []
+        self.cmnd_queue_max = 16
+        self.write_cnt = 0        # nr of DREF/CMND messages sent
+        self.coalesced_cnt = 0    # nr of writes replaced by a newer value before they were sent
+        self.cmnd_dropped_cnt = 0 # nr of commands not sent: the queue was full
         self.defaultFreq = 1
+        self.capture = get_capture_writer()  # None if CAPTURE_FILE is not set (see: XPlaneCapture.py)
 
     # Function created by Charlylima
     def __del__(self):
         TAG = tag_adjust("dr.__del__(): ")
-        for i in range(len(self.datarefs)):
-            self.AddDataRef(next(iter(self.datarefs.values())), freq=0)
+        try:
+            # No I/O here: GetDatarefSocket() would open and bind the closed socket of the receiver again.
+            # The datarefs are unsubscribed at the end of main() (code.py)
+            if self.rx is None or self.rx.my_DataGram_sock is not None:
+                self.RemoveDataRefs()  # unsubscribe all datarefs
+        except (OSError, AttributeError, KeyError) as e:
+            print(TAG+f"Error while unsubscribing: {e}", file=sys.stderr)
         # Next line additions by Paulsk for type-checking and thus avoiding an AttributeError
         t = type(self.my_DataRef_sock)
 
@@ -116,6 +226,17 @@ class XPlaneDatarefRx():
         # Open a UDP Socket to receive on Port 49000
         if not my_debug:
             print(TAG+'We are going to open a socket for Dataref request and answers', file=sys.stderr)
+        if self.rx is not None:
+            # The socket of the receiver (see: XPlaneUdpDatagram.attach_dr())
+            if self.rx.my_DataGram_sock is None:
+                self.rx.OpenUDPSocket(True)
+            self.my_DataRef_sock = self.rx.my_DataGram_sock
+            return
+        replay = get_replay_source("dr")
+        if replay is not None:
+            # REPLAY_FILE is set: receive the datagrams from the capture file instead of from X-Plane
+            self.my_DataRef_sock = replay
+            return
 
         print(TAG+'type(pool)= {}'.format(type(pool)), file=sys.stderr)
         if pool is None:
@@ -132,9 +253,17 @@ class XPlaneDatarefRx():
     # Function created by Paulsk
     def CloseDatarefSocket(self): # , socket):
         #self.my_DataRef_sock = socket
+        if self.rx is not None:
+            return  # the socket of the receiver. It is closed by the receiver
         self.my_DataRef_sock.close()
 
+    # Returns the socket to send the requests from. The socket of the receiver is opened again if it has been closed
+    # (PERSISTENT_RX="0": closed after each receive). None if it could not be opened
     def GetDatarefSocket(self):
+        if self.rx is not None:
+            if self.rx.my_DataGram_sock is None:
+                self.rx.OpenUDPSocket(True)
+            return self.rx.my_DataGram_sock
         return self.my_DataRef_sock
 
     # Function created by Charlylima
@@ -153,74 +282,297 @@ class XPlaneDatarefRx():
         if freq == None:
           freq = self.defaultFreq
 
-        if dataref in self.datarefs.values():
-          idx = list(self.datarefs.keys())[list(self.datarefs.values()).index(dataref)]
+        idx = self.dataref_idxs.get(dataref)
+        if idx is not None:
           if freq == 0:
-            if dataref in self.xplaneValues.keys():
-              del self.xplaneValues[dataref]
+            # Unsubscribe. The index is freed for the next subscription
             del self.datarefs[idx]
+            del self.dataref_idxs[dataref]
+            del self.dataref_freqs[idx]
+            self.rref_seen[idx] = 0
+            self.free_idxs.append(idx)
+          else:
+            self.dataref_freqs[idx] = freq  # another frequency
+        elif freq == 0:
+          return  # not subscribed: nothing to unsubscribe
         else:
-          idx = self.datarefidx
-          self.datarefs[self.datarefidx] = dataref
-          self.datarefidx += 1
-
-        cmd = b"RREF\x00"
-        string = dataref.encode()
-        message = struct.pack("<5sii400s", cmd, freq, idx, string)
-        assert(len(message)==413)
-        t = type(self.my_DataRef_sock)
+          # Reuse a freed index (the last one freed first). Otherwise take a new one.
+          # Note: X-Plane can still send a few values of the previous dataref with a reused index
+          if self.free_idxs:
+            idx = self.free_idxs.pop()
+          else:
+            idx = self.datarefidx
+            self.datarefidx += 1
+            self.rref_values.append(0.0)
+            self.rref_seen.append(0)
+          self.rref_seen[idx] = 0
+          self.datarefs[idx] = dataref
+          self.dataref_idxs[dataref] = idx
+          self.dataref_freqs[idx] = freq
+
+        self.gap_t = None
+        self.SendRref(dataref, freq, idx)
+
+    # Function created by Paulsk
+    # Returns a new message of size bytes: the 5 bytes header hdr, zeros, and at name_ofs the dataref (ending with a NULL)
+    def make_frame(self, hdr, size, name_ofs, dataref):
+        frame = bytearray(size)
+        frame[0:5] = hdr
+        name = dataref.encode()
+        n = min(len(name), size - name_ofs - 1)
+        frame[name_ofs:name_ofs + n] = name[:n]
+        return frame
+
+    # Send the RREF request for dataref, with index idx, to X-Plane. freq 0 ends the subscription.
+    # The request of a dataref is encoded only once (see: self.dataref_frames). Then only freq and idx are patched.
+    def SendRref(self, dataref, freq, idx):
+        TAG = tag_adjust("dr.SendRref: ")
+        message = self.dataref_frames.get(dataref)
+        if message is None:
+            message = self.make_frame(b"RREF\x00", 413, 13, dataref)
+            self.dataref_frames[dataref] = message
+        self.rref_req.pack_into(message, 5, freq, idx)
+        sock = self.GetDatarefSocket()
+        if sock is None:
+            print(TAG+f"No socket. Request for '{dataref}' not sent", file=sys.stderr)
+            return
         if my_debug:
             print(TAG+'We are going to sent a DataRef request to:', self.BeaconData["IP"], ', Port: {}'.format(self.UDP_PORT), file=sys.stderr)
-            print(TAG+'Message to send: {}, the cmd = {}'.format(message, binascii.hexlify(cmd)), file=sys.stderr)
-            print(TAG+'Type of the self.my_DataRef_sock = {}'.format(t), file=sys.stderr)
+            print(TAG+'Message to send: {}'.format(binascii.hexlify(message[:13])), file=sys.stderr)
+            print(TAG+'Type of the socket = {}'.format(type(sock)), file=sys.stderr)
 
-        self.my_DataRef_sock.sendto(message, (self.BeaconData["IP"], self.UDP_PORT))
+        sock.sendto(message, (self.BeaconData["IP"], self.UDP_PORT))
+        if freq > 0:
+            self.rref_frames[idx] = message  # kept for Resubscribe()
+            self.rref_last_t = time.monotonic()
+        else:
+            self.rref_frames.pop(idx, None)
+            self.dataref_frames.pop(dataref, None)  # unsubscribed: keep no 413 bytes per dataref no longer used
 
-    # Function created by Charlylima
+    # Function created by Paulsk
+    # Write value into dataref in X-Plane (DREF message). The message of a dataref is encoded only once
+    # (see: self.dref_frames). Then only the value is patched.
+    def SetDataRef(self, dataref, value):
+        TAG = tag_adjust("dr.SetDataRef: ")
+        message = self.dref_frames.get(dataref)
+        if message is None:
+            message = self.make_frame(b"DREF\x00", 509, 9, dataref)
+            if len(self.dref_frames) >= self.frames_max:
+                del self.dref_frames[next(iter(self.dref_frames))]  # the heap must not grow with each new dataref written
+            self.dref_frames[dataref] = message
+        self.dref_val.pack_into(message, 5, value)
+        if my_debug:
+            print(TAG+'{} = {}'.format(dataref, value), file=sys.stderr)
+        sock = self.GetDatarefSocket()
+        if sock is None:
+            print(TAG+f"No socket. '{dataref}' not written", file=sys.stderr)
+            return
+        sock.sendto(message, (self.BeaconData["IP"], self.UDP_PORT))
+
+    # Function created by Paulsk
+    # Write value into dataref in X-Plane, rate limited: the DREF message is sent by write_tick().
+    # A newer value for the same dataref within write_window_t seconds replaces the value waiting.
+    def WriteDataRef(self, dataref, value):
+        if dataref in self.dref_pending:
+            self.coalesced_cnt += 1
+        else:
+            self.dref_pending_t[dataref] = time.monotonic()
+        self.dref_pending[dataref] = value
+
+    # Function created by Paulsk
+    # Let X-Plane execute command once (e.g. "sim/autopilot/heading_up"), rate limited: the CMND message is sent by write_tick().
+    # Commands are not combined: every command is sent. Returns False if the queue is full
+    def SendCommand(self, command):
+        if len(self.cmnd_queue) >= self.cmnd_queue_max:
+            self.cmnd_dropped_cnt += 1
+            return False
+        message = self.cmnd_frames.get(command)
+        if message is None:
+            message = b"CMND\x00" + command.encode()
+            if len(self.cmnd_frames) >= self.frames_max:
+                del self.cmnd_frames[next(iter(self.cmnd_frames))]
+            self.cmnd_frames[command] = message
+        self.cmnd_queue.append(message)
+        return True
+
+    # Function created by Paulsk
+    # Called from the receive loop (see: XPlaneUdpDatagram.rx_poll(), GetUDPDatagram() and GetValues()). Does not wait.
+    # Sends the waiting commands, then the dataref writes older than write_window_t, as long as the rate allows it.
+    # Nothing is sent before X-Plane is known (BeaconData). Returns the nr of messages sent
+    def write_tick(self):
+        if (len(self.cmnd_queue) == 0 and len(self.dref_pending) == 0) or "IP" not in self.BeaconData:
+            return 0
+        curr_t = time.monotonic()
+        self.write_tokens = min(self.write_burst, self.write_tokens + (curr_t - self.write_last_t) * self.write_rate)
+        self.write_last_t = curr_t
+        sock = self.GetDatarefSocket()
+        if sock is None:
+            return 0  # the writes stay waiting
+        dest = (self.BeaconData["IP"], self.UDP_PORT)
+        n = 0
+        try:
+            while len(self.cmnd_queue) > 0 and self.write_tokens >= 1:
+                sock.sendto(self.cmnd_queue[0], dest)
+                self.cmnd_queue.pop(0)
+                self.write_tokens -= 1
+                n += 1
+            for dataref in self.dref_pending_t:
+                if self.write_tokens < 1:
+                    break
+                if curr_t - self.dref_pending_t[dataref] >= self.write_window_t:
+                    self.SetDataRef(dataref, self.dref_pending[dataref])
+                    self.write_due.append(dataref)
+                    self.write_tokens -= 1
+                    n += 1
+        except OSError as e:
+            print(tag_adjust("dr.write_tick: ")+f"Error: {e}", file=sys.stderr)
+        for dataref in self.write_due:
+            del self.dref_pending[dataref]
+            del self.dref_pending_t[dataref]
+        self.write_due.clear()
+        self.write_cnt += n
+        return n
+
+    # Function created by Paulsk
+    # Send all subscriptions again, in one burst, from the requests encoded by SendRref(). Returns False after a socket error
+    def Resubscribe(self):
+        TAG = tag_adjust("dr.Resubscribe: ")
+        sock = self.GetDatarefSocket()
+        if sock is None:
+            print(TAG+"No socket. Subscriptions not sent", file=sys.stderr)
+            return False
+        dest = (self.BeaconData["IP"], self.UDP_PORT)
+        n = 0
+        try:
+            for message in self.rref_frames.values():
+                sock.sendto(message, dest)
+                n += 1
+        except OSError as e:
+            print(TAG+f"Error after {n} of {len(self.rref_frames)} requests: {e}", file=sys.stderr)
+            return False
+        return True
+
+    # Function created by Paulsk
+    # Called from the receive loop (see: XPlaneUdpDatagram.rx_poll(), GetUDPDatagram() and GetValues()). Does not wait.
+    # If no RREF reply arrived for gap_t seconds (3 intervals of the fastest dataref, at least 0.5 s),
+    # all subscriptions are sent again. Then every next burst waits twice as long (0.25, 0.5, 1, ... 8 s) until a reply arrives.
+    # Returns True if the subscriptions were sent again
+    def resub_tick(self):
+        if len(self.rref_frames) == 0:
+            return False
+        curr_t = time.monotonic()
+        if self.gap_t is None:
+            self.gap_t = max(0.5, 3 / max(self.dataref_freqs.values()))
+        if curr_t - self.rref_last_t < self.gap_t or curr_t < self.resub_next_t:
+            return False
+        self.resub_cnt += 1
+        print(tag_adjust("dr.resub_tick: ")+"no RREF reply for {:.1f} s. Subscribing {} dataref(s) again (nr {})".format(
+              curr_t - self.rref_last_t, len(self.rref_frames), self.resub_cnt), file=sys.stderr)
+        self.Resubscribe()
+        self.resub_next_t = curr_t + self.resub_wait_t
+        self.resub_wait_t = min(self.resub_wait_t * 2, self.resub_max_t)
+        return True
+
+    # Function created by Paulsk
+    # Called by the receiver after the beacon of X-Plane (see: XPlaneUdpDatagram.handle_beacon()). dest = (IP-address, port) of X-Plane.
+    # The first time the datarefs of the setting DATAREFS are subscribed. When X-Plane moved to another computer or port,
+    # or has been restarted, the datarefs in the registry are subscribed again, with the same index and frequency (see: Resubscribe()).
+    def Subscribe(self, dest):
+        TAG = tag_adjust("dr.Subscribe: ")
+        self.BeaconData["IP"] = dest[0]
+        self.UDP_PORT = dest[1]
+        try:
+            if len(self.datarefs) == 0:
+                self.AddDataRefs(self.datarefs_wanted)
+            elif not self.Resubscribe():
+                return False
+            self.rref_last_t = time.monotonic()
+        except OSError as e:
+            print(TAG+f"Error: {e}", file=sys.stderr)
+            return False
+        self.subscribed = True
+        print(TAG+f"{len(self.datarefs)} dataref(s) subscribed at {dest[0]}, port {dest[1]}", file=sys.stderr)
+        return True
+
+    # Function created by Paulsk
+    # Subscribe a list of datarefs. An item is a dataref or a tuple (dataref, freq). Without freq: self.defaultFreq
+    def AddDataRefs(self, datarefs):
+        for _ in datarefs:
+            if isinstance(_, tuple):
+                self.AddDataRef(_[0], freq=_[1])
+            else:
+                self.AddDataRef(_)
+
+    # Function created by Paulsk
+    # Unsubscribe a list of datarefs, or all datarefs if datarefs is None
+    def RemoveDataRefs(self, datarefs=None):
+        if datarefs is None:
+            datarefs = tuple(self.dataref_idxs.keys())
+        for _ in datarefs:
+            self.AddDataRef(_, freq=0)
+
+    def GetDataRefIdx(self, dataref):
+        return self.dataref_idxs.get(dataref)
+
+    # Function created by Charlylima. Parsing in place by Paulsk
+    # Receive one packet. The values of a RREF reply are written in rref_values, at the index of the dataref.
+    # Returns the view self.xplaneValues (see: class DatarefValues). It is the same object for every call.
     def GetValues(self):
         TAG = tag_adjust("dr.GetValues: ")
+        self.resub_tick()
+        self.write_tick()
         try:
             #if my_debug:
             #    print('dr.GetValues() -- We are entering GetValues', file=sys.stderr)
             # Receive packet
-            data, addr = self.my_DataRef_sock.recvfrom(1024) # buffer size is 1024 bytes
+            size, addr = self.my_DataRef_sock.recvfrom_into(self.rx_buf)
+            if self.capture is not None:
+                self.capture.write(self.rx_buf, size, addr)
             # Decode Packet
-            retvalues = {}
             # * Read the Header "RREF".
-            header=data[0:4]
-            if (header==b"DATA"): # 2 lines added by Paulsk. The DATA packets we handle in another function
+            hdr_id = get_header_id(self.rx_buf)
+            if hdr_id == HDR_DATA: # 2 lines added by Paulsk. The DATA packets we handle in another function
                 pass
-            elif (header==b"RREF"):
-                # * We get 8 bytes for every dataref sent:
-                #   An integer for idx and the float value.
-                values =data[5:]
-                lenvalue = 8
-                numvalues = int(len(values)/lenvalue)
-                #if my_debug:
-                #    print('values of data packet = {}'.format(values), file=sys.stderr)
-                #    print('number of values = {}'.format(numvalues), file=sys.stderr)
-                for i in range(0,numvalues):
-                    singledata = data[(5+lenvalue*i):(5+lenvalue*(i+1))]
-                    (idx,value) = struct.unpack("<if", singledata)
-                    #if my_debug:
-                    #    print('value (unpacked) = {}'.format(value), file=sys.stderr)
-                    if idx in self.datarefs.keys():
-                       # convert -0.0 values to positive 0.0
-                       if value < 0.0 and value > -0.001 :
-                           value = 0.0
-                    retvalues[self.datarefs[idx]] = value
-                    #if my_debug:
-                    #    print('retvalues = {}'.format(retvalues), file=sys.stderr)
+            elif hdr_id == HDR_RREF:
+                self.rref_unpack(self.rx_buf, size)
+            elif hdr_id == HDR_BECN:
+                # X-Plane moved or has been restarted: subscribe the datarefs again (see: XPlaneBeacon.py)
+                if beacon_tracker.update(self.rx_buf, size, addr) > BECN_SAME and len(self.datarefs) > 0:
+                    self.Subscribe(beacon_tracker.dest())
             else:
                 # if(header!=b"RREF,"): # (was b"RREFO" for XPlane10)
-                print(TAG+'Unknown packet: {}'.format(binascii.hexlify(data)), file=sys.stderr) # Unknown packet: 525245462c0000000000582c460100000000000000  -- Note Paulsk: 42 digits
-            self.xplaneValues.update(retvalues)
+                print(TAG+'Unknown packet: {}'.format(binascii.hexlify(self.rx_buf[:size])), file=sys.stderr) # Unknown packet: 525245462c0000000000582c460100000000000000  -- Note Paulsk: 42 digits
         except:
             raise XPlaneTimeout()
         if my_debug:
             print(TAG+'Exiting and returning self.xplaneValues: {}\n'.format(self.xplaneValues), file=sys.stderr)
         return self.xplaneValues
 
+    # Write the values of the RREF reply in buf (size bytes) in the table rref_values.
+    # buf is rx_buf, or the receive buffer of the receiver (see: XPlaneUdpDatagram.handle_rref())
+    def rref_unpack(self, buf, size):
+        # * We get 8 bytes for every dataref sent:
+        #   An integer for idx and the float value.
+        unpack_from = self.rref_pair.unpack_from
+        values = self.rref_values
+        seen = self.rref_seen
+        datarefs = self.datarefs
+        for ofs in range(5, size - 7, 8):
+            idx, value = unpack_from(buf, ofs)
+            if idx not in datarefs:
+                continue  # not (or no longer) subscribed
+            # convert -0.0 values to positive 0.0
+            if value < 0.0 and value > -0.001 :
+                value = 0.0
+            values[idx] = value
+            seen[idx] = 1
+        self.rref_pkt_cnt += 1
+        self.rref_last_t = time.monotonic()
+        self.resub_wait_t = self.resub_min_t  # X-Plane answers: reset the backoff
+
+    # The last value received for dataref, or None
+    def GetValue(self, dataref):
+        return self.xplaneValues.get(dataref)
 
     def packet_has_data(self, packet):
         TAG = tag_adjust("dg.packet_has_data(): ")
@@ -240,27 +592,42 @@ class XPlaneDatarefRx():
                     return False
         return True
 
+    # Function created by Charlylima. Beacon tracker by Paulsk
+    # Fill self.BeaconData with the X-Plane known by the beacon tracker (see: XPlaneBeacon.py)
+    def SetBeaconData(self):
+        self.BeaconData["IP"] = beacon_tracker.ip
+        self.BeaconData["Port"] = beacon_tracker.port
+        self.BeaconData["hostname"] = beacon_tracker.hostname
+        self.BeaconData["XPlaneVersion"] = beacon_tracker.version
+        self.BeaconData["role"] = beacon_tracker.role
+        self.UDP_PORT = beacon_tracker.port
+        return self.BeaconData
+
     # Function created by Charlylima
     def FindIp(self):
         global pool
         '''
         Find the IP of XPlane Host in the Local Area Network.
         It takes the first one it can find.
+        If the beacon tracker already knows X-Plane (from a beacon received by dg, or from the NVM
+        with BEACON_CACHE="1"), that one is returned at once, without waiting for a beacon.
+        The socket stays open: the RREF requests are sent from it and the replies are received on it (see: GetValues())
         '''
         TAG = tag_adjust("dr.FindIp(): ")
         self.BeaconData = {}
 
+        if beacon_tracker.ip is not None:
+            if not my_debug:
+                print(TAG+'X-Plane known by the beacon tracker: {}, port {}'.format(beacon_tracker.ip, beacon_tracker.port), file=sys.stderr)
+            return self.SetBeaconData()
+        if self.rx is not None:
+            return self.BeaconData  # the beacon will be handled by the receiver (see: XPlaneUdpDatagram.handle_beacon())
+
         # open socket for multicast group.
 
         try:
-            if pool is None:
-                make_pool()
-            if pool is None:
-                raise ValueError(f"pool must be not None. Got {pool}")
-
-            self.my_DataRef_sock = pool.socket(pool.AF_INET, pool.SOCK_DGRAM) # SocketPool has no attribute IPPROTO_UDP !!!
-            #self.my_DataRef_sock.settimeout(5)
-            #self.my_DataRef_sock.setblocking(True)
+            if self.my_DataRef_sock is None:
+                self.OpenDatarefSocket()
 
             if my_debug:
                 print(TAG+'type(self.my_DataRef_sock)= {}'.format(type(self.my_DataRef_sock)), file=sys.stderr)
@@ -268,12 +635,6 @@ class XPlaneDatarefRx():
             #self.my_DataRef_sock.setsockopt(pool.SOL_SOCKET, pool.SO_REUSEADDR, 1)
             ###    self.my_DataRef_sock.bind((self.MCAST_GRP, self.MCAST_PORT))     <<<<=====================
             self.my_DataRef_sock.bind((self.udp_host, self.MCAST_PORT))
-
-            #self.my_DataRef_sock.connect((self.MCAST_GRP, self.MCAST_PORT))
-
-            if not my_debug:
-                print(TAG+'type(self.BeaconData)= {}'.format(type(self.BeaconData)), file=sys.stderr)
-                print(TAG+'self.BeaconData= {}'.format(self.BeaconData), file=sys.stderr)
         except ValueError as e:
             print(TAG+'Error: {}'.format(e), file=sys.stderr)
             raise
@@ -281,109 +642,29 @@ class XPlaneDatarefRx():
             print(TAG+'Error: {}'.format(e), file=sys.stderr)
             raise
 
-        # frame_fmt = "4sl"
-        packet_size = 71 # dec 61 = hex 0x3D -- dec 181 = hex 0xB5      struct.calcsize(frame_fmt)
-        print(TAG+'packet_size= {}'.format(packet_size), file=sys.stderr)
-        packet = bytearray(packet_size)  # stores our incoming packet
-
         if not my_debug:
-            # print(TAG+'packet= {}'.format(packet), file=sys.stderr)
-            #print(TAG+'waiting for beacon packets, group {}, port {}'.format("192.168.1.96", self.MCAST_PORT), file=sys.stderr)
             print(TAG+'waiting for beacon packets, udp_host {}, port {}'.format(self.udp_host, self.MCAST_PORT), file=sys.stderr)
 
         while True: # le_BeaconData == 0:
+            neo_signal.tick()
             # receive data
             try:
-                # From Wireshark capture:
-                # Frame 499: 61 bytes on wire (488 bits), 61 bytes captured (488 bits) on interface \Device\NPF_Loopback, id 0 Null/Loopback
-
-                #size = self.my_DataRef_sock.recv_into(packet)  # ToDo: solve the 'hanging' of this command !!!
-
-                size, addr = self.my_DataRef_sock.recvfrom_into(packet)
-
-                # Convert packet header (bytearray) to string
-                header0 = packet[:self.headerlen]
-                if my_debug:
-                    print(TAG+'header0 = {}'.format(header0), file=sys.stderr)
-                header = ''
-                for _ in range(len(header0)):
-                    header += chr(header0[_])
-                print(TAG+'header= {}'.format(header), file=sys.stderr)
-
-                print(TAG+'nr bytes received= {} from {}'.format(size, addr[0]), file=sys.stderr)
-
+                size, addr = self.my_DataRef_sock.recvfrom_into(self.rx_buf)
+                if self.capture is not None:
+                    self.capture.write(self.rx_buf, size, addr)
+                if size < 5:
+                    continue
+                hdr_id = get_header_id(self.rx_buf)
                 if my_debug:
-                    print(TAG+'Received packet (raw) {}'.format(packet), file=sys.stderr)
-                # msg = packet.decode('utf-8')  # assume a string, so convert from bytearray
-                # Advice from: @aceg00 (https://gist.github.com/todbot/877b2037b6c7b2c4c11545c83c6e2182) to prevent printing unwanted characters
-                # msg = packet.decode[:size]('utf-8')  # assume a string, so convert from bytearray
-                #print(TAG+'Received packet from {}, packet {},\n size {}'.format(addr[0], packet, size), file=sys.stderr)
-
-                #packet, sender = self.my_DataRef_sock.recvfrom(packet_size)  # was (15000)
-                #print(TAG+'packet= \'{}\', sender= {}'.format(packet, sender[0]), file=sys.stderr)
-                # decode data
-                # * Header
-
-                # Strip unused bytes:
-                # If packet_size = 61 then the sliced size will be 29 (0x3D - 0x20 = 0x1D = dec 21 )
-
-                if header == 'DATA': # 2 lines added by Paulsk. The DATA packet we handle in the XPlaneUdpDatagram Class object.
-                    # pass
-                    break
-                elif header == 'BECN':
-                    blink_NEO_color(neo_led_green) # blink the Neopixel led in green (see: common.py)
-                    data = packet[5:21]
-                    print(TAG+'first 8 bytes of data= {}'.format(data[:8]), file=sys.stderr)
-
-                    if not my_debug:
-                        print(TAG+'Entering...', file=sys.stderr)
-                        print('packet header = {}'.format(header), file=sys.stderr)
-                        #print('packet received = {}'.format(packet), file=sys.stderr)
-                        print('packet data part = {}'.format(data), file=sys.stderr)
-                    # * Data
-                    # data = msg[5:]  # was: packet[5:21]
-                    # struct becn_struct
-                    # {
-                    # 	uchar beacon_major_version;		// 1 at the time of X-Plane 10.40
-                    # 	uchar beacon_minor_version;		// 1 at the time of X-Plane 10.40
-                    # 	xint application_host_id;		// 1 for X-Plane, 2 for PlaneMaker
-                    # 	xint version_number;			// 104014 for X-Plane 10.40b14 - 113201 for X-Plane 11.32
-                    # 	uint role;				        // 1 for master, 2 for extern visual, 3 for IOS
-                    # 	ushort port;				    // port number X-Plane is listening on
-                    # 	xchr	computer_name[strDIM];  // the hostname of the computer
-                    # };
-                    beacon_major_version = 0
-                    beacon_minor_version = 0
-                    application_host_id = 0
-                    xplane_version_number = 0
-                    role = 0
-                    port = 0
-                    (
-                      beacon_major_version,  # 1 at the time of X-Plane 10.40
-                      beacon_minor_version,  # 1 at the time of X-Plane 10.40, 2 at the time of X-Plane 11
-                      application_host_id,   # 1 for X-Plane, 2 for PlaneMaker
-                      xplane_version_number, # 104014 for X-Plane 10.40b14 - 113201 for X-Plane 11.32
-                      role,                  # 1 for master, 2 for extern visual, 3 for IOS
-                      port,                  # port number X-Plane is listening on
-                    ) = struct.unpack("<BBiiIH", data)
-
-
-                    if my_debug:
-                        print('beacon_major_version = {}'.format(beacon_major_version), file=sys.stderr)
-                        print('beacon_minor_version = {}'.format(beacon_minor_version), file=sys.stderr)
-                        print('application_host_id = {}'.format(application_host_id), file=sys.stderr)
+                    print(TAG+'nr bytes received= {} from {}'.format(size, addr[0]), file=sys.stderr)
 
+                if hdr_id == HDR_DATA: # 2 lines added by Paulsk. The DATA packet we handle in the XPlaneUdpDatagram Class object.
+                    pass
+                elif hdr_id == HDR_BECN:
+                    neo_signal.start(NEO_PAT_BECN) # blink the Neopixel led in green (see: common.py). Does not wait
                     # Originally beacon_minor_version was checked for a value of 1 but investigation by Paulsk revealed that X-Plane 11 returns a value of  2
-                    computer_name = packet[21:-1]   # packet[21:-1]
-                    if beacon_major_version == 1 \
-                       and beacon_minor_version == 2 \
-                       and application_host_id == 1:
-                        self.BeaconData["IP"] = sender[0]
-                        self.BeaconData["Port"] = port
-                        self.BeaconData["hostname"] = computer_name.decode()
-                        self.BeaconData["XPlaneVersion"] = xplane_version_number
-                        self.BeaconData["role"] = role
-
+                    if beacon_tracker.update(self.rx_buf, size, addr) >= 0:  # X-Plane master
+                        self.SetBeaconData()
                         if not my_debug:
                             print('\n'+TAG+'-- Beacon UDP packet received:', file=sys.stderr)
                             print('Host IP         = {}'.format(self.BeaconData["IP"]), file=sys.stderr)
@@ -391,31 +672,24 @@ class XPlaneDatarefRx():
                             print('Hostname        = {}'.format(self.BeaconData["hostname"]), file=sys.stderr)
                             print('X-Plane version = {}'.format(self.BeaconData["XPlaneVersion"]), file=sys.stderr)
                             print('Role            = {}'.format(self.BeaconData["role"]), file=sys.stderr)
-
-                    le_BeaconData = len(self.BeaconData)
-                    if not my_debug:
-                        print(TAG+'le_BeaconData= {}'.format(le_BeaconData), file=sys.stderr)
-                    if le_BeaconData > 0:
                         break
                 else:
-                    print(TAG+'-- Unknown packet from {]'.format(sender[0]), file=sys.stderr)
-                    print('{} bytes'.format(str(len(packet))), file=sys.stderr)
-                    print(packet, file=sys.stderr)
-                    print(binascii.hexlify(packet), file=sys.stderr)
-
-            except self.my_DataRef_sock.timeout:
-                print(TAG+'UDP rx socket timed out', file=sys.stderr)
-                raise XPlaneIpNotFound()
+                    print(TAG+'-- Unknown packet from {}'.format(addr[0]), file=sys.stderr)
+                    print('{} bytes'.format(size), file=sys.stderr)
+                    print(binascii.hexlify(self.rx_buf[:size]), file=sys.stderr)
+
             except OSError as e:
-                if e.errno == 11:
+                if e.errno == 116: # ETIMEDOUT
+                    print(TAG+'UDP rx socket timed out', file=sys.stderr)
+                    raise XPlaneIpNotFound()
+                elif e.errno == 11:
                     print(TAG+'Resource temporarily unavailable (EAGAIN)', file=sys.stderr)
                 else:
                     print(TAG+'OSError {}'.format(e), file=sys.stderr) # [Errno 11] EAGAIN
             except KeyboardInterrupt:
                 myVars.write("kbd_intr", True)
+                break
 
-        #self.my_DataRef_sock.setblocking(False)
-        self.my_DataRef_sock.close()
         return self.BeaconData
 
     # Idea to put the content of this function in a separate function by Paulsk
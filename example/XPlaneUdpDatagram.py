@@ -1,4 +1,3 @@
-
 # _*_ coding: utf-8 _*_
 # SPDX-FileCopyrightText: 2024 Paulus Schulinck
 #
@@ -38,11 +37,50 @@
 #
 #type:ignore
 from common import *
+from XPlaneCapture import get_capture_writer, get_replay_source
+from XPlaneBeacon import beacon_tracker, BECN_SAME
 import time
 import sys
 import struct
 import binascii
 import gc
+import array
+
+# Record of the RPOS packet (see: rpos_unpack()). Allocated once. Each RPOS packet overwrites its values
+class RposRec:
+    __slots__ = (
+        "dat_lon",      # DOUBLE dat_long
+        "dat_lat",      # DOUBLE dat_lat
+        "dat_ele",      # DOUBLE dat_ele      elevation above sea level in meters
+        "y_agl_mtr",    # FLOAT y_agl_mtr     elevation above the terrain in meters
+        "veh_the_loc",  # FLOAT veh_the_loc   pitch, degrees
+        "veh_psi_loc",  # FLOAT veh_psi_loc   true heading, in degrees
+        "veh_phi_loc",  # FLOAT veh_phi_loc   roll, in degrees
+        "vx_wrl",       # FLOAT vx_wrl        speed in the x, EAST drection
+        "vy_wrl",       # FLOAT vy_wrl        speed in the y, UP direction
+        "vz_wrl",       # FLOAT vz_wrl        speed in the z, SOUTH direction
+        "Prad",         # FLOAT Prad          roll rate in radians per second
+        "Qrad",         # FLOAT Qrad          pitch rate in radians per second
+        "Rrad",         # FLOAT Rrad          yaw rate in radians per second
+    )
+
+    def __init__(self):
+        for _ in RposRec.__slots__:
+            setattr(self, _, 0.0)
+
+# Index of the values in the records of the XGPS, XATT and XTRA decoders (see: self.xpkt_decoders)
+XGPS_LON = 0
+XGPS_LAT = 1
+XGPS_ALT = 2  # meters MSL
+XGPS_HDG = 3  # track, degrees true
+XGPS_GS = 4   # ground speed, m/s
+XATT_HDG = 0  # degrees true
+XATT_PITCH = 1
+XATT_ROLL = 2
+XTRA_LAT = 0
+XTRA_LON = 1
+XTRA_ALT = 2  # feet
+XTRA_HDG = 5
 
 # ==========================================
 #                                          =
@@ -104,16 +142,56 @@ class XPlaneUdpDatagram():
                                # if this flag is False then the Groundspeed (GS) will be displayed on the LCD
         # See GetUDPDatagram()
         self.retval = []
-        self.packet = []
         self.messages = []
-        self.packet_length = 149  # Update 2023-02-02: Also with X-Plane 12 the Multicast to group 239.255.1.1 destination port 49707 had a length of 149 bytes
+        # Update 2023-02-02: Also with X-Plane 12 the Multicast to group 239.255.1.1 destination port 49707 had a length of 149 bytes
+        # (4 DATA groups). A DATA packet can contain any number of 36-byte groups, so the receive buffer
+        # is sized to the largest UDP payload that fits in one ethernet frame: 1500 - 20 (IP header) - 8 (UDP header) = 1472 bytes.
+        self.packet_length = 1472
+        # One receive buffer, allocated once and reused for every packet. Decoding uses offsets into this buffer.
+        self.packet = bytearray(self.packet_length)
         self.sender = None
         self.my_DataGram_sock = None # my_sock
         self.size = 0
         self.timeout_cnt = 0
+        # If persistent_rx is True the receive socket is opened and bound once
+        # and stays open across main loop passes. It is only re-opened after a real socket error.
+        self.persistent_rx = myVars.read("persistent_rx")
+        self.reconnect_cnt = 0
+        self.reconnect_max_cnt = 5
+        # Coalescing mode (see: coalesce_store(), drain_socket() and decode_coalesced())
+        # One preallocated buffer per header type. Only the newest packet of each type gets decoded.
+        self.coalesce_rx = myVars.read("coalesce_rx")
+        # The slots are indexed by header ID (see get_header_id() in common.py)
+        self.coalesce_order = (HDR_DATA, HDR_XGPS, HDR_XATT, HDR_XTRA, HDR_RPOS)
+        self.coalesce_bufs = [None] * len(udp_packet_hdrs)
+        self.coalesce_sizes = [0] * len(udp_packet_hdrs)
+        self.coalesce_rx_t = [0] * len(udp_packet_hdrs)
+        if self.coalesce_rx:
+            for hdr_id in self.coalesce_order:
+                self.coalesce_bufs[hdr_id] = bytearray(self.packet_length)
+        self.drain_max_cnt = 64  # max nr of datagrams to drain in one tick
+        self.rx_timeout = 10  # socket timeout in seconds. 0 (non-blocking) when polled by rx_poll()
+        self.rx_last_t = time.monotonic()  # time of the last X-Plane packet received (see rx_poll())
+        self.capture = get_capture_writer()  # None if CAPTURE_FILE is not set (see: XPlaneCapture.py)
+        self.no_data_msg_t = 10    # rx_poll(): show the "Waiting for packets" message after 10 seconds without packets
+        self.no_data_max_t = 110   # rx_poll(): give up after 110 seconds without packets (like 11 socket timeouts of 10 seconds)
+        self.no_data_msg_shown = False
+        self.rx_pkt_cnt = 0   # nr of X-Plane packets received
+        self.dropped_cnt = 0  # nr of stale packets not decoded (coalescing mode)
+        # Latency probe (setting LATENCY_PROBE="1", see: LatencyProbe in common.py)
+        self.latency_probe = myState.latency_probe
+        self.rx_t = 0         # time.monotonic_ns() when the packet in self.packet was received
+        self.latest_rx_t = 0  # receive time of the newest heading/altitude not yet shown. 0 = shown
+        self.latest_sent_us = 0  # send time written by the traffic simulator (host/xplane_sim.py --probe)
 
         if my_have_tft:
             self.hdg_alt_lst = [] # Added for use with Adafruit Feather ESP32-S2 TFT
+        # Render stage (see render_tick()). Newest decoded values and the frame budget in seconds
+        self.hdg_latest = None
+        self.alt_latest = None
+        self.render_pending = False
+        self.render_last_t = 0.0
+        self.render_interval = myVars.read("render_interval")
         self.udp_types = {
           3:  'Speeds',
          17: 'Pitch, roll, & headings',
@@ -180,24 +258,94 @@ class XPlaneUdpDatagram():
             'dme-3_freq': DUMMY_STR_FLOAT, # dme3 freq (this is the 3rd, dme receiver (usually not reacheable)
             }
         
-        self.udp_unpack_str5 = "<idddffffffffff"  # was: "iiiiiiiif"  4 + (3 x 8) + (10 x 4)   4 + 24 + 40 = 68 bytes
-         
-        self.values_struct5 = {    # udp_unpack_str5 = "ffffffffff"
-            'ID':          DUMMY_STR_INT,        # RPOS and a NULL
-            'dat_lon':     DUMMY_STR_DOUBLE,     # DOUBLE dat_long
-            'dat_lat':     DUMMY_STR_DOUBLE,     # DOUBLE dat_lat
-            'dat_ele':     DUMMY_STR_DOUBLE,     # DOUBLE dat_ele      elevation above sea level in meters
-            'y_agl_mtr':   DUMMY_STR_FLOAT,      # FLOAT y_agl_mtr     elevation above the terrain in meters
-            'veh_the_loc': DUMMY_STR_FLOAT,      # FLOAT veh_the_loc   pitch, degrees
-            'veh_psi_loc': DUMMY_STR_FLOAT,      # FLOAT veh_psi_loc   true heading, in degrees
-            'veh_phi_loc': DUMMY_STR_FLOAT,      # FLOAT veh_phi_loc   roll, in degrees
-            'vx_wrl':      DUMMY_STR_FLOAT,      # FLOAT vx_wrl        speed in the x, EAST drection
-            'vy_wrl':      DUMMY_STR_FLOAT,      # FLOAT vy_wrl        speed in the y, UP direction
-            'vz_wrl':      DUMMY_STR_FLOAT,      # FLOAT vz_wrl        speed in the z, SOUTH direction
-            'Prad':        DUMMY_STR_FLOAT,      # FLOAT Prad          roll rate in radians per second
-            'Qrad':        DUMMY_STR_FLOAT,      # FLOAT Qrad          pitch rate in radians per second
-            'Rrad':        DUMMY_STR_FLOAT       # FLOAT Rrad          yaw rate in radians per second
-            }
+        # RPOS packet: 5 bytes header "RPOS4" followed by 3 doubles and 10 floats: 5 + (3 x 8) + (10 x 4) = 69 bytes.
+        # Requested from X-Plane with RposRequest(). Decoded by rpos_unpack() into self.rpos (see: class RposRec)
+        self.udp_unpack_str5 = "<dddffffffffff"  # was: "<idddffffffffff". The header is 5 bytes, not an int of 4 bytes
+        self.rpos_struct = Struct(self.udp_unpack_str5)
+        self.rpos = RposRec()
+        self.rpos_msgs = [self.rpos]  # returned as self.messages
+        self.rpos_hz = myState.rpos_hz
+        self.rpos_sent = False
+
+        # DATA packet decoder table. key: group ID (= the "Index" in X-Plane > Settings > Data Output)
+        # value: (precompiled struct, field names, dict that receives the values)
+        # A DATA packet contains 1 or more groups of 36 bytes, in any order. See msgs_unpack().
+        # To decode another group, add its unpack string, values dict, field names and an entry in this table.
+        # Note: the field names are listed explicitly because the order of dict keys is not guaranteed in CircuitPython.
+        fields_3 =   ('ID', 'vind_kias', 'vind_keas', 'vtrue_ktas', 'vtrue_ktgs', 'nothing', 'vind_mph', 'vtrue_mphas', 'vtrue_mphgs')
+        fields_17 =  ('ID', 'pitch_deg', 'roll_deg', 'hding_true', 'nothing1', 'hding_mag', 'mavar_deg', 'nothing2', 'mag_comp')
+        fields_20 =  ('ID', 'lat_deg', 'lon_deg', 'CG_ftmsl', 'gear_ftagl', 'terrn_ftmsl', 'p-alt_ftmsl', 'lat_orign', 'lon_orign')
+        fields_102 = ('ID', 'dme_nav01', 'dme_mode', 'dme_found', 'dme_dist', 'dme_speed', 'dme_time', 'dme_n-typ', 'dme-3_freq')
+        self.data_grp_size = 36
+        self.data_grps = {
+              3: (Struct(self.udp_unpack_str_3),   fields_3,   self.values_struct_3),
+             17: (Struct(self.udp_unpack_str_17),  fields_17,  self.values_struct_17),
+             20: (Struct(self.udp_unpack_str_20),  fields_20,  self.values_struct_20),
+            102: (Struct(self.udp_unpack_str_102), fields_102, self.values_struct_102),
+        }
+        self.unknown_grp_cnt = 0  # nr of skipped groups that are not in self.data_grps
+
+        # Decoders for the ASCII packets of "Broadcast to all mapping apps" (X-Plane > Settings > Network), e.g.:
+        #   XGPS1,-9.130000,38.780000,1219.2,90.00,66.9                  lon, lat, alt (m), track (true), ground speed (m/s)
+        #   XATT1,90.0,2.0,25.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0      heading (true), pitch, roll, ...
+        #   XTRA1,4CA123,38.8,-9.1,4500,0,1,270,250,TAP123               ID, lat, lon, alt (ft), v/s, ..., tail nr (traffic)
+        # key: header ID, value: (field names, units, nr of text fields to skip before the values, record).
+        # The record is an array that is allocated once. Each packet overwrites its values. See: xpkt_unpack()
+        # Only the packet types in the setting PACKET_TYPES_USED are decoded.
+        xgps_fields = ('LON', 'LAT', 'ALT', 'HDG', 'GS')
+        xgps_units =  ('',    '',    'm',   'true', 'm/s')
+        xatt_fields = ('HDG', 'PITCH', 'ROLL', 'Roll-rate', 'Pitch-rate', 'Yaw-rate', 'SPD_TRUE_EAST', 'SPD_TRUE_UP', 'SPD_TRUE_SOUTH', 'G-Load side', 'G-Load normal', 'G-Load axial')
+        xatt_units =  ('true', 'degs', 'degs', 'rad/s', 'rad/s', 'rad/s', 'm/s', 'm/s', 'm/s', 'G', 'G', 'G')
+        xtra_fields = ('LAT', 'LON', 'ALT', 'V/S', 'ON_GND', 'HDG', 'GS')
+        xtra_units =  ('',    '',    'ft',  'ft/min', 'True/False', 'true', 'kts')
+        self.xpkt_decoders = {
+            HDR_XGPS: (xgps_fields, xgps_units, 0, array.array("d", [0.0] * len(xgps_fields))),
+            HDR_XATT: (xatt_fields, xatt_units, 0, array.array("d", [0.0] * len(xatt_fields))),
+            HDR_XTRA: (xtra_fields, xtra_units, 1, array.array("d", [0.0] * len(xtra_fields))),
+        }
+        self.xpkt_used = tuple(udp_packet_types_rev[_.encode()] for _ in myState.packet_types_used)
+        self.xpkt_skipped_cnt = 0  # nr of XGPS/XATT/XTRA packets not decoded: not in PACKET_TYPES_USED
+        self.xpkt_bad_cnt = 0      # nr of XGPS/XATT/XTRA packets with a value that is not a number
+        self.xtra_tail = ''        # tail nr of the last XTRA packet
+        self.hdg_unit = "mag"      # "mag" for DATA group 17, "true" for XGPS
+
+        # Data output selection (setting DATA_SELECT="1"). After the first beacon (BECN) of X-Plane has been received,
+        # X-Plane is asked to send only the DATA groups that the pages need (DSEL message), and to stop sending
+        # the other groups that this script can decode (USEL message). When the script ends, the groups are deselected (USEL).
+        # X-Plane sends the selected groups to the IP-address set in X-Plane > Settings > Data Output ("Send network data output").
+        self.data_select = myState.data_select
+        self.page_grps = {"XPlane": (17, 20)}  # DATA groups needed per page: heading (17) and altitude (20)
+        dsel_grps = []
+        for grps in self.page_grps.values():
+            for grp_id in grps:
+                if grp_id not in dsel_grps:
+                    dsel_grps.append(grp_id)
+        usel_grps = [_ for _ in self.data_grps.keys() if _ not in dsel_grps]
+        self.dsel_grps = tuple(dsel_grps)
+        self.dsel_msg = self.make_sel_msg(b"DSEL\x00", dsel_grps)       # select the groups needed
+        self.usel_unused_msg = self.make_sel_msg(b"USEL\x00", usel_grps) # deselect the groups not needed
+        self.usel_msg = self.make_sel_msg(b"USEL\x00", dsel_grps)       # at the end: deselect the groups selected
+        self.xp_dest = None    # (IP-address, port) of X-Plane, from its beacon (see: XPlaneBeacon.py)
+        self.dsel_sent = False
+        if not self.use_udp_host and (self.data_select or self.rpos_hz > 0):
+            # The socket is bound to the multicast group. Requests sent from it, and the unicast replies
+            # of X-Plane to their source port, are not sure to get through. See also: attach_dr()
+            print(TAG+"DATA_SELECT and RPOS_HZ need USE_UDP_HOST=\"1\". Switched off", file=sys.stderr)
+            self.data_select = False
+            self.rpos_hz = 0
+
+        # Receive dispatch (see: dispatch()). This object owns the only receive socket. Each datagram goes,
+        # by its header ID (see: get_header_id() in common.py), through this table to its handler.
+        # The RREF replies go to the XPlaneDatarefRx object attached with attach_dr(). They are sent to this socket
+        # because dr sends its RREF requests from it.
+        self.dr = None
+        self.rx_handlers = [None] * len(udp_packet_hdrs)
+        self.rx_handlers[HDR_BECN] = self.handle_beacon
+        for hdr_id in (HDR_DATA, HDR_XATT, HDR_XGPS, HDR_XTRA, HDR_RPOS):
+            self.rx_handlers[hdr_id] = self.handle_xp_packet
+        self.rx_handlers[HDR_RREF] = self.handle_rref
+        self.unknown_cnt = 0  # nr of datagrams with an unknown header
+        self.rref_cnt = 0     # nr of RREF replies received
 
         # values from xplane
         self.BeaconData = {}
@@ -208,7 +356,7 @@ class XPlaneUdpDatagram():
         self.LCDFill() # Print the framework on the LCD
 
     # The socket definitions in function OpenUDPSocket() were before inside the FindIp() function in Charlylima's file: XPlaneUdp.py
-    def OpenUDPSocket(self, start):
+    def OpenUDPSocket(self, start=False):
         global pool
         TAG = tag_adjust("dg.OpenUDPSocket(): ")
         udp_host = None
@@ -216,6 +364,13 @@ class XPlaneUdpDatagram():
         # mcast_pack_str = "=4sl"
         # open socket to receive X-Plane 12's UDP Datagrams to a multicast group.
 
+        replay = get_replay_source("dg")
+        if replay is not None:
+            # REPLAY_FILE is set: receive the datagrams from the capture file instead of from X-Plane
+            self.my_DataGram_sock = replay
+            self.my_DataGram_sock.settimeout(10)
+            return self.my_DataGram_sock
+
         try:
             if pool is None:
                 if my_debug:
@@ -257,6 +412,9 @@ class XPlaneUdpDatagram():
                 #print(TAG+f"self.MCAST_GRPM= {self.MCAST_GRP}", file=sys.stderr)
                 #print(TAG+f"type(self.MCAST_GRP)= {type(self.MCAST_GRP)}", file=sys.stderr)
             self.my_DataGram_sock.bind((udp_host, self.MCAST_PORT))
+            if self.xp_dest is None and beacon_tracker.from_nvm:
+                # BEACON_CACHE="1": X-Plane from the last run. Send the requests now, not after the first beacon
+                self.xp_connect(beacon_tracker.dest())
             """
             if start and not my_debug:
                 client_ip = myVars.read("client_IP")  # set in: wifi_is_connected()
@@ -299,6 +457,25 @@ class XPlaneUdpDatagram():
     def GetUDPSocket(self):
         return self.my_DataGram_sock
 
+    # Function created by Paulsk
+    # Close and re-open the receive socket. Only called after a real socket error,
+    # not after a socket timeout. Returns the new socket or None
+    def ReconnectUDPSocket(self):
+        TAG = tag_adjust("dg.ReconnectUDPSocket(): ")
+        self.reconnect_cnt += 1
+        print(TAG+f"reconnect nr: {self.reconnect_cnt}", file=sys.stderr)
+        if self.reconnect_cnt > self.reconnect_max_cnt:
+            print(TAG+f"Failed to reconnect for {self.reconnect_cnt-1} times. Giving up.", file=sys.stderr)
+            return None
+        try:
+            self.CloseUDPSocket()
+        except OSError as e:
+            print(TAG+f"Error while closing the socket: {e}", file=sys.stderr)
+        self.my_DataGram_sock = None
+        myVars.write("pool_socket_timeout_set", False)
+        self.my_DataGram_sock = self.OpenUDPSocket()
+        return self.my_DataGram_sock
+
     def packet_has_data(self, packet):
         TAG = tag_adjust("dg.packet_has_data(): ")
         b_cnt = 0
@@ -320,11 +497,12 @@ class XPlaneUdpDatagram():
     # Added 2023-03-27
     def datagram_test(self):
         TAG = tag_adjust("dg.datatagram_test(): ")
-        if not my_debug:
+        if my_debug:
             print(TAG+"Entering...", file=sys.stderr)
-        gc.collect()
+        gc_policy.check()  # collect only if the free heap is low (see: common.py)
         lResult = self.GetUDPDatagram()
-        self.CloseUDPSocket()
+        if not self.persistent_rx:
+            self.CloseUDPSocket()
         if my_debug:
             print(TAG+'return value= {}'.format(lResult), file=sys.stderr)
         return lResult
@@ -344,7 +522,8 @@ class XPlaneUdpDatagram():
             retval = False
         return retval
     
-    def waiting_for_packets_msg(self):
+    # Param wait: if False, the display is not cleared and the message is not held on screen (used by the asyncio rx task)
+    def waiting_for_packets_msg(self, wait=True):
         TAG = tag_adjust("dg.waiting_for_packets_msg(): ")
         if not my_debug:
             print(TAG+"Entering...", file=sys.stderr)
@@ -356,9 +535,12 @@ class XPlaneUdpDatagram():
         #lst = ["Waiting", "for packets fm", hst]
         lst = ["Waiting", "for packets to", clt]
         try:
-            clr_disp()
-            disp_msg(lst)
-            #blink_NEO_v2(1, RED)
+            if wait:
+                clr_disp()
+                disp_msg(lst)
+            else:
+                disp_msg(lst, 0)
+            neo_signal.start(NEO_PAT_NO_DATA)  # red pulse until packets arrive again
         except Exception as e:
             print(TAG+f"Error: {e}")
             raise
@@ -366,7 +548,7 @@ class XPlaneUdpDatagram():
     # Function created by Paulsk
     def GetUDPDatagram(self):
         TAG = tag_adjust("dg.GetUDPDatagram(): ")
-        if not my_debug:
+        if my_debug:
             print(TAG+"Entering...", file=sys.stderr)
         mcast_pack_str = "=4sl"
         '''
@@ -376,7 +558,6 @@ class XPlaneUdpDatagram():
         headerlen = 5
         self.retval = []
         lretval = False
-        self.packet = []
         #self.packet_length = 149  # Update 2023-02-02: Also with X-Plane 12 the Multicast to group 239.255.1.1 destination port 49707 had a length of 149 bytes
         self.sender = None
         self.size = 0
@@ -384,7 +565,7 @@ class XPlaneUdpDatagram():
         no_data_cnt = 0
         no_data_max_cnt = 10
         interval_t = 60
-        start = myVars.read("start")
+        start = myState.start
         t = None
 
         # open the UDP socket
@@ -396,8 +577,6 @@ class XPlaneUdpDatagram():
         if my_debug:
             print(TAG+'type(self.my_DataGram_sock)= {}'.format(type(self.my_DataGram_sock)), file=sys.stderr)
 
-        self.packet = bytearray(self.packet_length)
-
         """
         le_p = len(self.packet)
 
@@ -411,6 +590,10 @@ class XPlaneUdpDatagram():
         while len(self.retval) == 0:
             if my_debug:
                 print(TAG+f"self.retval= {self.retval}")
+            neo_signal.tick()
+            if self.dr is not None:
+                self.dr.resub_tick()  # DATAREFS: no RREF replies for a while? Subscribe again
+                self.dr.write_tick()  # send the waiting dataref writes and commands (see: XPlaneDatarefRx.py)
             # receive data
             try:
                 # C-Examples see: https://github.com/dotsha747/libXPlane-UDP-Client/blob/master/src/libsrc/XPlaneUDPClient.cpp
@@ -430,7 +613,8 @@ class XPlaneUdpDatagram():
                 if my_debug:
                     print(TAG+f"type(self.packet)= {type(self.packet)}, len(self.packet) = {len(self.packet)}")
                     print(TAG+f"self.packet[:10] = {self.packet[:10]}")
-                if self.ck_packet_empty():
+                # In coalescing mode self.packet can be a swapped, still empty, slot buffer. Then rx_pkt_cnt tells us that packets arrived
+                if self.rx_pkt_cnt == 0 and self.ck_packet_empty():
                     curr_t = int(time.monotonic())
                     elapsed_t = curr_t - self.start_t
                     if my_debug:
@@ -444,11 +628,11 @@ class XPlaneUdpDatagram():
                         print(TAG+f"No packet data received for {no_data_cnt} times.")
                         print(TAG+"Is XPlane 12 running?")
                         lst = ["No data", "XPlane running?","Exiting..."]
-                        myVars.write("no_data", True)
+                        myState.no_data = True
                         try:
                             disp_msg(lst)
-                            blink_NEO_v2(1, RED)
-                            time.sleep(myVars.read("TFT_show_duration")) # in seconds
+                            neo_signal.start(NEO_PAT_NO_DATA)
+                            time.sleep(myState.TFT_show_duration) # in seconds
                         except Exception as e:
                             print(TAG+f"Error: {e}")
                             raise
@@ -460,17 +644,23 @@ class XPlaneUdpDatagram():
                     if not self.my_DataGram_sock:
                         print(TAG+"Repeatedly failed to open pool.socket. Exiting")
                         break
+                # Note: this socket blocks (timeout 10 seconds), so the rx time includes the wait for the packet
+                t0 = time.monotonic_ns()
                 self.size, self.sender = self.my_DataGram_sock.recvfrom_into(self.packet)
-                le = len(self.packet)
-                if not my_debug:
-                    print(TAG+f"len(self.packet)= {le}")
-                    print(TAG+f"contents received packet= {self.packet}", file=sys.stderr)
+                self.rx_t = time.monotonic_ns()
+                stage_stats.add(STG_RX, self.rx_t - t0)
+                if self.capture is not None:
+                    self.capture.write(self.packet, self.size, self.sender)
+                le = self.size
+                if my_debug:
+                    print(TAG+f"nr of bytes received= {le}")
+                    print(TAG+f"contents received packet= {self.packet[:le]}", file=sys.stderr)
                 """The X-Plane 11 log.txt reports a message length 113 (= 0..112) but I discovered
                 that it is 0..113, thus 114 bytes"""
-                if le > 0:
-                    header = self.packet[0:headerlen-1]   # note the modified "headerlen-1" We take just the first 4 characters
+                if le >= headerlen:
+                    hdr_id = get_header_id(self.packet)   # compares the first 4 characters without creating a new object. See: dispatch()
                     if my_debug:
-                        print(TAG+'packet header= {}'.format(header), file=sys.stderr)
+                        print(TAG+'packet header= {}'.format(self.packet[0:headerlen-1]), file=sys.stderr)
 
                     #if my_debug:
                     #    print('GetUDPDatagram(): header contents is: {}'.format(header), file=sys.stderr)
@@ -491,51 +681,47 @@ class XPlaneUdpDatagram():
                         print(TAG+'udp_packet_types_rev.keys()= {}'.format(udp_packet_types_rev.keys()), file=sys.stderr)
                     # gc.collect()
 
-                    if header in [b'DATA', b'XATT', b'XGPS', b'XTRA']: # was: header == b'DATA':
+                    if self.dispatch(hdr_id) > 0: # DATA, XATT, XGPS, XTRA, RPOS or RREF. was: header == b'DATA':
                         # Only set timeout after once a good packet has been received
-                        if not myVars.read("pool_socket_timeout_set"):
+                        if not myState.pool_socket_timeout_set:
                             self.my_DataGram_sock.settimeout(10)  # set timeout 10 seconds
-                            myVars.write("pool_socket_timeout_set", True)
+                            myState.pool_socket_timeout_set = True
                         #self.start_t = int(time.monotonic())  # Update start_t
-                        blink_NEO_v2(1, GREEN)
-                        """Arrived an UDP Datagram packet
-                        Decode the packet. Result is a python dict (like a map in C) with values from X-Plane.
-                        Example:
-                        {'latitude': 47.72798156738281, 'longitude': 12.434000015258789,
-                        'altitude MSL': 1822.67, 'altitude AGL': 0.17, 'speed': 4.11,
-                        'roll': 1.05, 'pitch': -4.38, 'heading': 275.43, 'heading2': 271.84}
-                        values = packet[headerlen:]"""
-                        self.DecodePacket()
-                        if my_debug:
-                            print(TAG+'self.messages= {}\n'.format(self.messages), file=sys.stderr) # print the UDP Datagram
-                        self.DispMessage(header)
-                        gc.collect()
-                    elif header == b'BECN':
-                        pass  # We don't handle BECN packets here.
-                        # We also don't want that BECN packets are reported as "unknown packets", handled by 'else:' below.
-                    else:
-                        """ We have no BECN message neither we have an UDP Datagram"""
-                        if my_debug:
-                            print(TAG+'Unknown packet from {}'.format(self.sender[0]), file=sys.stderr)
-                            print(TAG+'{} bytes'.format(str(len(self.retval)+1)), file=sys.stderr)
-                            print(TAG+'decoded packet: {}'.format(self.retval), file=sys.stderr)
-                            print(binascii.hexlify(self.retval), file=sys.stderr)
-                            # t = raw_input('Press enter to continue: ')
+                        self.rx_last_t = time.monotonic()
+                        if self.coalesce_rx:
+                            # Keep only the newest packet per header type (stored by dispatch()), then decode just those
+                            self.drain_socket()
+                            self.decode_coalesced()
+                        self.reconnect_cnt = 0  # a good packet. Reset the reconnect counter
+                        if self.persistent_rx:
+                            self.retval = self.messages # return to main(). The socket stays open for the next loop pass
             except OSError as e:
                 if e.errno == 116: # ETIMEDOUT
                     self.timeout_cnt = self.timeout_cnt + 1
                     print(TAG+"self.myDataGram_sock timed out")
                     print(TAG+f"go-around nr: {self.timeout_cnt}, Socket timed out error", file=sys.stderr)
+                    gc_policy.idle(self.rx_last_t)  # no packets: a good moment to collect
+                    if getattr(self.my_DataGram_sock, "eof", False):
+                        print(TAG+"end of the replay file", file=sys.stderr)
+                        myState.no_data = True  # stops the main loop
+                        break
                     if self.timeout_cnt >= 11:
                         print(TAG+f"pool.socket timeout_cnt {self.timeout_cnt}.\n\t\t\tIs XPlane12 running?\n\t\t\tExiting...", file=sys.stderr)
                         break
                     else:
                         continue 
+                elif e.errno == 11: # EAGAIN
+                    continue
+                else:
+                    # A real socket error. Rebuild the socket instead of looping on a broken one
+                    print(TAG+f"OSError: {e}. Going to reconnect the socket", file=sys.stderr)
+                    if not self.ReconnectUDPSocket():
+                        break
             except AttributeError as e: # for example: ... has no attribute lcd
                 print(TAG+'Error: {}'.format(e), file=sys.stderr)
                 break
             except KeyboardInterrupt:
-                myVars.write("kbd_intr", True)
+                myState.kbd_intr = True
                 break
 
         if my_debug:
@@ -547,6 +733,192 @@ class XPlaneUdpDatagram():
             print(TAG+'return value= {}'.format(lretval), file=sys.stderr)
         return lretval
 
+    # Function created by Paulsk
+    # Non-blocking receive, used by the asyncio rx task (see code.py).
+    # Handles the datagrams waiting in the socket (in coalescing mode only the newest per type) and returns at once.
+    # Returns the nr of X-Plane packets handled. 0 if nothing was waiting.
+    def rx_poll(self):
+        TAG = tag_adjust("dg.rx_poll(): ")
+        n = 0      # nr of X-Plane data packets
+        rx_n = 0   # nr of datagrams received (also BECN, unknown and too short). Capped by drain_max_cnt
+        if self.my_DataGram_sock is None:
+            self.my_DataGram_sock = self.OpenUDPSocket(True)
+            if self.my_DataGram_sock is None:
+                return 0
+        if self.rx_timeout != 0:
+            self.rx_timeout = 0
+            self.my_DataGram_sock.settimeout(0)  # non-blocking
+        if self.dr is not None:
+            self.dr.resub_tick()  # DATAREFS: no RREF replies for a while? Subscribe again
+            self.dr.write_tick()  # send the waiting dataref writes and commands (see: XPlaneDatarefRx.py)
+        while rx_n < self.drain_max_cnt:
+            try:
+                t0 = time.monotonic_ns()
+                self.size, self.sender = self.my_DataGram_sock.recvfrom_into(self.packet)
+                self.rx_t = time.monotonic_ns()
+                stage_stats.add(STG_RX, self.rx_t - t0)
+                if self.capture is not None:
+                    self.capture.write(self.packet, self.size, self.sender)
+            except OSError as e:
+                if e.errno in (11, 116): # EAGAIN, ETIMEDOUT: the socket is empty
+                    break
+                print(TAG+f"OSError: {e}. Going to reconnect the socket", file=sys.stderr)
+                self.rx_timeout = 10
+                if not self.ReconnectUDPSocket():
+                    myState.no_data = True
+                return n
+            rx_n += 1
+            if self.size < 5:
+                continue
+            n += self.dispatch(get_header_id(self.packet))
+        if n > 0:
+            if self.coalesce_rx:
+                self.decode_coalesced()
+            self.rx_last_t = time.monotonic()
+            self.reconnect_cnt = 0
+            self.no_data_msg_shown = False
+        else:
+            gc_policy.idle(self.rx_last_t)
+            if getattr(self.my_DataGram_sock, "eof", False):
+                myState.no_data = True  # end of the replay file. Stops the tasks
+                return n
+            elapsed_t = time.monotonic() - self.rx_last_t
+            if elapsed_t >= self.no_data_max_t:
+                print(TAG+f"No packet data received for {int(elapsed_t)} seconds. Is XPlane 12 running?", file=sys.stderr)
+                disp_msg(["No data", "XPlane running?","Exiting..."], 0)
+                myState.no_data = True
+            elif elapsed_t >= self.no_data_msg_t and not self.no_data_msg_shown:
+                self.no_data_msg_shown = True
+                self.waiting_for_packets_msg(False)
+        return n
+
+    # Function created by Paulsk
+    # Hand the datagram in self.packet to the handler of its header ID (see: self.rx_handlers).
+    # Returns 1 if it was an X-Plane data packet (DATA, XATT, XGPS, XTRA, RPOS or RREF), otherwise 0
+    def dispatch(self, hdr_id):
+        if hdr_id < 0:
+            self.unknown_cnt += 1
+            if my_debug:
+                print(tag_adjust("dg.dispatch(): ")+'Unknown packet from {}: {}'.format(self.sender[0], binascii.hexlify(self.packet[:self.size])), file=sys.stderr)
+            return 0
+        return self.rx_handlers[hdr_id](hdr_id)
+
+    # Function created by Paulsk
+    # Handler of DATA, XATT, XGPS, XTRA and RPOS packets: in coalescing mode keep the newest per type, otherwise decode and display it now
+    def handle_xp_packet(self, hdr_id):
+        self.rx_pkt_cnt += 1
+        if self.coalesce_rx:
+            self.coalesce_store(hdr_id)
+        else:
+            self.handle_datagram(hdr_id)
+        return 1
+
+    # Function created by Paulsk
+    # Handler of RREF replies: the values are written in the value table of dr (see: XPlaneDatarefRx.rref_unpack())
+    def handle_rref(self, hdr_id):
+        if self.dr is None:
+            self.unknown_cnt += 1
+            return 0
+        self.rref_cnt += 1
+        self.dr.rref_unpack(self.packet, self.size)
+        return 1
+
+    # Function created by Paulsk
+    # Let the XPlaneDatarefRx object dr use the socket of this object: its RREF requests are sent from it,
+    # and the RREF replies are received and dispatched here. So there is only one socket open.
+    # The datarefs of the setting DATAREFS are subscribed after the beacon of X-Plane (see: handle_beacon())
+    # Only with USE_UDP_HOST="1": X-Plane sends the RREF replies unicast, to the port the requests came from.
+    # A socket bound to the multicast group is not sure to receive them. Returns False if dr was not attached
+    def attach_dr(self, dr):
+        if not self.use_udp_host:
+            print(tag_adjust("dg.attach_dr(): ")+"DATAREFS need USE_UDP_HOST=\"1\". The datarefs are not subscribed", file=sys.stderr)
+            return False
+        self.dr = dr
+        dr.rx = self
+        return True
+
+    # Function created by Paulsk
+    # Decode and display the packet in self.packet
+    def handle_datagram(self, hdr_id):
+        TAG = tag_adjust("dg.handle_datagram(): ")
+        if hdr_id in self.xpkt_decoders and hdr_id not in self.xpkt_used:
+            self.xpkt_skipped_cnt += 1  # XGPS, XATT or XTRA not in PACKET_TYPES_USED
+            return
+        neo_signal.start(NEO_PAT_PKT)  # does not wait. The led is advanced by neo_signal.tick()
+        """Arrived an UDP Datagram packet
+        Decode the packet. Result is a python dict (like a map in C) with values from X-Plane.
+        Example:
+        {'latitude': 47.72798156738281, 'longitude': 12.434000015258789,
+        'altitude MSL': 1822.67, 'altitude AGL': 0.17, 'speed': 4.11,
+        'roll': 1.05, 'pitch': -4.38, 'heading': 275.43, 'heading2': 271.84}
+        values = packet[headerlen:]"""
+        self.DecodePacket(hdr_id)
+        if my_debug:
+            print(TAG+'self.messages= {}\n'.format(self.messages), file=sys.stderr) # print the UDP Datagram
+        self.DispMessage(udp_packet_types_str[hdr_id], hdr_id)
+        gc_policy.check()  # was: gc.collect() after each packet
+
+    # Function created by Paulsk
+    # Coalescing mode (setting COALESCE_RX="1").
+    # Move the packet just received in self.packet into the slot of its header type.
+    # The slot buffer and self.packet are swapped, so no bytes are copied.
+    # If the slot still held a packet that was not decoded yet, that packet is stale: count it as dropped.
+    def coalesce_store(self, hdr_id):
+        if hdr_id < 0 or self.coalesce_bufs[hdr_id] is None:
+            return
+        if self.coalesce_sizes[hdr_id] > 0:
+            self.dropped_cnt += 1
+        self.coalesce_bufs[hdr_id], self.packet = self.packet, self.coalesce_bufs[hdr_id]
+        self.coalesce_sizes[hdr_id] = self.size
+        self.coalesce_rx_t[hdr_id] = self.rx_t
+
+    # Function created by Paulsk
+    # Receive all datagrams that are waiting in the socket without blocking.
+    # Returns the number of datagrams drained
+    def drain_socket(self):
+        TAG = tag_adjust("dg.drain_socket(): ")
+        n = 0
+        self.my_DataGram_sock.settimeout(0)  # non-blocking
+        try:
+            while n < self.drain_max_cnt:
+                try:
+                    t0 = time.monotonic_ns()
+                    self.size, self.sender = self.my_DataGram_sock.recvfrom_into(self.packet)
+                    self.rx_t = time.monotonic_ns()
+                    stage_stats.add(STG_RX, self.rx_t - t0)
+                    if self.capture is not None:
+                        self.capture.write(self.packet, self.size, self.sender)
+                except OSError as e:
+                    if e.errno in (11, 116): # EAGAIN, ETIMEDOUT: the socket is empty
+                        break
+                    raise
+                n += 1
+                if self.size >= 5:
+                    self.dispatch(get_header_id(self.packet))
+        finally:
+            self.my_DataGram_sock.settimeout(self.rx_timeout)
+        if my_debug:
+            print(TAG+f"drained {n} packets. rx_pkt_cnt= {self.rx_pkt_cnt}, dropped_cnt= {self.dropped_cnt}", file=sys.stderr)
+        return n
+
+    # Function created by Paulsk
+    # Decode the newest packet of each header type collected by coalesce_store()
+    def decode_coalesced(self):
+        rx_buf = self.packet
+        rx_size = self.size
+        rx_t = self.rx_t
+        for hdr_id in self.coalesce_order:
+            size = self.coalesce_sizes[hdr_id]
+            if size > 0:
+                self.coalesce_sizes[hdr_id] = 0
+                self.packet = self.coalesce_bufs[hdr_id]
+                self.size = size
+                self.rx_t = self.coalesce_rx_t[hdr_id]
+                self.handle_datagram(hdr_id)
+        self.packet = rx_buf
+        self.size = rx_size
+        self.rx_t = rx_t
+
     def LCDFill(self):
         global Hasseb_lcd, Loose_lcd, my_have_tft
 
@@ -570,286 +942,314 @@ class XPlaneUdpDatagram():
             lcd.lcd_display_string_pos("ALT:       ft MSL ",4,0)
             lcd.lcd_display_string_pos('', 4, 20)
 
+    # Function by Paulsk
+    # Render stage of the receive -> decode -> display pipeline.
+    # The decoder only stores the newest heading/altitude (see msgs_unpack()).
+    # This function is called from the receive loop and from main() but it only
+    # updates the display when there is a new value and the frame budget (render_interval) has elapsed.
+    # It never sleeps. Returns True if a frame was rendered.
+    def render_tick(self, force=False):
+        if not self.render_pending and not force:
+            return False
+        curr_t = time.monotonic()
+        if not force and (curr_t - self.render_last_t) < self.render_interval:
+            return False
+        self.render_last_t = curr_t
+        self.render_pending = False
+        if my_have_tft:
+            self.disp_hdg_alt()
+        return True
+
     def disp_hdg_alt(self):
         global my_page_layout, main_group
         TAG= tag_adjust("dg.disp_hdg_alt(): ")
         if my_debug:
             print(TAG+"Entering...", file=sys.stderr)
-        # Update this to change the text displayed.
-        disp_hdg_alt = False
-        #xp = myVars.read("xp")
-        main_grp = myVars.read("main_grp")
-        my_page_layout = myVars.read("my_page_layout")
-        xp_lst = myVars.read("xp_lst")
-        xp_grp = myVars.read("xp_grp")
-        if my_debug:
-            print(TAG+f"xp_grp.hidden= {xp_grp.hidden}")
-            print(TAG+f"xp_grp[0].x= {xp_grp[0].x}, xp_grp[0].y= {xp_grp[0].y} ")
-            print(TAG+f"xp_grp[1].x= {xp_grp[1].x}, xp_grp[0].y= {xp_grp[1].y} ")
-            print(TAG+f"xp_grp[0]._text= {xp_grp[0]._text}")
-            print(TAG+f"xp_grp[1]._text= {xp_grp[1]._text}")
-            print(TAG+f"main_grp[0][2]= {main_grp[0][2]}")
-            #for _ in range(len(main_grp[0][2])):
-            #    print(TAG+f"dir(main_grp[0][2][{_}][0]) {dir(main_grp[0][2][_][0])}")
+        t0 = time.monotonic_ns()
+        main_grp = myState.main_grp
+        my_page_layout = myState.my_page_layout
+        xp_grp = myState.xp_grp
+        page_name = "Stats" if myState.stats_page else "XPlane"  # STATS_PAGE="1": keep the Stats page on the display
        
         if xp_grp is None:
             if not my_debug:
                 print(TAG+'error: xp_grp = {xp_grp}', file=sys.stderr)
             return
         if my_debug:
-            print(TAG+f"myVars.read(\'xp_grp\')= {xp_grp}", file=sys.stderr)
-            print(TAG+f"xp_lst= {xp_lst}", file=sys.stderr)
-        if my_have_tft:
-            if isinstance(self.hdg_alt_lst, list):
-                le = len(self.hdg_alt_lst)
-                if le == 0:
-                    self.hdg_alt_lst.append("no data")
-                    le = len(self.hdg_alt_lst)
+            print(TAG+f"xp_grp[0]._text= {xp_grp[0]._text}")
+            print(TAG+f"xp_grp[1]._text= {xp_grp[1]._text}")
+
+        try:
+            if self.hdg_latest is None or self.alt_latest is None:
+                if xp_grp[0].text != "no data":
+                    xp_grp[0].text = "no data"
+            else:
+                hdg_old = myState.hdg_old
+                alt_old = myState.alt_old
+                hdg = round(self.hdg_latest)
+                alt = round(self.alt_latest)
+                # Only touch the labels when the shown (rounded) value changed
+                if hdg != hdg_old or xp_grp[0].text == "no data":
+                    myState.hdg_old = hdg
+                    xp_grp[0].text = "Hdg " +str(hdg) + " " + self.hdg_unit
+                if alt != alt_old or len(xp_grp[1].text) == 0:
+                    myState.alt_old = alt
+                    xp_grp[1].text ="Alt " +str(alt) + " ft"
                 if my_debug:
-                    print(TAG+f"le = {le}")
-                if le > 0:
-                    if my_debug:
-                        print(TAG+"self.hdg_alt_lst= {}".format(self.hdg_alt_lst), file=sys.stderr)
-                    # Update this to change the size of the text displayed. Must be a whole number.
-                    # print(TAG, file=sys.stderr,end='')
-                    
-                    hdg_old = myVars.read("hdg_old")
-                    alt_old = myVars.read("alt_old")
-                    
-                    try:
-                        for _ in range(le):
-                            if _ == 0:
-                                hdg = round(int(self.hdg_alt_lst[_]))
-                                print(TAG+f"hdg = {hdg}, hdg_old = {hdg_old}")
-                                if hdg != hdg_old:
-                                    myVars.write("hdg_old", hdg)
-                                    disp_hdg_alt = True
-                                xp_grp[_].text = "Hdg " +str(hdg) + " mag"
-                                if my_debug:
-                                    print(TAG+f"xp_grp[{_}] = {xp_grp[_]}" )
-                                    print(TAG+f"xp_grp[{_}]._text= {xp_grp[_]._text}")
-                                print(TAG+'heading: {} '.format(self.hdg_alt_lst[_]), file=sys.stderr)
-                            if _ == 1:
-                                alt = round(int(self.hdg_alt_lst[_]))
-                                print(TAG+f"alt = {alt}, alt_old = {alt_old}")
-                                if alt != alt_old:
-                                    myVars.write("alt_old", alt)
-                                    disp_hdg_alt = True
-                                xp_grp[_].text ="Alt " +str(alt) + " ft"
-                                if my_debug:
-                                    print(TAG+f"xp_grp[{_}] = {xp_grp[_]}" )
-                                    print(TAG+f"xp_grp[{_}]._text= {xp_grp[_]._text}")
-                                print(TAG+'altitude: {} '.format(self.hdg_alt_lst[_]), file=sys.stderr)
-                        if not my_debug:
-                            print(TAG+f"hdg_old: {hdg_old}, alt_old: {alt_old}", file=sys.stderr)
-                        disp_hdg_alt = True  # Provoke showing page XPlane
-                        if disp_hdg_alt:
-                            display.root_group = main_grp  #ta1_grp
-                            my_page_layout.showing_page_name = "XPlane"
-                            if my_debug:
-                                print(TAG+f"showing page index: {my_page_layout.showing_page_index}")
-                                print(TAG+f"showing page name: {my_page_layout.showing_page_name}")
-                            #time.sleep(myVars.read("TFT_show_duration")) # in seconds
-                            time.sleep(1)
-                        # sys.exit()
-                    except KeyboardInterrupt:
-                        myVars.write("kbd_intr", True)
-                    # except Exception as e:
-                    #    print(TAG+'Error: {}'.format(e), file=sys.stderr)
-                time.sleep(2) # myVars.read("TFT_show_duration")) # in seconds
-                self.my_lcd_cleanup() # empty also self.hdg_alt_lst
-                # print(TAG+"showing page: main")
-                
-    def msgs_unpack(self, packet):
+                    print(TAG+f"hdg = {hdg}, hdg_old = {hdg_old}, alt = {alt}, alt_old = {alt_old}", file=sys.stderr)
+
+            if display.root_group is not main_grp:
+                display.root_group = main_grp
+            if my_page_layout.showing_page_name != page_name:
+                my_page_layout.showing_page_name = page_name
+                if my_debug:
+                    print(TAG+f"showing page index: {my_page_layout.showing_page_index}")
+                    print(TAG+f"showing page name: {my_page_layout.showing_page_name}")
+            # While packets flow the render stage owns the display refreshes
+            if display.auto_refresh:
+                display.auto_refresh = False
+            t1 = time.monotonic_ns()
+            stage_stats.add(STG_DISP, t1 - t0)
+            display.refresh()
+            t2 = time.monotonic_ns()
+            stage_stats.add(STG_REFRESH, t2 - t1)
+            if self.latest_rx_t:
+                # The first display update that shows the newest values
+                latency_probe.add(t2 - self.latest_rx_t, self.latest_sent_us)
+                self.latest_rx_t = 0
+        except KeyboardInterrupt:
+            myState.kbd_intr = True
+
+    # Function by Paulsk
+    # Decode the groups of a DATA packet, from offset start (after the 5 bytes header) up to offset end.
+    # Each group is 36 bytes: an int group ID followed by 8 values.
+    # The group ID selects the decoder in self.data_grps. Unknown groups are skipped.
+    # The groups are unpacked directly from the receive buffer. No slices (copies) are made.
+    def msgs_unpack(self, packet, start=0, end=None):
         TAG= tag_adjust("dg.msgs_unpack(): ")
         if my_debug:
             print(TAG+"Entering...", file=sys.stderr)
-        p_bytes = [36, 36, 36, 36]
-        p_unpack_strs = ['self.udp_unpack_str_3', 'self.udp_unpack_str_17', 'self.udp_unpack_str_20', 'self.udp_unpack_str_102']
         messages = []
-        if packet is not None:
-            if my_debug:
-                print(TAG+'packet length= {} bytes'.format(len(packet)), file=sys.stderr)
-                print(TAG+'unpacking packet {}\n'.format(packet), file=sys.stderr)
-            for _ in range(4):
-                if _ == 0:
-                    #s = values_struct_3
-                    s = self.udp_unpack_str_3
-                elif _ == 1:
-                    #s = values_struct_17
-                    s = self.udp_unpack_str_17
-                elif _ == 2:
-                    #s = values_struct_20
-                    s = self.udp_unpack_str_20 
-                elif _ == 3:
-                    #s = values_struct_102
-                    s = self.udp_unpack_str_102
-                    
-                s_size = struct.calcsize(s)
-                
-                if my_debug:
-                    print(TAG+'using unpack string: \'{}\', size= {} bytes, value= \'{}\''.format(p_unpack_strs[_], s_size, s), file=sys.stderr)
-
-                if _ == 0:
-                    i1 = 0
-                    #i2 = s_size-1      # bytes   0 -  35
-                elif _ == 1:
-                    i1 = p_bytes[0]
-                    #i2 = (2*s_size)-1  # bytes  35 -  71
-                elif _ == 2:
-                    i1 = p_bytes[0] + p_bytes[1] 
-                    #i2 = (3*s_size)-1  # bytes  72 - 107
-                elif _ == 3:
-                    i1 = p_bytes[0] + p_bytes[1] + p_bytes[2] 
-                    #i2 = (4*s_size)-1  # bytes 108 - 143
-                
-                #p0 = packet[i1:i2] 
+        if packet is None:
+            print(TAG+'unpacked messages empty')
+            return messages
+        grp_size = self.data_grp_size
+        if end is None:
+            end = len(packet)
+        nr_grps = (end - start) // grp_size
+        hdg_found = False
+        alt_found = False
+        if my_debug:
+            print(TAG+'packet length= {} bytes, nr of groups= {}'.format(end - start, nr_grps), file=sys.stderr)
+        for i1 in range(start, start + nr_grps * grp_size, grp_size):
+            # The group ID is a little endian int. All X-Plane group IDs fit in the lowest 2 bytes.
+            grp_id = packet[i1] | (packet[i1+1] << 8)
+            grp = self.data_grps.get(grp_id)
+            if grp is None:
+                self.unknown_grp_cnt += 1
                 if my_debug:
-                    print(TAG +'unpacking from offset (i1) = {}, sub-packet= {}'.format(i1, packet[i1:]), file=sys.stderr)
+                    print(TAG+'skipping unknown group {} at offset {}'.format(grp_id, i1), file=sys.stderr)
+                continue
+            s, fields, values = grp
+            try:
+                us = s.unpack_from(packet, i1)
+            except Exception as e:
+                print(TAG+f"Error: {e}", file=sys.stderr)
+                raise
+            if my_debug:
+                print(TAG+'group {}, us= {}\n'.format(grp_id, us), file=sys.stderr)
+            messages.append(us)
+            for i in range(len(fields)):
+                values[fields[i]] = us[i]
+            if grp_id == 17:
+                hdg_found = True
+            elif grp_id == 20:
+                alt_found = True
+
+        if hdg_found or alt_found:
+            # Keep only the newest values. The render stage (render_tick()) shows them.
+            if hdg_found:
+                self.hdg_latest = self.values_struct_17['hding_mag'] # mag compass heading
+                self.hdg_unit = "mag"
+            if alt_found:
+                self.alt_latest = self.values_struct_20['CG_ftmsl']  # altitude
+            self.render_pending = True
+            if self.latency_probe:
+                self.latest_rx_t = self.rx_t
+                # The traffic simulator (--probe) writes its send time into the unused int field of group 17.
+                # X-Plane fills it with the float -999.0 which, read as an int, is negative.
+                self.latest_sent_us = self.values_struct_17['nothing1'] if hdg_found else 0
+            if my_debug:
+                print(TAG+'self.hdg_latest= {}, self.alt_latest= {}'.format(self.hdg_latest, self.alt_latest), file=sys.stderr)
+        return messages
 
-                try:
-                    us = struct.unpack_from(s, packet, i1)
-                    if not my_debug:
-                        print(TAG+'us= {}\n'.format(us), file=sys.stderr)
-                    messages.append(us)
-                except exception as e:
-                    print(TAG+f"Error: {e}", file=sys.stderr)
-                    raise
-                
-                i = 0 # Index to us
-                               
-                if _ == 0:
-                    """
-                    self.values_struct_3 = { # udp_unpack_str01 = "iffffifff"
-                    'ID':          DUMMY_STR_INT,     # DATA and a NULL
-                    'vind_kias':   DUMMY_STR_FLOAT,   # FLOAT vind_kias   airspeed in knots indicated air speed
-                    'vind_keas':   DUMMY_STR_FLOAT,   # FLOAT vind_keas   airspeed in knots e... air speed
-                    'vtrue_ktas':  DUMMY_STR_FLOAT,   # FLOAT vtrue_ktas  true airspeed in knots
-                    'vtrue_ktgs':  DUMMY_STR_FLOAT,   # FLOAT vtrue_ktgs  true ground speed in knots
-                    'nothing':     DUMMY_STR_INT,     # INT filling
-                    'vind_mph':    DUMMY_STR_FLOAT,   # FLOAT vind_mph    indicated airspeed in miles-per-hour
-                    'vtrue_mphas': DUMMY_STR_FLOAT,   # FLOAT vtrue_mphas  true airspeed in miles-per-hour
-                    'vtrue_mphgs': DUMMY_STR_FLOAT    # FLOAT vtrue_mphgs  true groundspeed in miles-per-hour
-                    }
-                    """
-                    self.values_struct_3['ID']          = us[i]
-                    self.values_struct_3['vind_kias']   = us[i+1]
-                    self.values_struct_3['vind_keas']   = us[i+2]
-                    self.values_struct_3['vtrue_ktas']  = us[i+3]
-                    self.values_struct_3['vtrue_ktgs']  = us[i+4]
-                    self.values_struct_3['nothing']     = us[i+5]
-                    self.values_struct_3['vind_mph']    = us[i+6]
-                    self.values_struct_3['vtrue_mphas'] = us[i+7]
-                    self.values_struct_3['vtrue_mphgs'] = us[i+8]
-                    
-                    if my_debug:
-                        #print(TAG+'self.values_struct_3.keys() = {}\n'.format(self.values_struct_3.keys()), file=sys.stderr)
-                        print(TAG+'self.values_struct_3.items() = {}\n'.format(self.values_struct_3.items()), file=sys.stderr)
-                    
-                elif _ == 1:
-                    """
-                    self.values_struct_17 = { # udp_unpack_str02 = "ifffiffif"
-                    'ID':         DUMMY_STR_INT,
-                    'pitch_deg':  DUMMY_STR_FLOAT,
-                    'roll_deg':   DUMMY_STR_FLOAT,
-                    'hding_true': DUMMY_STR_FLOAT,
-                    'nothing1':   DUMMY_STR_INT,                   
-                    'hding_mag':  DUMMY_STR_FLOAT,
-                    'mavar_deg':  DUMMY_STR_FLOAT,
-                    'nothing2':   DUMMY_STR_INT,
-                    'mag_comp':   DUMMY_STR_FLOAT
-                    }
-                    """
-                    self.values_struct_17['ID']         = us[i]
-                    self.values_struct_17['pitch_deg']  = us[i+1]  
-                    self.values_struct_17['roll_deg']   = us[i+2]
-                    self.values_struct_17['hding_true'] = us[i+3]
-                    self.values_struct_17['nothing1']   = us[i+4]                
-                    self.values_struct_17['hding_mag']  = us[i+5]
-                    self.values_struct_17['mavar_deg']  = us[i+6]
-                    self.values_struct_17['nothing2']   = us[i+7]
-                    self.values_struct_17['mag_comp']   = us[i+8]
+    # Function by Paulsk
+    # Returns a DSEL or USEL message: the 5 bytes header followed by an int for each DATA group ID
+    def make_sel_msg(self, hdr, grps):
+        msg = bytearray(5 + 4 * len(grps))
+        msg[0:5] = hdr
+        for i in range(len(grps)):
+            struct.pack_into("<i", msg, 5 + 4 * i, grps[i])
+        return msg
+
+    # Function by Paulsk
+    # Handle the beacon (BECN) in self.packet. It goes to the beacon tracker (see: XPlaneBeacon.py).
+    # After the first beacon, or again when X-Plane moved to another computer or port or has been restarted: see xp_connect().
+    # Returns 0: a beacon is not an X-Plane data packet (see: dispatch())
+    def handle_beacon(self, hdr_id=HDR_BECN):
+        change = beacon_tracker.update(self.packet, self.size, self.sender)
+        if change < 0 or (not self.data_select and self.rpos_hz <= 0 and self.dr is None):
+            return 0
+        if change == BECN_SAME and self.xp_dest is not None \
+           and self.dsel_sent == self.data_select and self.rpos_sent == (self.rpos_hz > 0) \
+           and (self.dr is None or self.dr.subscribed):
+            return 0
+        self.xp_connect(beacon_tracker.dest())
+        return 0
+
+    # Function by Paulsk
+    # Send the requests to X-Plane at dest (IP-address, port):
+    # with DATA_SELECT="1": select the DATA groups of the pages, with RPOS_HZ > 0: request the RPOS packets,
+    # with an attached dr (see: attach_dr()): subscribe the datarefs of the setting DATAREFS.
+    def xp_connect(self, dest):
+        TAG= tag_adjust("dg.xp_connect(): ")
+        self.xp_dest = dest
+        print(TAG+f"X-Plane at {dest[0]}, port {dest[1]}", file=sys.stderr)
+        if self.data_select:
+            self.DataSelect()
+        if self.rpos_hz > 0:
+            self.RposRequest(self.rpos_hz)
+        if self.dr is not None:
+            self.dr.Subscribe(dest)
+
+    # Function by Paulsk
+    # Ask X-Plane to send RPOS packets, hz per second, to this socket. hz = 0 stops them.
+    # The request is "RPOS" + NULL + the frequency as text + NULL
+    def RposRequest(self, hz):
+        TAG= tag_adjust("dg.RposRequest(): ")
+        if self.xp_dest is None:
+            return False
+        if self.my_DataGram_sock is None:
+            self.OpenUDPSocket(True)  # PERSISTENT_RX="0": closed after the last receive
+            if self.my_DataGram_sock is None:
+                print(TAG+f"No socket. RPOS request ({hz} Hz) not sent", file=sys.stderr)
+                return False
+        try:
+            self.my_DataGram_sock.sendto(b"RPOS\x00" + str(hz).encode() + b"\x00", self.xp_dest)
+        except OSError as e:
+            print(TAG+f"Error: {e}", file=sys.stderr)
+            return False
+        self.rpos_sent = hz > 0
+        print(TAG+f"RPOS requested at {hz} Hz", file=sys.stderr)
+        return True
+
+    # Function by Paulsk
+    # Decode the RPOS packet in self.packet into the slotted record self.rpos. Feeds the render stage.
+    # Returns self.rpos_msgs (a list with the record), or [] if the packet is too short
+    def rpos_unpack(self):
+        if self.size < 5 + self.rpos_struct.size:
+            self.xpkt_bad_cnt += 1
+            return []
+        r = self.rpos
+        (r.dat_lon, r.dat_lat, r.dat_ele, r.y_agl_mtr, r.veh_the_loc, r.veh_psi_loc, r.veh_phi_loc,
+         r.vx_wrl, r.vy_wrl, r.vz_wrl, r.Prad, r.Qrad, r.Rrad) = self.rpos_struct.unpack_from(self.packet, 5)
+        self.hdg_latest = r.veh_psi_loc
+        self.alt_latest = r.dat_ele * 3.28084  # meters to feet
+        self.hdg_unit = "true"
+        self.render_pending = True
+        if self.latency_probe:
+            self.latest_rx_t = self.rx_t
+            self.latest_sent_us = 0
+        return self.rpos_msgs
+
+    # Function by Paulsk
+    # Ask X-Plane to send the DATA groups needed by the pages and to stop sending the other ones
+    def DataSelect(self):
+        TAG= tag_adjust("dg.DataSelect(): ")
+        if self.xp_dest is None or self.my_DataGram_sock is None:
+            return False
+        try:
+            self.my_DataGram_sock.sendto(self.dsel_msg, self.xp_dest)
+            if len(self.usel_unused_msg) > 5:
+                self.my_DataGram_sock.sendto(self.usel_unused_msg, self.xp_dest)
+        except OSError as e:
+            print(TAG+f"Error: {e}", file=sys.stderr)
+            return False
+        self.dsel_sent = True
+        print(TAG+f"DATA groups selected: {self.dsel_grps}", file=sys.stderr)
+        return True
+
+    # Function by Paulsk
+    # Called at the end of main(): ask X-Plane to stop sending the DATA groups selected by DataSelect()
+    def DataDeselect(self):
+        TAG= tag_adjust("dg.DataDeselect(): ")
+        if not self.dsel_sent:
+            return False
+        if self.my_DataGram_sock is None:
+            self.OpenUDPSocket(True)  # PERSISTENT_RX="0": closed after the last receive
+            if self.my_DataGram_sock is None:
+                print(TAG+"No socket. DATA groups not deselected", file=sys.stderr)
+                return False
+        try:
+            self.my_DataGram_sock.sendto(self.usel_msg, self.xp_dest)
+        except OSError as e:
+            print(TAG+f"Error: {e}", file=sys.stderr)
+            return False
+        self.dsel_sent = False
+        print(TAG+"DATA groups deselected", file=sys.stderr)
+        return True
+
+    # Function by Paulsk
+    # Decode the XGPS, XATT or XTRA packet in self.packet into the record of its decoder (see: self.xpkt_decoders).
+    # The values are separated by commas. The header (e.g. "XGPS1") ends at the first comma.
+    # Returns the record, or [] if a value is not a number.
+    def xpkt_unpack(self, hdr_id):
+        TAG= tag_adjust("dg.xpkt_unpack(): ")
+        packet = self.packet
+        end = self.size
+        fields, units, skip, rec = self.xpkt_decoders[hdr_id]
+        nr = len(rec)
+        n = 0
+        fld = -1 - skip  # <0: the header and the text fields before the values
+        start = 0
+        try:
+            for i in range(4, end + 1):
+                if i < end and packet[i] != 44:  # 44 = ','
+                    continue
+                if fld >= 0 and n < nr:
+                    rec[n] = float(packet[start:i])
+                    n += 1
+                fld += 1
+                if i < end:
+                    start = i + 1
+        except ValueError as e:
+            self.xpkt_bad_cnt += 1
+            if my_debug:
+                print(TAG+f"Error: {e}. Packet: {packet[:end]}", file=sys.stderr)
+            return []
+        if n < nr:
+            self.xpkt_bad_cnt += 1
+            return []
+        if hdr_id == HDR_XTRA and fld > nr:
+            self.xtra_tail = packet[start:end].decode()  # the last field
+        elif hdr_id == HDR_XGPS:
+            # Position and track of the own aircraft: feed the render stage, like DATA groups 17 and 20
+            self.hdg_latest = rec[XGPS_HDG]
+            self.alt_latest = rec[XGPS_ALT] * 3.28084  # meters to feet
+            self.hdg_unit = "true"
+            self.render_pending = True
+            if self.latency_probe:
+                self.latest_rx_t = self.rx_t
+                self.latest_sent_us = 0
+        return rec
 
-                    if my_debug:
-                        #print(TAG+'self.values_struct_17.keys() = {}\n'.format(self.values_struct_17.keys()), file=sys.stderr)
-                        print(TAG+'self.values_struct_17.items() = {}\n'.format(self.values_struct_17.items()), file=sys.stderr)
-                    
-                elif _ == 2:
-                    """
-                    self.values_struct_20 = { # udp_unpack_str03 = "iffffffff"
-                    'ID':          DUMMY_STR_INT,
-                    'lat_deg':     DUMMY_STR_FLOAT,
-                    'lon_deg':     DUMMY_STR_FLOAT,
-                    'CG_ftmsl':    DUMMY_STR_FLOAT,
-                    'gear_ftagl':  DUMMY_STR_FLOAT,
-                    'terrn_ftmsl': DUMMY_STR_FLOAT,
-                    'p-alt_ftmsl': DUMMY_STR_FLOAT,
-                    'lat_orign':   DUMMY_STR_FLOAT,
-                    'lon_orign':   DUMMY_STR_FLOAT
-                    }
-                    """
-                    self.values_struct_20['ID']          = us[i]
-                    self.values_struct_20['lat_deg']     = us[i+1]
-                    self.values_struct_20['lon_deg']     = us[i+2]
-                    self.values_struct_20['CG_ftmsl']    = us[i+3]
-                    self.values_struct_20['gear_ftagl']  = us[i+4]
-                    self.values_struct_20['terrn_ftmsl'] = us[i+5]
-                    self.values_struct_20['p-alt_ftmsl'] = us[i+6]
-                    self.values_struct_20['lat_orign']   = us[i+7]
-                    self.values_struct_20['lon_orign']   = us[i+8]
-                    
-                    if my_debug:
-                        #print(TAG+'self.values_struct_20.keys() = {}\n'.format(self.values_struct_20.keys()), file=sys.stderr)
-                        print(TAG+'self.values_struct_20.items() = {}\n'.format(self.values_struct_20.items()), file=sys.stderr)
-                    
-                elif _ == 3:
-                    """
-                    self.values_struct_102 = { #  "iffffffii"  on: 2019-05-01 18h23PT udp_unpack_str04 = iiiiiiiif  --> old: "<ifffiiiff"  --> old unpack string: "ifiifffif"
-                    'ID':         DUMMY_STR_INT,
-                    'dme_nav01':  DUMMY_STR_FLOAT, # dme of nav1
-                    'dme_mode':   DUMMY_STR_FLOAT, # dme mode (1 = dme1, 2= dme2)
-                    'dme_found':  DUMMY_STR_FLOAT, # dme found  1.0000
-                    'dme_dist':   DUMMY_STR_FLOAT, # dme distance (nm)
-                    'dme_speed':  DUMMY_STR_FLOAT, # dme speed    (kts)
-                    'dme_time':   DUMMY_STR_FLOAT, # dme_time (time-to-station)
-                    'dme_n-typ':  DUMMY_STR_INT,   # dme n-typ (3.0000)
-                    'dme-3_freq': DUMMY_STR_INT,   # dme3 freq (this is the 3rd, dme receiver (usually not reacheable)
-                    }            
-                    """
-                    self.values_struct_102['ID']         = us[i]
-                    self.values_struct_102['dme_nav01']  = us[i+1]
-                    self.values_struct_102['dme_mode']   = us[i+2]
-                    self.values_struct_102['dme_found']  = us[i+3]
-                    self.values_struct_102['dme_dist']   = us[i+4]
-                    self.values_struct_102['dme_speed']  = us[i+5]
-                    self.values_struct_102['dme_time']   = us[i+6]
-                    self.values_struct_102['dme_n-typ']  = us[i+7]
-                    self.values_struct_102['dme-3_freq'] = us[i+8]    
-                    
-                    if my_debug:
-                        #print(TAG+'self.values_struct_102.keys() = {}\n'.format(self.values_struct_102.keys()), file=sys.stderr)
-                        print(TAG+'self.values_struct_102.items() = {}\n'.format(self.values_struct_102.items()), file=sys.stderr)                
-  
-            le = len(messages)
-            if le > 0:
-                #print(TAG+'messages = {}'.format(messages), file=sys.stderr)
-                if my_debug: 
-                    for _ in range(le):
-                        print(TAG+'unpacked messege nr {} = \'{}\''.format(_+1, messages[_]), file=sys.stderr)
-                self.hdg_alt_lst.append(self.values_struct_17['hding_mag']) # mag compass heading
-                self.hdg_alt_lst.append(self.values_struct_20['CG_ftmsl']) # altitude
-                if my_debug:
-                    print(TAG+'self.hdg_alt_lst= {}'.format(self.hdg_alt_lst), file=sys.stderr)
-        else:
-            print(TAG+'unpacked messages empty')
-        return messages
     # ==============================================================
     # Two functions copied from: XPlane10UdpDataOutputReceiver.py  =
     # ==============================================================
 
     # Function copied from Charlylima's example file: XPlane10UdpDataOutputReceiver.py
     # Modifications, additions and documentary by Paulsk
-    def DecodePacket(self):
+    def DecodePacket(self, hdr_id=None):
         global my_debug
         TAG= tag_adjust("dg.DecodePacket(): ")
         if my_debug:
@@ -858,58 +1258,41 @@ class XPlaneUdpDatagram():
         #  self.retval = []  # Do not empty the list here. It's done in dg.__init()
         headerlen = 5
 
-        # Convert packet header (bytearray) to string
-        header0 = self.packet[:headerlen-1]
-        header = ''
-            
-        for _ in range(len(header0)):
-            header += chr(header0[_])
-
-        if not my_debug:
-            print(TAG+'Going to decode packet with header \'{}\''.format(header), file=sys.stderr)
-
-        # Packet consists of 4 byte ASCII string header, 1 byte pad character and 9 items of each 4 bytes (=36 bytes) messages.
-        # copy message part of the parameter variable to self.packet (skip the first comma delimiter)
-        tail0 = self.packet[headerlen:]
+        if hdr_id is None:
+            hdr_id = get_header_id(self.packet)
         if my_debug:
-            print(TAG+'packet tail0 = \'{}\''.format(tail0), file=sys.stderr)
-            print(TAG+'going to unpack packet {}'.format(tail0), file=sys.stderr)
-        self.messages = self.msgs_unpack(tail0)
+            print(TAG+'Going to decode packet with header \'{}\''.format(udp_packet_types_str[hdr_id] if hdr_id >= 0 else '?'), file=sys.stderr)
+
+        t0 = time.monotonic_ns()
+        if hdr_id == HDR_DATA:
+            # Packet consists of 4 byte ASCII string header, 1 byte pad character and 9 items of each 4 bytes (=36 bytes) messages.
+            # The messages are unpacked from offset headerlen up to the nr of bytes received, directly from self.packet
+            self.messages = self.msgs_unpack(self.packet, headerlen, self.size)
+        elif hdr_id == HDR_RPOS:
+            self.messages = self.rpos_unpack()
+        elif hdr_id in self.xpkt_used:
+            self.messages = self.xpkt_unpack(hdr_id)
+        else:
+            self.xpkt_skipped_cnt += 1
+        stage_stats.add(STG_DECODE, time.monotonic_ns() - t0)
         if my_debug:
             print(TAG+'unpacked messages= {}'.format(self.messages), file=sys.stderr)
 
         # We have an udp datagram!
-        myVars.write("xp_lst", self.messages) # save it
+        myState.xp_lst = self.messages # save it
 
         #self.DispMessage(header, self.messages)
         #gc.collect()
 
 
-    def DispMessage(self, header): # , msg_lst):
+    def DispMessage(self, header, hdr_id=None): # , msg_lst):
         TAG= tag_adjust("dg.DispMessage(): ")
-        if not my_debug:
+        if my_debug:
             print(TAG+"Entering...")
         ln = '-'*40
         s = ''
-        main_grp = myVars.read("main_grp")
-        my_page_layout = myVars.read("my_page_layout")
-        xp_grp = myVars.read("xp_grp")
-        if my_debug:
-            print(TAG+f"xp_grp = {xp_grp}")
-        ptu = myVars.read("packet_types_used")
-        loop_nr = myVars.read("main_loop_nr")
-
-        if 'XGPS' in ptu:
-            xgps_lst = ['LON', 'LAT', 'ALT', 'HDG',  'GS']
-            xgps_lst_2 = ['',  '',    'm',   'true', 'm/s']
-
-        if 'XATT' in ptu:
-            xatt_lst =   ['HDG', 'PITCH', 'ROLL', 'Roll-rate','Pitch-rate', 'Yaw-rate', 'SPD_TRUE_EAST', 'SPD_TRUE_UP', 'SPD_TRUE_SOUTH', 'G-Load side', 'G-Load normal', 'G-Load axial']
-            xatt_lst_2 = ['true', 'degs', 'degs', 'rad/s',    'rad/s',      'rad/s',    'm/s',           'm/s',          'm/s',           'G',           'G',             'G',]
-
-        if 'XTRA' in ptu:
-            xtra_lst   = ['LAT', 'LON', 'ALT', 'V/S',    'ON_GND',     'HDG',  'GS',  'TAIL NR']
-            xtra_lst_2 = ['',    '',    'ft',  'ft/min', 'True/False', 'true', 'kts', '']
+        ptu = myState.packet_types_used
+        loop_nr = myState.main_loop_nr
 
         le = len(self.messages) # msg_lst)
 
@@ -918,18 +1301,19 @@ class XPlaneUdpDatagram():
         if le == 0:
             print(TAG+'self.messages is empty. Exiting...', file=sys.stderr)
         else:
-            if not my_debug:
-                print(TAG+f"header= \'{header}\'. self.messages= {self.messages}", file=sys.stderr)
-            #print(TAG+'hasattr(xp_grp[0],"text")= {}'.format(hasattr(xp_grp[0],"text")), file=sys.stderr)
             if my_debug:
+                print(TAG+f"header= \'{header}\'. self.messages= {self.messages}", file=sys.stderr)
                 print(TAG+f"Packet types used= {ptu}", file=sys.stderr)
 
-            if header == 'DATA':
+            if header == 'DATA' or header == 'RPOS':
                 if my_have_tft:
-                    self.disp_hdg_alt()
+                    self.render_tick()
                     return
             elif header in ptu:
-                #print(TAG, file=sys.stderr)
+                if hdr_id is None:
+                    hdr_id = udp_packet_types_rev[header.encode()]
+                # The field names and units of the decoder (see: self.xpkt_decoders)
+                fields, units, skip, rec = self.xpkt_decoders[hdr_id]
                 if not my_debug:
                     print(TAG+'Loop nr: {:03d}'.format(loop_nr), file=sys.stderr)
                 print(ln, file=sys.stderr)
@@ -937,80 +1321,20 @@ class XPlaneUdpDatagram():
                 print(ln, file=sys.stderr)
                 try:
                     for _ in range(le):
-                            if my_debug:
-                                print(TAG+f"first loop: index= {_}", file=sys.stderr)
-                            if header == 'XGPS':
-                                s = '\t{:14s} {:8.4f} {:s}'.format(xgps_lst[_], float(self.messages[_]), xgps_lst_2[_])
-                            elif header == 'XATT':
-                                s = '\t{:14s} {:8.4f} {:s}'.format(xatt_lst[_], float(self.messages[_]), xatt_lst_2[_])
-                            elif header == 'XTRA':
-                                s = '\t{:14s} {:8.4f} {:s}'.format(xtra_lst[_], float(self.messages[_]), xtra_lst_2[_])
-                            if len(s) > 0:
-                                print(s, file=sys.stderr)
-                    #if header == 'XGPS':
-                    #    print(ln, file=sys.stderr)
+                        s = '\t{:14s} {:8.4f} {:s}'.format(fields[_], self.messages[_], units[_])
+                        print(s, file=sys.stderr)
+                    if hdr_id == HDR_XTRA:
+                        print('\t{:14s} {:s}'.format('TAIL NR', self.xtra_tail), file=sys.stderr)
                     print(ln, file=sys.stderr)
-                #except Exception as e:
-                #    print(TAG+'Error {}'.format(e), file=sys.stderr)
-                #    raise RuntimeError
+                    # Example XATT packet received and decoded:
+                    # self.messages= array('d', [-123.8, 0.6, 0.4, 0.0, -0.0, 0.0, -64.9, -0.6, 41.9, -0.01, 1.0, -0.0])
+                    if hdr_id == HDR_XGPS and my_have_tft:
+                        # xpkt_unpack() stored the track and altitude for the render stage
+                        self.render_tick()
+                        neo_signal.start(NEO_PAT_PKT) # flicker the Neopixel led in green (see: common.py)
                 except KeyboardInterrupt:
-                    myVars.write("kbd_intr", True)
+                    myState.kbd_intr = True
                     raise
-            
-            #print('\n', file=sys.stderr)
-            #time.sleep(0.5)
-
-            # print(TAG+'type(myVars)= {}'.format(type(myVars)), file=sys.stderr)
-
-            # Example XATT packet received and converted to a list:
-            # self.messages= ['-123.8', '0.6', '0.4', '0.0000', '-0.0000', '0.0000', '-64.9', '-0.6', '41.9', '-0.01', '1.00', '-0.0']
-
-            if my_debug:
-                print(TAG+'Adding {} packet elements to display:'.format(header), file=sys.stderr)
-            # print(TAG+'xp_grp[0]= {}'.format(xp_grp[0]), file=sys.stderr)
-            # print(TAG+'xp_grp[1]= {}'.format(xp_grp[1]), file=sys.stderr)
-            # print(TAG+'xp_grp[2]= {}'.format(xp_grp[2]), file=sys.stderr)
-
-            if header in ptu:
-                try:
-                    for _ in range(le):
-                            if my_debug:
-                                print(TAG+f"second loop: index= {_}", file=sys.stderr)
-                            #xp_grp[_].scale = 2
-                            if header == 'XGPS':
-                                s = '{} {} {}'.format(xgps_lst[_], self.messages[_], xgps_lst_2[_])
-                            elif header == 'XATT':
-                                s = '{} {} {}'.format(xatt_lst[_], self.messages[_], xatt_lst_2[_])
-                            elif header == 'XTRA':
-                                s = '{} {} {}'.format(xtra_lst[_], self.messages[_], xtra_lst_2[_])
-
-                    if header == 'XGPS':
-                        hdg = round(float(self.messages[3])) # round the heading value
-                        if my_debug:
-                            print(TAG+'hdg= {}'.format(hdg), file=sys.stderr)
-                        s = '{} {} {}'.format(xgps_lst[3], hdg, xgps_lst_2[3])
-                        if my_debug:
-                            print(TAG+'Adding {} element {}'.format(header, s), file=sys.stderr)
-                        xp_grp[0].scale=2
-                        xp_grp[0]._text = 'X-Plane ' + myVars.read('xplane_version')
-                        xp_grp[1].scale=3
-                        xp_grp[1]._text = header
-                        xp_grp[2].scale=3
-                        xp_grp[2]._text = s
-                        #print(TAG+'type(my_page_layout)= {}'.format(type(my_page_layout)), file=sys.stderr)
-                        myVars.write("xp_grp", xp_grp)
-                        display.root_group = main_grp  #ba_grp
-                        my_page_layout.showing_page_name = "XPlane"
-                        if my_debug:
-                            print(TAG+f"showing page index: {my_page_layout.showing_page_index}")
-                            print(TAG+f"showing page name: {my_page_layout.showing_page_name}")    
-                        blink_NEO_color(neo_led_green) # blink the Neopixel led in green (see: common.py)
-                        time.sleep(myVars.read("TFT_show_duration")) # in seconds
-                except KeyboardInterrupt:
-                    myVars.write("kbd_intr", True)
-                #except Exception as e:
-                #    print(TAG+'Error {}'.format(e), file=sys.stderr)
-                #    raise RuntimeError
 
     # Function by Paulsk
     def my_lcd_cleanup(self):
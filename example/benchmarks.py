@@ -0,0 +1,357 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+#
+# Benchmark suite for the hot paths of the receive -> decode -> display pipeline:
+# - dg.msgs_unpack() and dg.DecodePacket() of a DATA packet with 4 groups (3, 17, 20 and 102)
+# - dg.xpkt_unpack() of an XGPS packet and dg.rpos_unpack() of an RPOS packet
+# - dr.GetValues() of a RREF reply with 1, 10 and 100 datarefs
+# - dr.AddDataRef(): unsubscribe and subscribe again one of 100 datarefs (subscription churn)
+# - dr.AddDataRef(): another frequency for one of 100 datarefs, dr.Resubscribe() of 100 datarefs and dr.SetDataRef() (DREF)
+# - myVars.read() / myVars.write() of the gVars compatibility layer, and direct myState access for comparison
+# - tag_adjust()
+# - label text updates: a label.text assignment, dg.disp_hdg_alt() and dg.DispMessage("DATA")
+#
+# The packets are not received from the network. A BenchSock object returns the same prepared packet for every call.
+#
+# For each case the script reports:
+#   ops/s   operations per second (time.monotonic_ns(), the loop overhead subtracted)
+#   ns/op   duration of one operation
+#   B/op    on the device: bytes allocated per operation (gc.mem_free() delta with the garbage collector disabled)
+#           on a host: the average tracemalloc peak of one operation, above the memory in use before it.
+#           CPython frees garbage at once, so this peak stands for the bytes the operation allocated
+#   peak B  the largest amount of heap one operation needed (device: gc.mem_free() delta, host: tracemalloc peak)
+# The results are written to a JSON file (on a host without a file name: printed to stdout as JSON). compare() lists the differences between two result files,
+# so that a regression shows up when the results of two versions are compared.
+#
+# Usage, on the device in the REPL (writing the JSON file needs: storage.remount("/", readonly=False) in boot.py):
+#   >>> import benchmarks
+#   >>> benchmarks.run("/bench.json")
+#   >>> benchmarks.compare("/bench_old.json", "/bench.json")
+#
+# Usage, on a host computer (see: host/run_host.py):
+#   python host/run_host.py benchmarks.py [<results.json> [<results of a previous version.json>]]
+#
+#type:ignore
+from common import *
+from XPlaneUdpDatagram import XPlaneUdpDatagram
+from XPlaneDatarefRx import XPlaneDatarefRx
+from adafruit_display_text import label
+import terminalio
+import time
+import sys
+import gc
+import struct
+import json
+try:
+    import tracemalloc  # CPython only
+except ImportError:
+    tracemalloc = None
+
+BENCH_VERSION = 1
+# On the device the garbage collector is disabled while the allocations are counted.
+# So only a few operations are done, to stay far below the free heap
+DEV_MEM_N = 20
+REGRESSION_PCT = 10  # compare(): a case is reported as a regression if it is this % slower
+
+# Stand-in for the receive socket. Returns the same packet for every call
+class BenchSock:
+    def __init__(self, packet):
+        self.packet = packet
+        self.sender = ("192.168.1.96", 49000)
+
+    def recvfrom(self, bufsize):
+        return self.packet, self.sender
+
+    def recvfrom_into(self, buf, bufsize=0):
+        n = len(self.packet)
+        buf[:n] = self.packet
+        return n, self.sender
+
+    def sendto(self, buf, address):
+        return len(buf)
+
+    def settimeout(self, value):
+        pass
+
+    def close(self):
+        pass
+
+# A DATA packet with the groups that X-Plane sends for this project: 3, 17, 20 and 102
+def make_data_packet(dg):
+    packet = bytearray(5 + len(dg.data_grps) * dg.data_grp_size)
+    packet[0:5] = b"DATA\x00"
+    values = {
+          3: (3,   101.5, 100.2, 104.8, 98.7, -999, 116.8, 120.6, 113.6),
+         17: (17,  2.5,   -1.25, 274.5, -999, 271.8, -2.7,  -999,  271.9),
+         20: (20,  38.72, -9.14, 4512.0, 3800.5, 711.5, 4498.0, 38.0, -9.0),
+        102: (102, 0.0,   0.0,   0.0,   0.0,  0.0,   0.0,   0,     0),
+    }
+    ofs = 5
+    for grp_id in (3, 17, 20, 102):
+        s = dg.data_grps[grp_id][0]
+        s.pack_into(packet, ofs, *values[grp_id])
+        ofs += dg.data_grp_size
+    return packet
+
+# A RREF reply with nr_values (index, value) pairs
+def make_rref_packet(nr_values):
+    packet = bytearray(5 + 8 * nr_values)
+    packet[0:5] = b"RREF,"
+    for i in range(nr_values):
+        struct.pack_into("<if", packet, 5 + 8 * i, i, 100.0 + i)
+    return bytes(packet)
+
+def make_dr(nr_values):
+    dr = XPlaneDatarefRx()
+    dr.my_DataRef_sock = BenchSock(make_rref_packet(nr_values))
+    dr.BeaconData = {"IP": "127.0.0.1"}
+    for i in range(nr_values):
+        dr.AddDataRef("sim/bench/dataref_{:03d}".format(i), freq=20)
+    # GetValues() calls these. The BenchSock sends nothing back, so the resubscription would run inside the timed loop
+    dr.resub_tick = lambda: False
+    dr.write_tick = lambda: 0
+    return dr
+
+# The XPlane page, like create_groups() in code.py builds it. Only if code.py did not do it already
+def make_xp_grp():
+    if myState.xp_grp is not None:
+        return
+    xp_grp = displayio.Group()
+    for j in range(3):
+        text_area = label.Label(terminalio.FONT, text='', x = 10, y = 10, scale=3, color=0x00FF00, save_text=True)
+        text_area.anchor_point = (0.5, 0.5)
+        text_area.anchored_position = (120, 40 + (j*40))
+        xp_grp.append(text_area)
+    myState.xp_grp = xp_grp
+    myState.my_page_layout.add_content(xp_grp, "XPlane")
+    myState.main_grp.append(myState.my_page_layout)
+
+def noop():
+    pass
+
+# Time n calls of fn. Returns the duration in nanoseconds
+def time_case(fn, n):
+    t0 = time.monotonic_ns()
+    for _ in range(n):
+        fn()
+    return time.monotonic_ns() - t0
+
+# Returns (bytes per operation, peak bytes of one operation). (None, None) if not measurable
+def mem_case(fn, n):
+    gc.collect()
+    if tracemalloc is not None:
+        # CPython frees garbage at once, so the memory still in use after the case says nothing.
+        # Per operation the peak above the memory in use before it is taken: the bytes the operation allocated.
+        tracemalloc.start()
+        total = 0
+        peak = 0
+        for _ in range(n):
+            tracemalloc.reset_peak()
+            m0 = tracemalloc.get_traced_memory()[0]
+            fn()
+            d = tracemalloc.get_traced_memory()[1] - m0
+            total += d
+            if d > peak:
+                peak = d
+        tracemalloc.stop()
+        return total / n, peak
+    if not hasattr(gc, "mem_free"):
+        return None, None
+    n = min(n, DEV_MEM_N)
+    peak = 0
+    gc.disable()
+    try:
+        f0 = gc.mem_free()
+        for _ in range(n):
+            f = gc.mem_free()
+            fn()
+            d = f - gc.mem_free()
+            if d > peak:
+                peak = d
+        f1 = gc.mem_free()
+    except MemoryError:
+        return None, None
+    finally:
+        gc.enable()
+    return (f0 - f1) / n, peak
+
+def get_cases():
+    TAG = tag_adjust("benchmarks.get_cases(): ")
+    print(TAG+"preparing the cases", file=sys.stderr)
+    dg = XPlaneUdpDatagram()
+    data_packet = make_data_packet(dg)
+    data_size = len(data_packet)
+    dg.packet[:data_size] = data_packet
+    dg.size = data_size
+    dg.render_interval = 0  # render every frame
+    make_xp_grp()
+    xgps_packet = b"XGPS1,-9.130000,38.780000,1219.2,90.00,66.9"
+    xgps_size = len(xgps_packet)
+    rpos_packet = b"RPOS4" + struct.pack("<dddffffffffff", -9.13, 38.78, 1219.2, 1173.5, 2.5, 274.5, -1.25, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    rpos_size = len(rpos_packet)
+    hdgs = (271.8, 272.9)   # alternate, so the rounded value and the label change for every frame
+    dr1 = make_dr(1)
+    dr10 = make_dr(10)
+    dr100 = make_dr(100)
+    xp_lbl = myState.xp_grp[0]
+    texts = ("Hdg 271 mag", "Hdg 272 mag")
+    cnt = [0]
+
+    def msgs_unpack():
+        dg.msgs_unpack(dg.packet, 5, data_size)
+
+    def decode_packet():
+        dg.DecodePacket(HDR_DATA)
+
+    def xgps_unpack():
+        dg.packet[:xgps_size] = xgps_packet
+        dg.size = xgps_size
+        dg.xpkt_unpack(HDR_XGPS)
+        dg.packet[:data_size] = data_packet
+        dg.size = data_size
+
+    def rpos_unpack():
+        dg.packet[:rpos_size] = rpos_packet
+        dg.size = rpos_size
+        dg.rpos_unpack()
+        dg.packet[:data_size] = data_packet
+        dg.size = data_size
+
+    def dataref_churn():
+        dr100.AddDataRef("sim/bench/dataref_050", freq=0)
+        dr100.AddDataRef("sim/bench/dataref_050", freq=20)
+
+    freqs = (10, 20)
+
+    def dataref_freq():
+        cnt[0] ^= 1
+        dr100.AddDataRef("sim/bench/dataref_050", freq=freqs[cnt[0]])
+
+    def set_dataref():
+        cnt[0] ^= 1
+        dr100.SetDataRef("sim/bench/dataref_050", hdgs[cnt[0]])
+
+    def state_write():
+        myState.hdg_old = 1
+
+    def label_text():
+        cnt[0] ^= 1
+        xp_lbl.text = texts[cnt[0]]
+
+    def disp_hdg_alt():
+        cnt[0] ^= 1
+        dg.hdg_latest = hdgs[cnt[0]]
+        dg.disp_hdg_alt()
+
+    def disp_message():
+        cnt[0] ^= 1
+        dg.hdg_latest = hdgs[cnt[0]]
+        dg.render_pending = True
+        dg.DispMessage("DATA")
+
+    # (name, function, divisor of the nr of operations)
+    return (
+        ("msgs_unpack DATA x4",    msgs_unpack,              1),
+        ("DecodePacket DATA x4",   decode_packet,            1),
+        ("xpkt_unpack XGPS",       xgps_unpack,              1),
+        ("rpos_unpack RPOS",       rpos_unpack,              1),
+        ("GetValues RREF x1",      dr1.GetValues,            1),
+        ("GetValues RREF x10",     dr10.GetValues,           4),
+        ("GetValues RREF x100",    dr100.GetValues,          20),
+        ("AddDataRef churn x100",  dataref_churn,            4),
+        ("AddDataRef freq x100",   dataref_freq,             4),
+        ("Resubscribe x100",       dr100.Resubscribe,        100),
+        ("SetDataRef DREF",        set_dataref,              4),
+        ("myVars.read()",          lambda: myVars.read("hdg_old"), 1),
+        ("myVars.write()",         lambda: myVars.write("hdg_old", 1), 1),
+        ("myState.x (read)",       lambda: myState.hdg_old,  1),
+        ("myState.x = v",          state_write,              1),
+        ("tag_adjust()",           lambda: tag_adjust("dg.GetUDPDatagram(): "), 1),
+        ("label.text = s",         label_text,               4),
+        ("disp_hdg_alt()",         disp_hdg_alt,             20),
+        ("DispMessage DATA",       disp_message,             20),
+    )
+
+def run(fn=None, n=None):
+    TAG = tag_adjust("benchmarks.run(): ")
+    on_host = tracemalloc is not None
+    if n is None:
+        n = 20000 if on_host else 500
+    cases = get_cases()
+    hdg_old = myState.hdg_old  # restore after the test
+    results = {}
+    print(TAG+f"{n} iterations per case (fewer for the slow cases). Loop overhead subtracted.", file=sys.stderr)
+    print(TAG+"{:22s} {:>10s} {:>10s} {:>9s} {:>8s}".format("case", "ops/s", "ns/op", "B/op", "peak B"), file=sys.stderr)
+    for name, f, div in cases:
+        m = max(n // div, 1)
+        f()  # warm up: the first call can allocate caches
+        t_loop = time_case(noop, m)
+        t = time_case(f, m)
+        ns_op = max(t - t_loop, 0) / m
+        ops_s = 1000000000 / ns_op if ns_op > 0 else 0
+        alloc, peak = mem_case(f, m)
+        results[name] = {"n": m, "ops_s": round(ops_s, 1), "ns_op": round(ns_op, 1),
+                         "alloc_b_op": None if alloc is None else round(alloc, 1), "peak_b": peak}
+        print(TAG+"{:22s} {:10.0f} {:10.0f} {:>9s} {:>8s}".format(name, ops_s, ns_op,
+              "-" if alloc is None else "{:.0f}".format(alloc), "-" if peak is None else str(peak)), file=sys.stderr)
+    myState.hdg_old = hdg_old
+    v = sys.implementation.version
+    doc = {
+        "bench_version": BENCH_VERSION,
+        "implementation": "{} {}.{}.{}".format(sys.implementation.name, v[0], v[1], v[2]),
+        "platform": sys.platform,
+        "time": time.time(),
+        "n": n,
+        "cases": results,
+    }
+    if fn is not None:
+        try:
+            with open(fn, "w") as f:
+                f.write(json.dumps(doc))
+            print(TAG+f"results written to: \'{fn}\'", file=sys.stderr)
+        except OSError as e:
+            print(TAG+f"cannot write \'{fn}\': {e}. Read-only filesystem? See: boot.py", file=sys.stderr)
+    return doc
+
+def load(fn):
+    with open(fn, "r") as f:
+        return json.loads(f.read())
+
+# List the differences between two result files. Returns the nr of regressions:
+# cases that are more than REGRESSION_PCT % slower or that allocate more bytes per operation
+def compare(old_fn, new_fn):
+    TAG = tag_adjust("benchmarks.compare(): ")
+    old = load(old_fn)["cases"]
+    new = load(new_fn)["cases"]
+    regr_cnt = 0
+    print(TAG+f"\'{old_fn}\' -> \'{new_fn}\'", file=sys.stderr)
+    print(TAG+"{:22s} {:>10s} {:>10s} {:>7s} {:>9s}".format("case", "ops/s old", "ops/s new", "change", "B/op"), file=sys.stderr)
+    for name in new:
+        if name not in old:
+            print(TAG+"{:22s} new case".format(name), file=sys.stderr)
+            continue
+        o = old[name]
+        c = new[name]
+        pct = (c["ops_s"] - o["ops_s"]) * 100 / o["ops_s"] if o["ops_s"] > 0 else 0
+        a_o = o["alloc_b_op"]
+        a_c = c["alloc_b_op"]
+        a_s = "-" if a_o is None or a_c is None else "{:.0f}>{:.0f}".format(a_o, a_c)
+        regr = pct < -REGRESSION_PCT or (a_o is not None and a_c is not None and a_c > a_o + 1)
+        if regr:
+            regr_cnt += 1
+        print(TAG+"{:22s} {:10.0f} {:10.0f} {:+6.0f}% {:>9s}{}".format(name, o["ops_s"], c["ops_s"], pct, a_s,
+              "  <-- regression" if regr else ""), file=sys.stderr)
+    print(TAG+f"{regr_cnt} regression(s)", file=sys.stderr)
+    return regr_cnt
+
+if __name__ == "__main__":
+    argv = sys.argv
+    doc = run(argv[1] if len(argv) > 1 else None)
+    if len(argv) < 2:
+        print(json.dumps(doc))  # no results file given: the results go to stdout
+    if len(argv) > 2:
+        if compare(argv[2], argv[1]) > 0:
+            sys.exit(1)
@@ -64,6 +64,7 @@ import terminalio
 from common import *
 from XPlaneDatarefRx import *
 from XPlaneUdpDatagram import *
+from XPlaneCapture import close_capture
 
 # Most global flags moved to common.py
 
@@ -77,6 +78,11 @@ if use_getopt:
     except ImportError:
         use_getopt = False # Set flag to false
 
+try:
+    import asyncio  # only used if USE_ASYNCIO="1". See run_tasks()
+except ImportError:
+    asyncio = None
+
 # Pre-definition
 def scan_i2c():
     pass
@@ -189,6 +195,8 @@ def disp_logo(choice):
                 
             display.root_group = main_grp
             my_page_layout.showing_page_name = logo_lst[choice-1]
+            if not display.auto_refresh:  # the render stage of dg may have switched auto_refresh off
+                display.refresh()
             #go2_page(logo_lst[choice-1])
             time.sleep(myVars.read("TFT_show_duration")+2) # in seconds
     except OSError as e:
@@ -237,6 +245,8 @@ def disp_id():
             
             display.root_group = main_grp
             my_page_layout.showing_page_name = "ID"
+            if not display.auto_refresh:  # the render stage of dg may have switched auto_refresh off
+                display.refresh()
             if my_debug:
                 print(TAG+f"showing page index: {my_page_layout.showing_page_index}")
                 print(TAG+f"showing page name: {my_page_layout.showing_page_name}")
@@ -276,6 +286,8 @@ def disp_author():
                     print(TAG+f"{ta2_grp[_].text}")
             display.root_group = main_grp
             my_page_layout.showing_page_name = "Author"
+            if not display.auto_refresh:  # the render stage of dg may have switched auto_refresh off
+                display.refresh()
             if my_debug:
                 print(TAG+f"showing page index: {my_page_layout.showing_page_index}")
                 print(TAG+f"showing page name: {my_page_layout.showing_page_name}")    
@@ -318,6 +330,8 @@ def disp_bat():
     # change page by updating the page name property
     display.root_group = main_grp  #ba_grp
     my_page_layout.showing_page_name = "Battery"
+    if not display.auto_refresh:  # the render stage of dg may have switched auto_refresh off
+        display.refresh()
     if my_debug:
         print(TAG+f"showing page index: {my_page_layout.showing_page_index}")
         print(TAG+f"showing page name: {my_page_layout.showing_page_name}")
@@ -362,6 +376,8 @@ def disp_dt():
     
     display.root_group = main_grp  # dt_grp
     my_page_layout.showing_page_name = "Datetime"
+    if not display.auto_refresh:  # the render stage of dg may have switched auto_refresh off
+        display.refresh()
     if my_debug:
         print(TAG+f"showing page index: {my_page_layout.showing_page_index}")
         print(TAG+f"showing page name: {my_page_layout.showing_page_name}")
@@ -438,6 +454,7 @@ def create_groups():
         'ta2': {'nr_items': 3, 'scale': 2, 'anchor_point': (0.5, 0.5), 'anchored_position': (ax,  40), 'vpos_increase': 30},
         'xp':  {'nr_items': 3, 'scale': 3, 'anchor_point': (0.5, 0.5), 'anchored_position': (120, 40), 'vpos_increase': 40},
         'msg': {'nr_items': 3, 'scale': 2, 'anchor_point': (0.5, 0.5), 'anchored_position': (120, 40), 'vpos_increase': 30},
+        'st':  {'nr_items': 6, 'scale': 1, 'anchor_point': (0.5, 0.5), 'anchored_position': (120, 12), 'vpos_increase': 22},
     }
 
     for _ in range(len(img_lst)):
@@ -461,7 +478,7 @@ def create_groups():
             myVars.write("logo1_grp", logo1_grp)
             my_page_layout.add_content(logo1_grp, "Logo1")   # = group index # 0
             if my_debug:
-                print(TAG+f"logo1_grp = {myVars.read("logo1_grp")}")
+                print(TAG+f"logo1_grp = {myVars.read('logo1_grp')}")
         elif _ == 1:
             tile_grid2 = TileGrid(bitmap=logo_img, pixel_shader=logo_img.pixel_shader)
             tile_grid2.x = display.width // 2 - logo_img.width // 2
@@ -471,7 +488,7 @@ def create_groups():
             myVars.write("logo2_grp", logo2_grp)
             my_page_layout.add_content(logo2_grp, "Logo2")  # = group index # 1
             if my_debug:
-                print(TAG+f"logo2_grp = {myVars.read("logo2_grp")}")
+                print(TAG+f"logo2_grp = {myVars.read('logo2_grp')}")
 
     grp_lst = []
     for k in grp_dict.keys():
@@ -508,13 +525,13 @@ def create_groups():
                 xp_grp = tmp_grp       # = group index # 2
                 myVars.write("xp_grp", xp_grp)
                 if my_debug:
-                    print(TAG+f"xp_grp = {myVars.read("xp_grp")}")
+                    print(TAG+f"xp_grp = {myVars.read('xp_grp')}")
                 my_page_layout.add_content(xp_grp, "XPlane")  
             elif grp_lst[i] == 'ta1':      #  used by disp_id()
                 ta1_grp = tmp_grp       # = group index # 3
                 myVars.write("ta1_grp", ta1_grp)
                 if my_debug:
-                    print(TAG+f"ta1_grp = {myVars.read("ta1_grp")}")
+                    print(TAG+f"ta1_grp = {myVars.read('ta1_grp')}")
                 my_page_layout.add_content(ta1_grp, "ID")
             elif grp_lst[i] == 'ta2':      #  used by disp_author()
                 ta2_grp = tmp_grp       # = group index # 4
@@ -522,28 +539,32 @@ def create_groups():
                     ta2_grp.append(tile_grid0)  # add the tilegrid containing the avatar.bmp
                 myVars.write("ta2_grp", ta2_grp)
                 if my_debug:
-                    print(TAG+f"ta2_grp = {myVars.read("ta2_grp")}")
+                    print(TAG+f"ta2_grp = {myVars.read('ta2_grp')}")
                 my_page_layout.add_content(ta2_grp, "Author")
             elif grp_lst[i] == 'ba':        # used by disp_bat()
                 # Setup the file as the bitmap data source
                 ba_grp = tmp_grp       # = group index # 5
                 myVars.write("ba_grp", ba_grp)
                 if my_debug:
-                    print(TAG+f"ba_grp = {myVars.read("ba_grp")}")
+                    print(TAG+f"ba_grp = {myVars.read('ba_grp')}")
                 #s = "myVars.read(\'ba_grp\') = {}".format(myVars.read("ba_grp"))
                 my_page_layout.add_content(ba_grp, "Battery")
             elif grp_lst[i] == 'msg':      #  used by disp_msg()
                 msg_grp = tmp_grp       # = group index # 6
                 myVars.write("msg_grp", msg_grp)
                 if my_debug:
-                    print(TAG+f"msg_grp = {myVars.read("msg_grp")}")
+                    print(TAG+f"msg_grp = {myVars.read('msg_grp')}")
                 my_page_layout.add_content(msg_grp, "Message")
             elif grp_lst[i] == 'dt':      # used by disp_dt()
                 dt_grp = tmp_grp       # = group index # 7
                 myVars.write("dt_grp", dt_grp)
                 if my_debug:
-                    print(TAG+f"dt_grp = {myVars.read("dt_grp")}")
+                    print(TAG+f"dt_grp = {myVars.read('dt_grp')}")
                 my_page_layout.add_content(dt_grp, "Datetime")
+            elif grp_lst[i] == 'st':      # used by stage_stats.tick() (see: common.py)
+                st_grp = tmp_grp       # = group index # 8
+                myVars.write("st_grp", st_grp)
+                my_page_layout.add_content(st_grp, "Stats")
 
         # add it to the group that is showing on the display
         main_grp.append(my_page_layout)
@@ -599,14 +620,16 @@ def setup():
     dg = XPlaneUdpDatagram()  # Create an instance of the XPlaneUdpDatagram class object
     #main(sys.argv[1:]
     dr = XPlaneDatarefRx()    # Create an instance of the XPlaneDatarefRx class object
+    if len(myState.datarefs) > 0:
+        dg.attach_dr(dr)  # DATAREFS: the RREF requests and replies go through the socket of dg (see: XPlaneUdpDatagram.py)
 
     # Get our username, key and desired timezone
     ADAFRUIT_IO_USERNAME = os.getenv("ADAFRUIT_IO_USERNAME")
     ADAFRUIT_IO_KEY = os.getenv("ADAFRUIT_IO_KEY")
     location = os.getenv("timezone") # secrets.get("timezone", None)
 
-    TIME_URL = "https://io.adafruit.com/api/v2/{:s}/integrations/".format(ADAFRUIT_IO_USERNAME)
-    TIME_URL += "time/strftime?x-aio-key={:s}&tz={:s}".format(ADAFRUIT_IO_KEY, location)
+    TIME_URL = "https://io.adafruit.com/api/v2/{}/integrations/".format(ADAFRUIT_IO_USERNAME)
+    TIME_URL += "time/strftime?x-aio-key={}&tz={}".format(ADAFRUIT_IO_KEY, location)
     TIME_URL += "&fmt=%25Y-%25m-%25d+%25H%3A%25M%3A%25S.%25L+%25j+%25u+%25z+%25Z"
     #open_socket()
 
@@ -854,7 +877,7 @@ def get_dt_AIO():
     if not wifi_is_connected():
         wifi_connect()
     if wifi_is_connected():
-        gc.collect()
+        gc_policy.collect()
         response = None
         open_socket()
         time.sleep(0.5)
@@ -937,6 +960,88 @@ def get_dt_AIO():
         finally:
             free_socket()
 
+# =======================================================
+# asyncio runtime (setting USE_ASYNCIO="1")             =
+# =======================================================
+# Each job runs in its own cooperative task. No task ever calls time.sleep().
+# They wait with: await asyncio.sleep(), so no status update can stall the packet reception.
+# The tasks share the latest state: myState (common.py) and the newest decoded values in dg.
+# On the device asyncio needs the libraries 'asyncio' and 'adafruit_ticks' from the Adafruit bundle in /lib
+
+def read_bat():
+    # Sample the battery sensor into myState and update the Battery page labels. Does not switch pages, does not wait
+    ba_grp = myState.ba_grp
+    myState.bat_voltage = bat_sensor.cell_voltage
+    myState.bat_percent = bat_sensor.cell_percent
+    if ba_grp is not None:
+        ba_grp[0].text = "Battery:"
+        ba_grp[1].text = "{:.1f}V, {}% chg".format(myState.bat_voltage, myState.bat_percent)
+
+async def rx_task():
+    # Receive on the existing UDP socket, without blocking
+    while not myState.no_data:
+        n = dg.rx_poll()
+        await asyncio.sleep(0 if n > 0 else 0.005)
+
+async def render_task():
+    # Show the newest heading/altitude once per frame budget
+    while not myState.no_data:
+        dg.render_tick()
+        stage_stats.tick(dg.rx_pkt_cnt, dg.dropped_cnt)
+        await asyncio.sleep(dg.render_interval)
+
+async def led_task():
+    # Advance the Neopixel led pattern. The patterns are started by the rx path (see: NeoSignal in common.py)
+    while not myState.no_data:
+        neo_signal.tick()
+        await asyncio.sleep(0.01)
+
+async def ntp_task(interval_t, idle_t=1):
+    # Synchronize the built-in RTC with NTP every interval_t seconds.
+    # ck_NTP() blocks (a network round trip, up to the socket timeout of the NTP request): all tasks stall meanwhile.
+    # So the sync waits until no X-Plane packet has been received for idle_t seconds. While packets are flowing it is skipped.
+    TAG = tag_adjust("ntp_task(): ")
+    while not myState.no_data:
+        await asyncio.sleep(interval_t)
+        while not myState.no_data and time.monotonic() - dg.rx_last_t < idle_t:
+            await asyncio.sleep(idle_t)
+        if myState.no_data:
+            break
+        myVars.write("NTP_dt_is_set", False)  # force a new sync (see: ck_NTP())
+        res = ck_NTP()
+        if not my_debug:
+            print(TAG+f"result ck_NTP(): {res}", file=sys.stderr)
+
+async def bat_task(interval_t):
+    # Sample the battery every interval_t seconds
+    TAG = tag_adjust("bat_task(): ")
+    while not myState.no_data:
+        read_bat()
+        if my_debug:
+            print(TAG+"{:.1f}V, {}% chg".format(myState.bat_voltage, myState.bat_percent), file=sys.stderr)
+        await asyncio.sleep(interval_t)
+
+async def main_async(ntp_interval_t):
+    tasks = [
+        asyncio.create_task(render_task()),
+        asyncio.create_task(led_task()),
+        asyncio.create_task(ntp_task(ntp_interval_t)),
+        asyncio.create_task(bat_task(60)),
+    ]
+    await rx_task()  # returns when no data is received anymore
+    for t in tasks:
+        t.cancel()
+
+# Returns False if asyncio is not available. Then main() uses its while loop
+def run_tasks(ntp_interval_t):
+    TAG = tag_adjust("run_tasks(): ")
+    if asyncio is None:
+        print(TAG+"asyncio not found in /lib. Using the main loop instead", file=sys.stderr)
+        return False
+    print(TAG+"Starting the rx, render, led, ntp and battery tasks", file=sys.stderr)
+    asyncio.run(main_async(ntp_interval_t))
+    return True
+
 # =======================================================
 # Here were:                                            =
 # - XPlaneIpNotFound class                              =
@@ -1045,7 +1150,7 @@ def main():
                 if use_logo:
                     disp_logo(blinka) # (avatar or blinka)
             #display.refresh()
-        gc.collect()
+        gc_policy.collect()
         if myVars.read("kbd_intr"):
             stop = True
             #break
@@ -1085,7 +1190,7 @@ def main():
 
         if start and not speed_run:
             disp_bat()
-            gc.collect()
+            gc_policy.collect()
 
         #blink()
         """
@@ -1096,7 +1201,7 @@ def main():
                 if myVars.read("kbd_intr"):
                     stop = True
                     # break
-                gc.collect()
+                gc_policy.collect()
                 time.sleep(delay)
         """
         if start and not speed_run:
@@ -1106,7 +1211,7 @@ def main():
             time.sleep(delay)
             disp_author()
             #time.sleep(60)
-            gc.collect()
+            gc_policy.collect()
 
             # change page by next page function. It will loop by default
             # my_page_layout.next_page()
@@ -1133,12 +1238,15 @@ def main():
         # ================================================================================
         if not wifi_is_connected():
             wifi_connect()
-        while True:
-            myVars.write("main_loop_nr", cnt)
-            myVars.write("kbd_intr", False)
+        run_loop = True
+        if myState.use_asyncio and run_tasks(interval_t):
+            run_loop = False  # the tasks have stopped (no data)
+        while run_loop:
+            myState.main_loop_nr = cnt
+            myState.kbd_intr = False
             #if not my_debug:
             #    print(TAG+'Loop nr: {:03d}'.format(cnt), file=sys.stderr)
-            if myVars.read("no_data"):
+            if myState.no_data:
                 stop = True
                 break
             if not my_debug:
@@ -1148,16 +1256,20 @@ def main():
                     if my_debug:
                         print(TAG+'type(dg)= {}'.format(type(dg)), file=sys.stderr)
                         print(TAG+'contents dg= {}'.format(dg), file=sys.stderr)
-                    lResult = dg.datagram_test() # Do the datagram test. This also opens a DataRef socket
+                    lResult = dg.datagram_test() # Do the datagram test. This also opens a DataRef socket (kept open if PERSISTENT_RX="1")
                     if not lResult:
                         print(TAG+'call to dg.datagram_test() failed', file=sys.stderr)
-                        if myVars.read("no_data"):
+                        if myState.no_data:
                             print(TAG+f"reason: no data received for a while")
                         # raise RuntimeError
                     else:
                         print(TAG+'call to dg.datagram_test() successful', file=sys.stderr)
                         #print(TAG+'contents datagram = {}'.format(dg.retval), file=sys.stderr)
-                    kbdi = myVars.read("kbd_intr")
+                    dg.render_tick()  # show the newest heading/altitude if the frame budget allows it
+                    neo_signal.tick()  # advance the Neopixel led pattern (see: common.py)
+                    gc_policy.idle(dg.rx_last_t)  # collect only in a gap between packets (see: common.py)
+                    stage_stats.tick(dg.rx_pkt_cnt, dg.dropped_cnt)  # every STATS_INTERVAL seconds (see: common.py)
+                    kbdi = myState.kbd_intr
                     if kbdi:
                         print(TAG+f"kbdintr = {kbdi}")
                         raise KeyboardInterrupt
@@ -1182,7 +1294,7 @@ def main():
                 if cnt > 999:
                     cnt = 1
 
-                kbdi = myVars.read("kbd_intr")
+                kbdi = myState.kbd_intr
                 if kbdi:
                     print(TAG+f"kbdintr = {kbdi}")
                     raise KeyboardInterrupt
@@ -1244,6 +1356,20 @@ def main():
             pass    # temporary put 'pass' here because the 2 lines below are commented-out for the moment
             dg.my_lcd_up()
 
+        print(gc_policy.report(), file=sys.stderr)
+        latency_probe.report()  # LATENCY_PROBE="1": receive-to-render percentiles (see: common.py)
+        close_capture()  # write the rest of the capture buffer (see: XPlaneCapture.py)
+        if dg is not None:
+            dg.DataDeselect()  # DATA_SELECT="1": X-Plane stops sending the DATA groups selected
+            if dg.rpos_sent:
+                dg.RposRequest(0)  # RPOS_HZ > 0: X-Plane stops sending RPOS packets
+            if dg.dr is not None and dg.dr.subscribed:
+                dg.dr.RemoveDataRefs()  # DATAREFS: X-Plane stops sending the RREF replies
+
+        if dg is not None and (dg.persistent_rx or dg.my_DataGram_sock is not None):
+            print('We are going to close the receive socket.', file=sys.stderr)
+            dg.CloseUDPSocket()  # also when it was opened again for the messages above
+
         t = type(my_UDP_sock)
         if not (t is None):  # Check is my_socket exists
             pass
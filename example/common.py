@@ -19,9 +19,17 @@
 # - NEO_pixel_test()
 # - blink_NEO_v2()
 # - clr_disp()
+# - get_header_id()
+# - get_packet_types()
+# - get_datarefs()
 #
-# This file contains the Class gVars
-# and creates a gVars object: myVars
+# This file contains the Class Struct (only if the struct module has no Struct class)
+# This file contains the Class NeoSignal and creates a NeoSignal object: neo_signal
+# This file contains the Classes gState and gVars
+# and creates a gState object: myState and a gVars object: myVars
+# This file contains the Class GCPolicy and creates a GCPolicy object: gc_policy
+# This file contains the Class LatencyProbe and creates a LatencyProbe object: latency_probe
+# This file contains the Class StageStats and creates a StageStats object: stage_stats
 #
 # Original see: I:\Raspberry_Pi\XPlane_datarefs\xp_data_outp_rx\XPlaneUdpDatagramLCDv11.py
 # For the LCD 4x20 (e.g. used in the Hasseb.fi CMIO device) see file:
@@ -31,6 +39,9 @@
 #type:ignore
 import os, sys
 import time
+import gc
+import struct
+import array
 import board
 import displayio
 # import busio
@@ -92,7 +103,8 @@ page_dict = {
     4: 'Author',
     5: 'Battery',
     6: 'Message',
-    7: 'Datetime'
+    7: 'Datetime',
+    8: 'Stats'
 }
 
 if my_have_lcd:
@@ -170,14 +182,74 @@ udp_packet_types = {
     1: b"DATA",
     2: b"XATT",
     3: b"XGPS",
-    4: b'XTRA'}
+    4: b'XTRA',
+    5: b"RPOS",
+    6: b"RREF"}
 
 udp_packet_types_rev = {
     b"BECN" : 0,
     b"DATA": 1,
     b"XATT": 2,
     b"XGPS": 3,
-    b'XTRA': 4}
+    b'XTRA': 4,
+    b"RPOS": 5,
+    b"RREF": 6}
+
+# Packet header IDs (the same numbers as in udp_packet_types_rev). See get_header_id()
+HDR_UNKNOWN = -1
+HDR_BECN = 0
+HDR_DATA = 1
+HDR_XATT = 2
+HDR_XGPS = 3
+HDR_XTRA = 4
+HDR_RPOS = 5
+HDR_RREF = 6
+
+udp_packet_hdrs = tuple(udp_packet_types[_] for _ in range(len(udp_packet_types)))
+udp_packet_types_str = tuple(udp_packet_hdrs[_].decode() for _ in range(len(udp_packet_hdrs)))
+
+# Return the header ID of the packet in buf, or HDR_UNKNOWN.
+# The 4 header bytes are compared one by one. Indexing a bytearray returns a small int,
+# so, unlike slicing buf[0:4], this does not allocate memory for every packet received.
+def get_header_id(buf):
+    b0 = buf[0]
+    b1 = buf[1]
+    b2 = buf[2]
+    b3 = buf[3]
+    for _ in range(len(udp_packet_hdrs)):
+        hdr = udp_packet_hdrs[_]
+        if b0 == hdr[0] and b1 == hdr[1] and b2 == hdr[2] and b3 == hdr[3]:
+            return _
+    return HDR_UNKNOWN
+
+# Convert the setting PACKET_TYPES_USED, e.g. "['XGPS', 'XATT']", into a tuple of packet type names: ('XGPS', 'XATT')
+# Names that are not in udp_packet_types are skipped
+def get_packet_types(s):
+    if s is None:
+        return ()
+    lst = []
+    for _ in s.strip("[]() ").split(","):
+        name = _.strip("'\" ")
+        if name.encode() in udp_packet_types_rev:
+            lst.append(name)
+    return tuple(lst)
+
+# Convert the setting DATAREFS, e.g. "['sim/flightmodel/position/indicated_airspeed:5', 'sim/flightmodel/position/latitude']",
+# into a tuple of datarefs for dr.AddDataRefs(). A dataref with ":freq" becomes a tuple (dataref, freq)
+def get_datarefs(s):
+    if s is None:
+        return ()
+    lst = []
+    for _ in s.strip("[]() ").split(","):
+        name = _.strip("'\" ")
+        if len(name) == 0:
+            continue
+        if ":" in name:
+            name, freq = name.split(":")
+            lst.append((name, int(freq)))
+        else:
+            lst.append(name)
+    return tuple(lst)
 
 ADAFRUIT_IO_KEY = None
 ADAFRUIT_IO_USERNAME = None
@@ -284,149 +356,201 @@ def blink_NEO_color(color):
                 pixel.fill(neo_black)
                 time.sleep(0.5)
 
+# +-------------------------------------------------------+
+# | Precompiled struct formats                            |
+# +-------------------------------------------------------+
+# CPython's struct module has the class Struct. It parses the format string only once.
+# CircuitPython's struct module has no Struct class. In that case the class below gives
+# the same interface, so that the decoders can use: size, unpack_from(), pack_into()
+try:
+    from struct import Struct
+except ImportError:
+    class Struct:
+        def __init__(self, fmt):
+            self.format = fmt
+            self.size = struct.calcsize(fmt)
+
+        def unpack(self, buffer):
+            return struct.unpack(self.format, buffer)
+
+        def unpack_from(self, buffer, offset=0):
+            return struct.unpack_from(self.format, buffer, offset)
+
+        def pack(self, *values):
+            return struct.pack(self.format, *values)
+
+        def pack_into(self, buffer, offset, *values):
+            struct.pack_into(self.format, buffer, offset, *values)
+
 # +-------------------------------------------------------+
 # | Definition for variables in the past defined as global|
 # +-------------------------------------------------------+
 # The gVars class is created
 # to elminate the need for global variables.
+#
+# Update: the variables are now kept in the class gState. gState uses __slots__:
+# every variable is a plain attribute, so the hot paths (receive, decode, display) read them
+# directly, e.g.: hdg_old = myState.hdg_old, instead of: hdg_old = myVars.read("hdg_old")
+# The class gVars is kept as a compatibility layer for the existing myVars.read() / myVars.write() calls.
+# Note: CircuitPython accepts __slots__ but does not enforce it. On CPython (see: host/) it is enforced.
+
+class gState:
+    # The order of the names is the order of the (former) gVars index numbers
+    __slots__ = (
+        "my_debug",                 #  0
+        "id",                       #  1
+        "rtc",                      #  2
+        "disp_width",               #  3
+        "disp_height",              #  4
+        "xp_lst",                   #  5
+        "TFT_show_duration",        #  6
+        "kbd_intr",                 #  7
+        "use_udp_host",             #  8
+        "multicast_group1",         #  9
+        "multicast_group2",         # 10
+        "multicast_port1",          # 11
+        "multicast_port2",          # 12
+        "packet_types_used",        # 13
+        "xplane_version",           # 14
+        "main_loop_nr",             # 15
+        "hdg_old",                  # 16
+        "alt_old",                  # 17
+        "main_grp",                 # 18
+        "my_page_layout",           # 19
+        "logo1_grp",                # 20
+        "logo2_grp",                # 21
+        "ba_grp",                   # 22
+        "dt_grp",                   # 23
+        "ta1_grp",                  # 24
+        "ta2_grp",                  # 25
+        "xp_grp",                   # 26
+        "msg_grp",                  # 27
+        "current_page",             # 28
+        "Main",                     # 29
+        "NTP_dt",                   # 30
+        "NTP_dt_is_set",            # 31
+        "client_IP",                # 32
+        "start",                    # 33
+        "no_data",                  # 34
+        "pool_socket_timeout_set",  # 35
+        "speed_run",                # 36
+        "persistent_rx",            # 37
+        "render_interval",          # 38
+        "coalesce_rx",              # 39
+        "use_asyncio",              # 40
+        "bat_voltage",              # 41
+        "bat_percent",              # 42
+        "gc_min_free",              # 43
+        "gc_idle_t",                # 44
+        "stats_interval",           # 45
+        "stats_page",               # 46
+        "st_grp",                   # 47
+        "capture_file",             # 48
+        "replay_file",              # 49
+        "replay_speed",             # 50
+        "latency_probe",            # 51
+        "data_select",              # 52
+        "rpos_hz",                  # 53
+        "datarefs",                 # 54
+        "beacon_cache",             # 55
+        "write_rate",               # 56
+        "write_window_t",           # 57
+    )
 
-class gVars:
     def __init__(self):
+        self.clean()
 
-        self.gVarsDict = {
-            0: "my_debug",
-            1: "id",
-            2: "rtc",
-            3: "disp_width",
-            4: "disp_height",
-            5: "xp_lst",
-            6: "TFT_show_duration",
-            7: "kbd_intr",
-            8: "use_udp_host",
-            9: "multicast_group1",
-           10: "multicast_group2",
-           11: "multicast_port1",
-           12: "multicast_port2",
-           13: "packet_types_used",
-           14: "xplane_version",
-           15: "main_loop_nr",
-           16: "hdg_old",
-           17: "alt_old",
-           18: "main_grp",
-           19: "my_page_layout",
-           20: "logo1_grp",
-           21: "logo2_grp",
-           22: "ba_grp",
-           23: "dt_grp",
-           24: "ta1_grp",
-           25: "ta2_grp",
-           26: "xp_grp",
-           27: "msg_grp",
-           28: "current_page",
-           29: "Main",
-           30: "NTP_dt",
-           31: "NTP_dt_is_set",
-           32: "client_IP",
-           33: "start",
-           34: "no_data",
-           35: "pool_socket_timeout_set",
-           36: "speed_run"
-        }
-
-        self.gVars_rDict = {
-            "my_debug": 0,
-            "id": 1,
-            "rtc": 2,
-            "disp_width": 3,
-            "disp_height": 4,
-            "xp_lst": 5,
-            "TFT_show_duration": 6,
-            "kbd_intr": 7,
-            "use_udp_host": 8,
-            "multicast_group1": 9,
-            "multicast_group2": 19,
-            "multicast_port1": 11,
-            "multicast_port2": 12,
-            "packet_types_used": 13,
-            "xplane_version": 14,
-            "main_loop_nr": 15,
-            "hdg_old": 16,
-            "alt_old": 17,
-            "main_grp": 18,
-            "my_page_layout": 19,
-            "logo1_grp": 20,
-            "logo2_grp": 21,
-            "ba_grp": 22,
-            "dt_grp": 23,
-            "ta1_grp": 24,
-            "ta2_grp": 25,
-            "xp_grp": 26,
-            "msg_grp": 27,
-            "current_page": 28,
-            "Main": 29,
-            "NTP_dt": 30,
-            "NTP_dt_is_set": 31,
-            "client_IP": 32,
-            "start": 33,
-            "no_data": 34,
-            "pool_socket_timeout_set": 35,
-            "speed_run": 36
-        }
-
-        self.g_vars = {}
-
-        # self.clean()
-        
         my_debug = True if "1" == os.getenv("DEBUG_FLAG") else False
         speed_run = True if "1" == os.getenv("SPEED_RUN") else False
-        
-        # -------------- Setting myVars elements ----------------------------------
-        self.write("my_debug", my_debug)
-        self.write("id", board.board_id ) # 'adafruit_feather_esp32s2_tft'
-        self.write("rtc", None)
-        self.write("disp_width", display.width)
-        self.write("disp_height", display.height)
-        self.write("xp_lst", None)
-        self.write("TFT_show_duration", 5)
-        self.write("kbd_intr", False)
-        self.write("use_udp_host", os.getenv("USE_UDP_HOST"))
-        self.write("multicast_group1", os.getenv("MULTICAST_GROUP1"))
-        self.write("multicast_group2", os.getenv("MULTICAST_GROUP2"))
-        self.write("multicast_port1", int(os.getenv("MULTICAST_PORT1")))
-        self.write("multicast_port2", int(os.getenv("MULTICAST_PORT2")))
-        # self.write("packet_types_used", ['XGPS']) # or ['XGPS', 'XATT', 'XTRA']
-        self.write("packet_types_used", os.getenv("PACKET_TYPES_USED"))
-        self.write("xplane_version", os.getenv("XPLANE_VERSION"))
-        self.write("main_loop_nr", 0)
-        self.write("hdg_old",0)
-        self.write("alt_old",0)
-        self.write("main_grp", None)
-        self.write("my_page_layout", None)
-        self.write("logo1_grp", None)
-        self.write("logo2_grp", None)
-        self.write("ba_grp", None)
-        self.write("dt_grp", None)
-        self.write("ta1_grp", None)
-        self.write("ta2_grp", None)
-        self.write("xp_grp", None)
-        self.write("msg_grp", None)
-        self.write("current_page", None)
-        self.write("Main", None)
-        self.write("NTP_dt", None)
-        self.write("NTP_dt_is_set", False)
-        self.write("client_IP", None)
-        self.write("client_IP", False)
-        self.write("no_data",False)
-        self.write("pool_socket_timeout_set", False)
-        self.write("speed_run", speed_run)
+        persistent_rx = True if "1" == os.getenv("PERSISTENT_RX") else False
+        coalesce_rx = True if "1" == os.getenv("COALESCE_RX") else False
+        use_asyncio = True if "1" == os.getenv("USE_ASYNCIO") else False
+        render_interval = os.getenv("RENDER_INTERVAL_MS")
+        render_interval = 0.2 if render_interval is None else int(render_interval) / 1000  # frame budget in seconds
+        gc_min_free = os.getenv("GC_MIN_FREE")
+        gc_min_free = 20000 if gc_min_free is None else int(gc_min_free)  # in bytes
+        gc_idle_t = os.getenv("GC_IDLE_MS")
+        gc_idle_t = 0.05 if gc_idle_t is None else int(gc_idle_t) / 1000  # in seconds
+        stats_interval = os.getenv("STATS_INTERVAL")
+        stats_interval = 0 if stats_interval is None else int(stats_interval)  # in seconds. 0 = no stats
+        stats_page = True if "1" == os.getenv("STATS_PAGE") else False
+        capture_file = os.getenv("CAPTURE_FILE")  # None or "" = no capture
+        replay_file = os.getenv("REPLAY_FILE")    # None or "" = receive from X-Plane
+        replay_speed = os.getenv("REPLAY_SPEED")
+        replay_speed = 1.0 if replay_speed is None else float(replay_speed)  # 0 = as fast as possible
+        latency_probe = True if "1" == os.getenv("LATENCY_PROBE") else False
+        data_select = True if "1" == os.getenv("DATA_SELECT") else False
+        rpos_hz = os.getenv("RPOS_HZ")
+        rpos_hz = 0 if rpos_hz is None else int(rpos_hz)  # RPOS packets/sec. 0 = no RPOS
+        beacon_cache = True if "1" == os.getenv("BEACON_CACHE") else False
+        write_rate = os.getenv("WRITE_RATE")
+        write_rate = 20 if write_rate is None else int(write_rate)  # DREF/CMND messages/sec to X-Plane
+        write_window_t = os.getenv("WRITE_WINDOW_MS")
+        write_window_t = 0.05 if write_window_t is None else int(write_window_t) / 1000  # in seconds
+
+        # -------------- Setting myState elements ----------------------------------
+        self.my_debug = my_debug
+        self.id = board.board_id  # 'adafruit_feather_esp32s2_tft'
+        self.disp_width = display.width
+        self.disp_height = display.height
+        self.TFT_show_duration = 5
+        self.kbd_intr = False
+        self.use_udp_host = os.getenv("USE_UDP_HOST")
+        self.multicast_group1 = os.getenv("MULTICAST_GROUP1")
+        self.multicast_group2 = os.getenv("MULTICAST_GROUP2")
+        self.multicast_port1 = int(os.getenv("MULTICAST_PORT1"))
+        self.multicast_port2 = int(os.getenv("MULTICAST_PORT2"))
+        self.packet_types_used = get_packet_types(os.getenv("PACKET_TYPES_USED"))  # e.g. ('XGPS',) or ('XGPS', 'XATT', 'XTRA')
+        self.datarefs = get_datarefs(os.getenv("DATAREFS"))  # e.g. (('sim/flightmodel/position/indicated_airspeed', 5),). () = no RREF
+        self.xplane_version = os.getenv("XPLANE_VERSION")
+        self.main_loop_nr = 0
+        self.hdg_old = 0
+        self.alt_old = 0
+        self.NTP_dt_is_set = False
+        self.client_IP = False
+        self.no_data = False
+        self.pool_socket_timeout_set = False
+        self.speed_run = speed_run
+        self.persistent_rx = persistent_rx
+        self.render_interval = render_interval
+        self.coalesce_rx = coalesce_rx
+        self.use_asyncio = use_asyncio
+        self.gc_min_free = gc_min_free
+        self.gc_idle_t = gc_idle_t
+        self.stats_interval = stats_interval
+        self.stats_page = stats_page
+        self.capture_file = capture_file
+        self.replay_file = replay_file
+        self.replay_speed = replay_speed
+        self.latency_probe = latency_probe
+        self.data_select = data_select
+        self.rpos_hz = rpos_hz
+        self.beacon_cache = beacon_cache
+        self.write_rate = write_rate
+        self.write_window_t = write_window_t
+
+    def clean(self):
+        for _ in gState.__slots__:
+            setattr(self, _, None)
+
+# ---------- End of class gState ------------------------
+
+class gVars:
+    def __init__(self, state):
+        self.state = state
+        self.gVarsDict = {}   # key: index, value: name
+        self.gVars_rDict = {} # key: name, value: index
+        for _ in range(len(gState.__slots__)):
+            s = gState.__slots__[_]
+            self.gVarsDict[_] = s
+            self.gVars_rDict[s] = _
 
     def write(self, s, value):
         if isinstance(s, str):
             if s in self.gVars_rDict:
-                n = self.gVars_rDict[s]
                 if my_debug:
-                    print("myVars.write() \'{:" ">20s}\' found in self.gVars_rDict, key: {}".format(s, n), file=sys.stderr)
-                self.g_vars[n] = value
+                    print("myVars.write() \'{:" ">20s}\' found in self.gVars_rDict, key: {}".format(s, self.gVars_rDict[s]), file=sys.stderr)
+                setattr(self.state, s, value)
             else:
                 raise KeyError(
                     "variable '{:" ">20s}' not found in self.gVars_rDict".format(s)
@@ -440,67 +564,234 @@ class gVars:
         RetVal = None
         if isinstance(s, str):
             if s in self.gVars_rDict:
-                n = self.gVars_rDict[s]
                 if my_debug:
-                    print("myVars.write() \'{:" ">20s}\' found in self.gVars_rDict, key: {}".format(s, n), file=sys.stderr)
-                if n in self.g_vars:
-                    RetVal = self.g_vars[n]
+                    print("myVars.read() \'{:" ">20s}\' found in self.gVars_rDict, key: {}".format(s, self.gVars_rDict[s]), file=sys.stderr)
+                RetVal = getattr(self.state, s)
         return RetVal
 
     def clean(self):
-        self.g_vars = {
-            0: None,
-            1: None,
-            2: None,
-            3: None,
-            4: None,
-            5: None,
-            6: None,
-            7: None,
-            8: None,
-            9: None,
-            10: None,
-            11: None,
-            12: None,
-            13: None,
-            14: None,
-            15: None,
-            16: None,
-            17: None,
-            18: None,
-            19: None,
-            20: None,
-            21: None,
-            22: None,
-            23: None,
-            24: None,
-            25: None,
-            26: None,
-            27: None,
-            28: None,
-            29: None,
-            30: None,
-            31: None,
-            32: None,
-            33: None,
-            34: None,
-            35: None,
-            36: None
-    }
+        self.state.clean()
 
     def list(self):
-        for i in range(0, len(self.g_vars) - 1):
+        for i in range(len(self.gVarsDict)):
             print(
                 "self.g_vars['{:"
                 ">20s}'] = {}".format(
-                    self.gVarsDict[i], self.g_vars[i] if i in self.g_vars else "None"
+                    self.gVarsDict[i], getattr(self.state, self.gVarsDict[i])
                 )
             )
 
 
 # ---------- End of class gVars ------------------------
 
-myVars = gVars()  # create an instance of the gVars class
+myState = gState()  # create an instance of the gState class
+myVars = gVars(myState)  # create an instance of the gVars class (compatibility layer for myState)
+
+# +-------------------------------------------------------+
+# | Garbage collection policy                             |
+# +-------------------------------------------------------+
+# A full gc.collect() takes milliseconds on CircuitPython. Called after each packet it causes
+# jitter on the display. The class GCPolicy collects only:
+# a) when the free heap drops below GC_MIN_FREE bytes (check(), called per packet);
+# b) when the receive path is idle for at least GC_IDLE_MS and memory was allocated
+#    since the previous collection (idle()).
+# It counts the collections and their duration (see: report()).
+# CPython (see: host/) has no gc.mem_free(). There check() leaves it to the automatic collector,
+# and idle() collects at most once per idle_min_interval seconds.
+class GCPolicy:
+    def __init__(self, min_free=20000, idle_t=0.05):
+        self.min_free = min_free
+        self.idle_t = idle_t
+        self.idle_min_alloc = 1024  # bytes allocated since the last collection, before an idle collection is done
+        self.idle_min_interval = 1  # seconds between idle collections without gc.mem_free()
+        self.collect_last_t = 0.0   # time.monotonic() at the end of the last collection
+        self.has_mem_free = hasattr(gc, "mem_free")
+        self.collect_cnt = 0
+        self.forced_cnt = 0  # collections because the free heap dropped below min_free
+        self.idle_cnt = 0
+        self.collect_t_ns = 0  # total duration
+        self.collect_max_ns = 0
+        self.free_after = self.mem_free()  # free heap after the last collection
+
+    def mem_free(self):
+        if self.has_mem_free:
+            return gc.mem_free()
+        return -1
+
+    def collect(self):
+        t0 = time.monotonic_ns()
+        gc.collect()
+        dt = time.monotonic_ns() - t0
+        self.collect_cnt += 1
+        self.collect_t_ns += dt
+        if dt > self.collect_max_ns:
+            self.collect_max_ns = dt
+        self.free_after = self.mem_free()
+        self.collect_last_t = time.monotonic()
+        return dt
+
+    # Called after each packet. Returns True if a collection was done
+    def check(self):
+        if self.has_mem_free and gc.mem_free() < self.min_free:
+            self.forced_cnt += 1
+            self.collect()
+            return True
+        return False
+
+    # Called when the socket is empty. last_rx_t: time.monotonic() of the last packet received
+    def idle(self, last_rx_t):
+        if time.monotonic() - last_rx_t < self.idle_t:
+            return False
+        if self.has_mem_free:
+            if self.free_after - gc.mem_free() < self.idle_min_alloc:
+                return False  # nothing worth collecting
+        elif time.monotonic() - self.collect_last_t < self.idle_min_interval:
+            return False  # no way to tell what was allocated: not more than once per idle_min_interval
+        self.idle_cnt += 1
+        self.collect()
+        return True
+
+    def report(self):
+        n = self.collect_cnt
+        avg_ms = self.collect_t_ns / n / 1000000 if n > 0 else 0
+        return "gc: {} collections ({} low heap, {} idle), avg {:.2f} ms, max {:.2f} ms, free {}".format(
+            n, self.forced_cnt, self.idle_cnt, avg_ms, self.collect_max_ns / 1000000, self.mem_free())
+
+gc_policy = GCPolicy(myState.gc_min_free, myState.gc_idle_t)
+
+# +-------------------------------------------------------+
+# | Hot path instrumentation                              |
+# +-------------------------------------------------------+
+# Latency probe (setting LATENCY_PROBE="1").
+# dg stamps each datagram with time.monotonic_ns() when recvfrom_into() returns. The stamp goes with the decoded
+# heading/altitude to the render stage. add() is called by the display update that first shows these values:
+#   rx->render: from the return of recvfrom_into() until display.refresh() has returned;
+#   sim->render: from the moment the traffic simulator (host/xplane_sim.py --probe) sent the packet. The simulator writes
+#   its send time (time.monotonic_ns() // 1000, 31 bits) into an unused field of DATA group 17. Only valid when the
+#   simulator runs on the same computer as the receiver (host/run_host.py): both read the same monotonic clock.
+# The last 512 samples (in usec) are kept. report() prints the percentiles 50, 90 and 99 and the maximum in msec.
+US_MASK = 0x7FFFFFFF
+
+class LatencyProbe:
+    def __init__(self, enabled=False, size=512):
+        self.enabled = enabled
+        self.size = size
+        self.rx2r = array.array("l", [0] * size) if enabled else None  # rx->render, usec
+        self.s2r = array.array("l", [0] * size) if enabled else None   # sim->render, usec
+        self.rx2r_cnt = 0
+        self.s2r_cnt = 0
+
+    # rx_ns: duration from receive to render in nsec. sent_us: send time written by the simulator, or 0
+    def add(self, rx_ns, sent_us=0):
+        if not self.enabled:
+            return
+        self.rx2r[self.rx2r_cnt % self.size] = rx_ns // 1000
+        self.rx2r_cnt += 1
+        if sent_us > 0:
+            self.s2r[self.s2r_cnt % self.size] = ((time.monotonic_ns() // 1000) - sent_us) & US_MASK
+            self.s2r_cnt += 1
+
+    # Returns p50, p90, p99, max in msec and the nr of samples
+    def percentiles(self, buf, cnt):
+        n = min(cnt, self.size)
+        if n == 0:
+            return 0, 0, 0, 0, 0
+        lst = sorted(buf[:n])
+        return lst[n * 50 // 100] / 1000, lst[n * 90 // 100] / 1000, lst[n * 99 // 100] / 1000, lst[n - 1] / 1000, n
+
+    def report(self):
+        if not self.enabled:
+            return
+        p50, p90, p99, t_max, n = self.percentiles(self.rx2r, self.rx2r_cnt)
+        s = "latency: rx->render p50/p90/p99/max {:.2f}/{:.2f}/{:.2f}/{:.2f} ms (n {})".format(p50, p90, p99, t_max, n)
+        if self.s2r_cnt > 0:
+            p50, p90, p99, t_max, n = self.percentiles(self.s2r, self.s2r_cnt)
+            s += ", sim->render {:.2f}/{:.2f}/{:.2f}/{:.2f} ms (n {})".format(p50, p90, p99, t_max, n)
+        print(s, file=sys.stderr)
+
+latency_probe = LatencyProbe(myState.latency_probe)
+
+# +-------------------------------------------------------+
+# Timing counters for the stages: receive -> decode -> display -> display refresh.
+# add() is called with the duration of a stage in nanoseconds (time.monotonic_ns()).
+# tick() is called from the main loop (or the render task). Every STATS_INTERVAL seconds it prints
+# a compact line: packets/s, dropped packets, min/avg/max per stage in msec and the free heap,
+# and it writes the same values to the labels of the "Stats" page. Then the counters start again.
+STG_RX = 0      # recvfrom_into()
+STG_DECODE = 1  # DecodePacket() / msgs_unpack()
+STG_DISP = 2    # disp_hdg_alt(), without the display refresh
+STG_REFRESH = 3 # display.refresh()
+stage_names = ("rx", "dec", "dsp", "ref")
+
+class StageStats:
+    def __init__(self, interval_t=0):
+        self.interval_t = interval_t
+        n = len(stage_names)
+        self.cnt = [0] * n
+        self.sum_ns = [0] * n
+        self.min_ns = [0] * n
+        self.max_ns = [0] * n
+        self.start_t = time.monotonic()
+        self.pkt_cnt_prev = 0
+        self.drop_cnt_prev = 0
+
+    def add(self, stage, dt_ns):
+        n = self.cnt[stage]
+        if n == 0 or dt_ns < self.min_ns[stage]:
+            self.min_ns[stage] = dt_ns
+        if dt_ns > self.max_ns[stage]:
+            self.max_ns[stage] = dt_ns
+        self.sum_ns[stage] += dt_ns
+        self.cnt[stage] = n + 1
+
+    def reset(self):
+        for _ in range(len(stage_names)):
+            self.cnt[_] = 0
+            self.sum_ns[_] = 0
+            self.min_ns[_] = 0
+            self.max_ns[_] = 0
+
+    # Returns min, avg and max of a stage in msec
+    def stage_ms(self, stage):
+        n = self.cnt[stage]
+        if n == 0:
+            return 0, 0, 0
+        return self.min_ns[stage] / 1000000, self.sum_ns[stage] / n / 1000000, self.max_ns[stage] / 1000000
+
+    # Called from the main loop. rx_pkt_cnt and dropped_cnt are the running totals of the receiver (dg)
+    def tick(self, rx_pkt_cnt, dropped_cnt):
+        if self.interval_t <= 0:
+            return False
+        curr_t = time.monotonic()
+        elapsed_t = curr_t - self.start_t
+        if elapsed_t < self.interval_t:
+            return False
+        pps = (rx_pkt_cnt - self.pkt_cnt_prev) / elapsed_t
+        drops = dropped_cnt - self.drop_cnt_prev
+        self.pkt_cnt_prev = rx_pkt_cnt
+        self.drop_cnt_prev = dropped_cnt
+        self.start_t = curr_t
+        free = gc_policy.mem_free()
+        lst = ["{:.1f} pps  drop {}".format(pps, drops)]
+        s = "stats: {:.1f} pps, drop {}".format(pps, drops)
+        for _ in range(len(stage_names)):
+            t_min, t_avg, t_max = self.stage_ms(_)
+            lst.append("{:3s} {:.2f}/{:.2f}/{:.2f} ms".format(stage_names[_], t_min, t_avg, t_max))
+            s += ", {} {:.2f}/{:.2f}/{:.2f}".format(stage_names[_], t_min, t_avg, t_max)
+        lst.append("free {} bytes".format(free))
+        print(s + " ms, free {}".format(free), file=sys.stderr)
+        latency_probe.report()
+        st_grp = myState.st_grp
+        if st_grp is not None:
+            for _ in range(len(st_grp)):
+                if _ < len(lst):
+                    st_grp[_].text = lst[_]
+            if myState.stats_page:
+                display.refresh()
+        self.reset()
+        return True
+
+stage_stats = StageStats(myState.stats_interval)
 
 print("\nThis script is running on an \'{}\'".format(myVars.read("id")), file=sys.stderr)
 
@@ -536,7 +827,8 @@ def get_page_name(page_index):
             return page_dict[page_index]
     return ''
 
-def disp_msg(msg_lst):
+# Param show_t: time in seconds to show the message. Use 0 from the asyncio tasks (see code.py), so that nothing waits
+def disp_msg(msg_lst, show_t=1):
     TAG = tag_adjust("disp_msg(): ")
     main_grp = myVars.read("main_grp")
     my_page_layout = myVars.read("my_page_layout")
@@ -568,16 +860,19 @@ def disp_msg(msg_lst):
                     print(TAG+f"{msg_grp[_].text}")
             display.root_group = main_grp
             my_page_layout.showing_page_name = "Message"
+            if not display.auto_refresh:  # the render stage of dg may have switched auto_refresh off
+                display.refresh()
             if my_debug:
                 print(TAG+f"showing page index: {my_page_layout.showing_page_index}")
                 print(TAG+f"showing page name: {my_page_layout.showing_page_name}")    
-        time.sleep(1)  # Display message just for a short time
+        if show_t > 0:
+            time.sleep(show_t)  # Display message just for a short time
 
 def go2_page(srch_name):
     global myVars
     TAG= tag_adjust("go2_page_name(): ")
-    page_names = ["Logo1",     "Logo2",     "Battery", "Datetime", "ID",      "Author",  "XPlane"]
-    grp_names =  ["logo1_grp", "logo2_grp", "ba_grp",  "dt_grp",   "ta1_grp", "ta2_grp", "xp_grp"]
+    page_names = ["Logo1",     "Logo2",     "Battery", "Datetime", "ID",      "Author",  "XPlane", "Stats"]
+    grp_names =  ["logo1_grp", "logo2_grp", "ba_grp",  "dt_grp",   "ta1_grp", "ta2_grp", "xp_grp", "st_grp"]
     my_page_layout = myVars.read("my_page_layout") 
     cpg = None
     grp = None
@@ -661,6 +956,91 @@ def blink_NEO_v2(nr_times, color_c):
         pixel.fill(NEO_blk)
         time.sleep(0.2)
 
+# +-------------------------------------------------------+
+# | Non-blocking Neopixel signalling                      |
+# +-------------------------------------------------------+
+# blink_NEO_color() and blink_NEO_v2() sleep while the led is on and off.
+# Called for each packet that limits the reception to about 2 packets per second.
+# The class NeoSignal never sleeps. A pattern is a tuple of steps: (color, duration in seconds).
+# start() selects a pattern. tick() is called from the main loop (or from the led task)
+# and changes the color of the led only when the current step has expired.
+NEO_PAT_NONE = 0
+NEO_PAT_PKT = 1      # packet activity: short green flicker
+NEO_PAT_NO_DATA = 2  # no data received: red pulse, repeats until another pattern is started
+NEO_PAT_BECN = 3     # X-Plane beacon found: 2 x green
+
+# pattern: (steps, repeat)
+neo_patterns = {
+    NEO_PAT_PKT: (((NEO_grn, 0.03), (NEO_blk, 0.07)), False),
+    NEO_PAT_NO_DATA: (((NEO_red, 0.2), (NEO_blk, 0.8)), True),
+    NEO_PAT_BECN: (((NEO_grn, 0.5), (NEO_blk, 0.5), (NEO_grn, 0.5), (NEO_blk, 0.5)), False),
+}
+
+neo_patterns_str = {
+    NEO_PAT_NONE: "NONE",
+    NEO_PAT_PKT: "PKT",
+    NEO_PAT_NO_DATA: "NO_DATA",
+    NEO_PAT_BECN: "BECN"
+}
+
+class NeoSignal:
+    def __init__(self, led, brightness=0.3):
+        self.led = led
+        self.led.brightness = brightness
+        self.pattern = NEO_PAT_NONE
+        self.steps = None
+        self.repeat = False
+        self.step_idx = 0
+        self.step_end_t = 0
+        self.color = None
+
+    def fill(self, color):
+        # Only write to the led when the color changes
+        if color != self.color:
+            self.led.fill(color)
+            self.color = color
+
+    def start(self, pattern):
+        # A packet flicker does not interrupt a running flicker or beacon pattern.
+        # It does end the (repeating) no-data pulse: data is received again
+        if pattern == NEO_PAT_PKT and self.steps is not None and not self.repeat:
+            return
+        if pattern == self.pattern and self.repeat:
+            return  # keep the repeating pattern in phase
+        steps, repeat = neo_patterns[pattern]
+        self.pattern = pattern
+        self.steps = steps
+        self.repeat = repeat
+        self.step_idx = 0
+        self.step_end_t = time.monotonic() + steps[0][1]
+        self.fill(steps[0][0])
+
+    def stop(self):
+        self.pattern = NEO_PAT_NONE
+        self.steps = None
+        self.repeat = False
+        self.fill(NEO_blk)
+
+    def tick(self, t=None):
+        steps = self.steps
+        if steps is None:
+            return
+        if t is None:
+            t = time.monotonic()
+        if t < self.step_end_t:
+            return
+        self.step_idx += 1
+        if self.step_idx >= len(steps):
+            if not self.repeat:
+                self.stop()
+                return
+            self.step_idx = 0
+        color, duration = steps[self.step_idx]
+        self.step_end_t = t + duration
+        self.fill(color)
+
+neo_signal = NeoSignal(pixel)
+
 # See: https://github.com/adafruit/circuitpython/pull/2756
 def clr_disp():
     TAG= tag_adjust("clr_disp(): ")
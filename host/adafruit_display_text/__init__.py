@@ -0,0 +1,8 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the library: adafruit_display_text
+# See: run_host.py
+#
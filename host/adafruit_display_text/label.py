@@ -0,0 +1,31 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for: adafruit_display_text.label
+# The text and position are kept. Nothing is drawn. See: run_host.py
+#
+import displayio
+
+class Label(displayio.Group):
+    def __init__(self, font, *, text="", x=0, y=0, scale=1, color=0xFFFFFF, background_color=None,
+                 anchor_point=None, anchored_position=None, save_text=True, **kwargs):
+        super().__init__(scale=scale, x=x, y=y)
+        self.font = font
+        self.color = color
+        self.background_color = background_color
+        self.anchor_point = anchor_point
+        self.anchored_position = anchored_position
+        self._text = text
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, value):
+        self._text = value
+
+    def __repr__(self):
+        return "<Label '{}'>".format(self._text)
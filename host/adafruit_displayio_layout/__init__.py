@@ -0,0 +1,8 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the library: adafruit_displayio_layout
+# See: run_host.py
+#
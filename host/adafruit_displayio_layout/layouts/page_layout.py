@@ -0,0 +1,86 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for: adafruit_displayio_layout.layouts.page_layout
+# Keeps the pages and which page is showing, with the same properties as the library. See: run_host.py
+#
+import displayio
+
+class PageLayout(displayio.Group):
+    def __init__(self, x=0, y=0):
+        super().__init__(x=x, y=y)
+        self.x = x
+        self.y = y
+        self._page_content_list = []
+        self._cur_showing_index = 0
+
+    def add_content(self, page_content, page_name=None):
+        self._page_content_list.append({"content": page_content, "page_name": page_name})
+        if len(self._page_content_list) > 1:
+            page_content.hidden = True
+        else:
+            self.append(page_content)
+
+    def _update_showing(self, index):
+        if index < 0 or index >= len(self._page_content_list):
+            raise IndexError("Page index out of range: {}".format(index))
+        self._page_content_list[self._cur_showing_index]["content"].hidden = True
+        self._cur_showing_index = index
+        page = self._page_content_list[index]["content"]
+        page.hidden = False
+        del self[:]
+        self.append(page)
+
+    def get_page(self, page_name=None, page_index=None):
+        if page_name is not None:
+            for _ in self._page_content_list:
+                if _["page_name"] == page_name:
+                    return _
+            raise KeyError("Did not find a page with name: {}".format(page_name))
+        if page_index is not None:
+            return self._page_content_list[page_index]
+        raise AttributeError("Must pass either page_name or page_index")
+
+    def show_page(self, page_name=None, page_index=None):
+        page = self.get_page(page_name, page_index)
+        self._update_showing(self._page_content_list.index(page))
+
+    @property
+    def showing_page_index(self):
+        return self._cur_showing_index
+
+    @showing_page_index.setter
+    def showing_page_index(self, new_index):
+        self._update_showing(new_index)
+
+    @property
+    def showing_page_name(self):
+        if len(self._page_content_list) == 0:
+            return None
+        return self._page_content_list[self._cur_showing_index]["page_name"]
+
+    @showing_page_name.setter
+    def showing_page_name(self, new_name):
+        self.show_page(page_name=new_name)
+
+    @property
+    def showing_page_content(self):
+        return self._page_content_list[self._cur_showing_index]["content"]
+
+    def next_page(self, loop=True):
+        index = self._cur_showing_index + 1
+        if index >= len(self._page_content_list):
+            if not loop:
+                raise IndexError("Reached the end of the pages")
+            index = 0
+        self._update_showing(index)
+
+    def previous_page(self, loop=True):
+        index = self._cur_showing_index - 1
+        if index < 0:
+            if not loop:
+                raise IndexError("Reached the beginning of the pages")
+            index = len(self._page_content_list) - 1
+        self._update_showing(index)
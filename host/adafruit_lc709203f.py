@@ -0,0 +1,27 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the library: adafruit_lc709203f
+# Returns the values of a charged battery. See: run_host.py
+#
+class PackSize:
+    MAH100 = 0x08
+    MAH200 = 0x0B
+    MAH400 = 0x0E
+    MAH500 = 0x10
+    MAH1000 = 0x19
+    MAH2000 = 0x2D
+    MAH3000 = 0x36
+
+class LC709203F:
+    def __init__(self, i2c_bus, address=0x0B):
+        self.i2c_bus = i2c_bus
+        self.address = address
+        self.ic_version = 0x2717
+        self.cell_voltage = 4.1
+        self.cell_percent = 95.0
+        self.pack_size = PackSize.MAH500
+        self.thermistor_bconstant = 0
+        self.thermistor_enable = False
@@ -0,0 +1,24 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the library: adafruit_ntp
+# The datetime is taken from the clock of the host (which is synchronized by the OS). See: run_host.py
+#
+import time
+
+class NTP:
+    def __init__(self, socketpool, *, server="0.adafruit.pool.ntp.org", port=123, tz_offset=0, socket_timeout=10, cache_seconds=0):
+        self._pool = socketpool
+        self._server = server
+        self._port = port
+        self._tz_offset = int(tz_offset * 60 * 60)
+
+    @property
+    def datetime(self):
+        return time.gmtime(time.time() + self._tz_offset)
+
+    @property
+    def utc_ns(self):
+        return time.time_ns()
@@ -0,0 +1,47 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the library: adafruit_requests
+# Uses urllib of CPython. Only get() and the attributes used in this project. See: run_host.py
+#
+import urllib.request
+import urllib.error
+
+class Response:
+    def __init__(self, status_code, content):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        import json
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+    def __bool__(self):
+        return self.status_code < 400
+
+class Session:
+    def __init__(self, socket_pool, ssl_context=None):
+        self._pool = socket_pool
+        self._ssl_context = ssl_context
+
+    def get(self, url, headers=None, timeout=60):
+        try:
+            req = urllib.request.Request(url, headers=headers or {})
+            with urllib.request.urlopen(req, timeout=timeout, context=self._ssl_context) as r:
+                return Response(r.status, r.read())
+        except urllib.error.HTTPError as e:
+            return Response(e.code, e.read())
+        except urllib.error.URLError as e:
+            raise OSError(str(e.reason))
+
+    def _free_sockets(self, force=False):
+        pass
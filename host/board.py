@@ -0,0 +1,47 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the CircuitPython module: board
+# Mimics the Adafruit Feather ESP32-S2 TFT: a 240 x 135 display, a Neopixel, a LED and an I2C bus.
+# See: run_host.py
+#
+import displayio
+
+board_id = "host_cpython"  # on the device: 'adafruit_feather_esp32s2_tft'
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return "board." + self.name
+
+LED = Pin("LED")
+NEOPIXEL = Pin("NEOPIXEL")
+TX = Pin("TX")
+RX = Pin("RX")
+SCL = Pin("SCL")
+SDA = Pin("SDA")
+
+DISPLAY = displayio.Display(240, 135)
+
+class I2CBus:
+    def try_lock(self):
+        return True
+
+    def unlock(self):
+        pass
+
+    def scan(self):
+        return [0x0B]  # the LC709203F battery monitor
+
+_i2c = None
+
+# board.I2C() returns the same bus object on every call, like on the device
+def I2C():
+    global _i2c
+    if _i2c is None:
+        _i2c = I2CBus()
+    return _i2c
@@ -0,0 +1,92 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the CircuitPython module: displayio
+# A headless display: the groups, labels and bitmaps are kept in memory, nothing is drawn.
+# Display.refresh() counts the refreshes, so the render stage can be measured (see: StageStats in common.py).
+# See: run_host.py
+#
+import time
+
+class Group(list):
+    def __init__(self, *, scale=1, x=0, y=0):
+        super().__init__()
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+
+    def __hash__(self):
+        return id(self)
+
+    def __eq__(self, other):
+        return self is other
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self._buf = bytearray(width * height)
+
+    def __getitem__(self, index):
+        if isinstance(index, tuple):
+            index = index[1] * self.width + index[0]
+        return self._buf[index]
+
+    def __setitem__(self, index, value):
+        if isinstance(index, tuple):
+            index = index[1] * self.width + index[0]
+        self._buf[index] = value
+
+    def fill(self, value):
+        for _ in range(len(self._buf)):
+            self._buf[_] = value
+
+class Palette(list):
+    def __init__(self, color_count):
+        super().__init__([0] * color_count)
+
+class ColorConverter:
+    pass
+
+class OnDiskBitmap:
+    # Only reads the size from the header of the .bmp file
+    def __init__(self, file):
+        if isinstance(file, str):
+            with open(file, "rb") as f:
+                hdr = f.read(26)
+        else:
+            hdr = file.read(26)
+        self.width = int.from_bytes(hdr[18:22], "little", signed=True)
+        self.height = abs(int.from_bytes(hdr[22:26], "little", signed=True))
+        self.pixel_shader = ColorConverter()
+
+class TileGrid:
+    def __init__(self, bitmap, *, pixel_shader=None, width=1, height=1, tile_width=None, tile_height=None, default_tile=0, x=0, y=0):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.x = x
+        self.y = y
+        self.hidden = False
+
+class Display:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.rotation = 0
+        self.auto_refresh = True
+        self.root_group = None
+        self.brightness = 1.0
+        self.refresh_cnt = 0
+        self.refresh_last_t = 0
+
+    def refresh(self, *, target_frames_per_second=None, minimum_frames_per_second=0):
+        self.refresh_cnt += 1
+        self.refresh_last_t = time.monotonic()
+        return True
+
+def release_displays():
+    pass
@@ -0,0 +1,37 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the CircuitPython module: microcontroller
+# microcontroller.nvm is kept in a file, so it survives a restart of the script like the NVM of the device survives a reset.
+# The file is the value of the environment variable HOST_NVM_FILE (default: circuitpy_nvm.bin in the temp folder). See: run_host.py
+#
+import os
+import tempfile
+
+NVM_SIZE = 8192  # like the Feather ESP32-S2 TFT
+
+class ByteArray:
+    def __init__(self, fn, size):
+        self.fn = fn
+        self.buf = bytearray(size)
+        try:
+            with open(fn, "rb") as f:
+                data = f.read(size)
+            self.buf[:len(data)] = data
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self.buf)
+
+    def __getitem__(self, key):
+        return self.buf[key]
+
+    def __setitem__(self, key, value):
+        self.buf[key] = value
+        with open(self.fn, "wb") as f:
+            f.write(self.buf)
+
+nvm = ByteArray(os.getenv("HOST_NVM_FILE") or os.path.join(tempfile.gettempdir(), "circuitpy_nvm.bin"), NVM_SIZE)
@@ -0,0 +1,38 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the library: neopixel
+# Keeps the colors of the pixels and counts the writes. See: run_host.py
+#
+class NeoPixel:
+    def __init__(self, pin, n, *, bpp=3, brightness=1.0, auto_write=True, pixel_order=None):
+        self.pin = pin
+        self.n = n
+        self.brightness = brightness
+        self.auto_write = auto_write
+        self._pixels = [(0, 0, 0)] * n
+        self.write_cnt = 0
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, index):
+        return self._pixels[index]
+
+    def __setitem__(self, index, color):
+        self._pixels[index] = color
+        if self.auto_write:
+            self.show()
+
+    def fill(self, color):
+        self._pixels = [color] * self.n
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        self.write_cnt += 1
+
+    def deinit(self):
+        pass
@@ -0,0 +1,20 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the CircuitPython module: rtc
+# The RTC runs from the clock of the host. Setting it keeps the offset. See: run_host.py
+#
+import time
+
+class RTC:
+    _offset = 0  # shared by all RTC objects, like the one built-in RTC of the device
+
+    @property
+    def datetime(self):
+        return time.localtime(time.time() + RTC._offset)
+
+    @datetime.setter
+    def datetime(self, value):
+        RTC._offset = time.mktime(tuple(value)) - time.time()
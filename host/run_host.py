@@ -0,0 +1,74 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+#
+# Run the scripts of this project on a host computer with CPython (3.11 or newer) instead of on the device.
+# The folder host/ contains stand-in modules for the CircuitPython modules and libraries:
+# board, displayio, terminalio, digitalio, microcontroller, neopixel, rtc, supervisor, wifi, socketpool,
+# adafruit_display_text, adafruit_displayio_layout, adafruit_lc709203f, adafruit_ntp and adafruit_requests.
+# The sockets are real sockets, the display is headless, wifi.radio is always connected.
+#
+# This script:
+# - reads example/settings.toml into the environment (like CircuitPython does for os.getenv()).
+#   A variable that is already set in the environment is not overwritten;
+# - puts host/ and example/ in front of the module search path;
+# - runs a script from example/ as __main__ (default: code.py).
+#
+# Usage, from the root of this repo:
+#   python host/run_host.py                   # runs example/code.py
+#   HOST_IP=127.0.0.1 USE_UDP_HOST=1 python host/run_host.py
+#   python host/run_host.py benchmarks.py bench.json   # runs example/benchmarks.py, results in bench.json
+#
+import os
+import sys
+import runpy
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+host_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(host_dir)
+example_dir = os.path.join(root_dir, "example")
+
+def load_settings(fn):
+    if tomllib is not None:
+        with open(fn, "rb") as f:
+            settings = tomllib.load(f)
+    else:
+        # Python < 3.11: only lines like: KEY="value" # comment
+        settings = {}
+        with open(fn, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line[0] == "#" or "=" not in line:
+                    continue
+                k, v = line.split("=", 1)
+                v = v.strip()
+                if v[:1] == '"':
+                    v = v[1:v.index('"', 1)]
+                else:
+                    v = v.split("#", 1)[0].strip()
+                settings[k.strip()] = v
+    for k, v in settings.items():
+        if k not in os.environ:
+            os.environ[k] = str(v)
+    return settings
+
+def main(argv):
+    script = argv[1] if len(argv) > 1 else "code.py"
+    if not os.path.isabs(script) and not os.path.exists(script):
+        script = os.path.join(example_dir, script)
+    load_settings(os.path.join(example_dir, "settings.toml"))
+    # host/ first: its modules replace the .mpy libraries in lib/
+    sys.path.insert(0, example_dir)
+    sys.path.insert(0, host_dir)
+    os.chdir(root_dir)  # the images are read from: bmp/
+    sys.argv = [script] + argv[2:]
+    runpy.run_path(script, run_name="__main__")
+
+if __name__ == "__main__":
+    main(sys.argv)
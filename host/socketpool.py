@@ -0,0 +1,112 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the CircuitPython module: socketpool
+# The sockets are real CPython sockets. They behave like the ones of CircuitPython:
+# - a timeout raises OSError with errno 116 (ETIMEDOUT);
+# - a non-blocking socket without data raises OSError with errno 11 (EAGAIN);
+# - only the methods of the CircuitPython Socket class are available (e.g. no recvfrom()).
+# bind() to a multicast group address binds to the port and joins the group.
+# See: run_host.py
+#
+import socket as _socket
+
+ETIMEDOUT = 116
+EAGAIN = 11
+
+class Socket:
+    def __init__(self, sock):
+        self._sock = sock
+        self.type = sock.type
+
+    def _wrap(self, func, *args):
+        try:
+            return func(*args)
+        except _socket.timeout:
+            raise OSError(ETIMEDOUT, "ETIMEDOUT")
+        except BlockingIOError:
+            raise OSError(EAGAIN, "EAGAIN")
+
+    def bind(self, address):
+        host, port = address
+        self._sock.setsockopt(_socket.SOL_SOCKET, _socket.SO_REUSEADDR, 1)
+        if host and 224 <= int(host.split(".")[0]) <= 239:
+            self._sock.bind(("", port))
+            mreq = _socket.inet_aton(host) + _socket.inet_aton("0.0.0.0")
+            self._sock.setsockopt(_socket.IPPROTO_IP, _socket.IP_ADD_MEMBERSHIP, mreq)
+        else:
+            self._sock.bind((host, port))
+
+    def connect(self, address):
+        self._wrap(self._sock.connect, address)
+
+    def listen(self, backlog):
+        self._sock.listen(backlog)
+
+    def accept(self):
+        sock, addr = self._wrap(self._sock.accept)
+        return Socket(sock), addr
+
+    def settimeout(self, value):
+        self._sock.settimeout(value)
+
+    def setblocking(self, flag):
+        self._sock.setblocking(flag)
+
+    def setsockopt(self, level, optname, value):
+        self._sock.setsockopt(level, optname, value)
+
+    def send(self, buf):
+        return self._wrap(self._sock.send, buf)
+
+    def sendall(self, buf):
+        return self._wrap(self._sock.sendall, buf)
+
+    def sendto(self, buf, address):
+        return self._wrap(self._sock.sendto, buf, address)
+
+    def recv_into(self, buf, bufsize=0):
+        return self._wrap(self._sock.recv_into, buf, bufsize)
+
+    def recvfrom_into(self, buf, bufsize=0):
+        return self._wrap(self._sock.recvfrom_into, buf, bufsize)
+
+    def close(self):
+        self._sock.close()
+
+    def fileno(self):
+        return self._sock.fileno()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+class SocketPool:
+    AF_INET = _socket.AF_INET
+    AF_INET6 = _socket.AF_INET6
+    SOCK_STREAM = _socket.SOCK_STREAM
+    SOCK_DGRAM = _socket.SOCK_DGRAM
+    SOCK_RAW = _socket.SOCK_RAW
+    IPPROTO_IP = _socket.IPPROTO_IP
+    IPPROTO_TCP = _socket.IPPROTO_TCP
+    IPPROTO_UDP = _socket.IPPROTO_UDP
+    SOL_SOCKET = _socket.SOL_SOCKET
+    SO_REUSEADDR = _socket.SO_REUSEADDR
+    TCP_NODELAY = _socket.TCP_NODELAY
+    IP_MULTICAST_TTL = _socket.IP_MULTICAST_TTL
+    EAI_NONAME = _socket.EAI_NONAME
+    gaierror = _socket.gaierror
+    timeout = _socket.timeout
+
+    def __init__(self, radio):
+        self.radio = radio
+
+    def socket(self, family=_socket.AF_INET, type=_socket.SOCK_STREAM, proto=0):
+        return Socket(_socket.socket(family, type, proto))
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        return _socket.getaddrinfo(host, port, family, type, proto, flags)
@@ -0,0 +1,26 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the CircuitPython module: supervisor
+# See: run_host.py
+#
+import time
+
+class StatusBar:
+    console = True
+    display = False
+
+class Runtime:
+    serial_connected = True
+    usb_connected = False
+
+status_bar = StatusBar()
+runtime = Runtime()
+
+def ticks_ms():
+    return int(time.monotonic() * 1000) & 0x3FFFFFFF
+
+def reload():
+    raise SystemExit(0)
@@ -0,0 +1,13 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the CircuitPython module: terminalio
+# See: run_host.py
+#
+class BuiltinFont:
+    def get_bounding_box(self):
+        return (6, 12)
+
+FONT = BuiltinFont()
@@ -0,0 +1,65 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+# Host (CPython) stand-in for the CircuitPython module: wifi
+# wifi.radio is always connected. Its IPv4 address is the value of the environment variable HOST_IP
+# (default: 127.0.0.1), not WIFI_IP of settings.toml: the host can only bind its own addresses.
+# See: run_host.py
+#
+import os
+import ipaddress
+
+class AuthMode:
+    OPEN = 0
+    WEP = 1
+    WPA = 2
+    WPA2 = 3
+    WPA3 = 4
+    PSK = 5
+    ENTERPRISE = 6
+
+class Network:
+    def __init__(self, ssid, channel, rssi):
+        self.ssid = ssid
+        self.channel = channel
+        self.rssi = rssi
+        self.authmode = [AuthMode.WPA2]
+
+class Radio:
+    def __init__(self):
+        self.enabled = True
+        self.hostname = "host-cpython"
+        self.mac_address = bytes(6)
+        self.ipv4_address = ipaddress.ip_address(os.getenv("HOST_IP", "127.0.0.1"))
+        self.ipv4_subnet = ipaddress.ip_address("255.0.0.0")
+        self.ipv4_gateway = ipaddress.ip_address("127.0.0.1")
+        self.ipv4_dns = ipaddress.ip_address("127.0.0.1")
+        self.requested_ipv4 = None  # the address asked for by set_ipv4_address(). It is not applied
+        self.connected = True
+        self.ap_info = None
+
+    def connect(self, ssid=None, password=None, *, channel=0, bssid=None, timeout=None):
+        self.connected = True
+
+    def stop_dhcp(self):
+        pass
+
+    def start_dhcp(self):
+        pass
+
+    def set_ipv4_address(self, *, ipv4, netmask, gateway, ipv4_dns=None):
+        self.requested_ipv4 = ipv4
+
+    def start_scanning_networks(self, *, start_channel=1, stop_channel=11):
+        return iter([Network("host", 1, -40)])
+
+    def stop_scanning_networks(self):
+        pass
+
+    # No ICMP without root rights. Like the device when there is no response
+    def ping(self, ip, *, timeout=0.5):
+        return None
+
+radio = Radio()
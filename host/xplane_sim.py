@@ -0,0 +1,350 @@
+# _*_ coding: utf-8 _*_
+# SPDX-FileCopyrightText: 2024 Paulus Schulinck
+#
+# SPDX-License-Identifier: MIT
+##############################
+#
+# X-Plane traffic simulator (CPython). Sends X-Plane UDP packets to a host and port,
+# so that the receivers of this project can be tested without X-Plane running:
+# - BECN: the beacon, as parsed by dr.FindIp() (XPlaneDatarefRx.py): "BECN\0" + struct <BBiiIH + computer name;
+# - DATA: 5 bytes header "DATA\0" + groups of 36 bytes (int group ID + 8 floats), as parsed by dg.msgs_unpack()
+#   (XPlaneUdpDatagram.py). The groups are selectable, e.g. 3, 17, 20, 102. Other group IDs contain zeros;
+# - XGPS, XATT, XTRA: the ASCII "Broadcast to all mapping apps" packets of X-Plane, e.g. "XGPS1,lon,lat,alt,track,gs";
+# - RPOS: on a request "RPOS\0<freq>\0" the simulator sends "RPOS4" + struct <dddffffffffff (69 bytes) at that frequency;
+# - DSEL / USEL: the simulator selects or deselects the DATA groups, as sent by dg.DataSelect() (XPlaneUdpDatagram.py);
+# - RREF: the simulator listens on the X-Plane port (default 49000) for RREF requests ("RREF\0" + <ii400s:
+#   frequency, index, dataref name), as sent by dr.AddDataRef(). It replies, at the requested frequency,
+#   with "RREF," + pairs of <if (index, value), as parsed by dr.GetValues(). A frequency of 0 ends the subscription;
+# - DREF: "DREF\0" + <f500s (value, dataref name), as sent by dr.SetDataRef(). From then on the RREF replies
+#   for that dataref contain the value written;
+# - CMND: "CMND\0" + command name, as sent by dr.SendCommand(). The command is only counted and printed.
+# The values come from a simple flight model: an aircraft flying circles while climbing and descending.
+#
+# Rate, jitter and packet loss are configurable. At the end the nr of packets sent and dropped per type is printed.
+#
+# Usage, from the root of this repo:
+#   python host/xplane_sim.py --host 127.0.0.1 --port 49707 --rate 50
+#   python host/xplane_sim.py --rate 1000 --jitter 2 --loss 0.01 --duration 30
+#   python host/xplane_sim.py --types DATA,XGPS,XATT --groups 3,17,20,102 --becn-host 239.255.1.1
+#   python host/xplane_sim.py --probe --rate 50     # together with: LATENCY_PROBE=1 python host/run_host.py
+#   python host/xplane_sim.py --help
+#
+import argparse
+import math
+import random
+import socket
+import struct
+import sys
+import time
+
+DATA_GRP_SIZE = 36
+PKT_TYPES = ("DATA", "XGPS", "XATT", "XTRA")
+XP_PORT = 49000      # port X-Plane listens on (RREF requests)
+BECN_GROUP = "239.255.1.1"
+BECN_PORT = 49707
+
+data_grp_struct = struct.Struct("<i8f")
+probe_grp_struct = struct.Struct("<ifffiffif")  # group 17 with --probe: the layout of udp_unpack_str_17
+becn_struct = struct.Struct("<BBiiIH")
+rref_req_struct = struct.Struct("<5sii400s")
+rref_val_struct = struct.Struct("<if")
+dref_struct = struct.Struct("<5sf500s")
+rpos_struct = struct.Struct("<dddffffffffff")  # after the 5 bytes header "RPOS4": 69 bytes
+
+class FlightModel:
+    # An aircraft flying a circle of 2 minutes, climbing and descending between 3000 and 5000 ft
+    def __init__(self, lat=38.78, lon=-9.13):
+        self.lat0 = lat
+        self.lon0 = lon
+        self.t0 = time.monotonic()
+        self.update()
+
+    def update(self):
+        t = time.monotonic() - self.t0
+        a = 2 * math.pi * t / 120
+        self.hdg_true = math.degrees(a) % 360
+        self.mag_var = -1.5
+        self.hdg_mag = (self.hdg_true - self.mag_var) % 360
+        self.pitch = 2.0 * math.cos(2 * math.pi * t / 60)
+        self.roll = 25.0
+        self.kias = 120.0
+        self.ktgs = 130.0
+        self.alt_ft = 4000 + 1000 * math.sin(2 * math.pi * t / 60)
+        self.terrain_ft = 150.0
+        r = 0.03  # degrees
+        self.lat = self.lat0 + r * math.sin(a)
+        self.lon = self.lon0 - r * math.cos(a)
+        self.dme_dist = 12.0 + 5 * math.sin(a)
+
+    def data_group(self, grp_id):
+        if grp_id == 3:
+            v = (self.kias, self.kias, self.kias * 1.06, self.ktgs, 0.0, self.kias * 1.151, self.kias * 1.22, self.ktgs * 1.151)
+        elif grp_id == 17:
+            # the order of the fields as in fields_17 of XPlaneUdpDatagram.py
+            v = (self.pitch, self.roll, self.hdg_true, 0.0, self.hdg_mag, self.mag_var, 0.0, self.hdg_mag)
+        elif grp_id == 20:
+            v = (self.lat, self.lon, self.alt_ft, self.alt_ft - self.terrain_ft, self.terrain_ft, self.alt_ft, 38.0, -9.0)
+        elif grp_id == 102:
+            v = (1.0, 1.0, 1.0, self.dme_dist, self.ktgs, self.dme_dist / self.ktgs * 60, 3.0, 113.9)
+        else:
+            v = (0.0,) * 8
+        return v
+
+    def xgps(self):
+        return "XGPS1,{:.6f},{:.6f},{:.1f},{:.2f},{:.1f}".format(
+            self.lon, self.lat, self.alt_ft * 0.3048, self.hdg_true, self.ktgs * 0.514444)
+
+    def xatt(self):
+        return "XATT1,{:.1f},{:.1f},{:.1f},0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0,0.0".format(self.hdg_true, self.pitch, self.roll)
+
+    def xtra(self):
+        return "XTRA1,4CA123,{:.6f},{:.6f},{:.0f},0,1,{:.0f},{:.0f},TAP123".format(
+            self.lat + 0.02, self.lon + 0.02, self.alt_ft + 500, (self.hdg_true + 180) % 360, 250)
+
+    # Values for RREF subscriptions, by dataref name
+    def dataref(self, name):
+        return {
+            "sim/cockpit2/gauges/indicators/heading_electric_deg_mag_pilot": self.hdg_mag,
+            "sim/flightmodel/position/mag_psi": self.hdg_mag,
+            "sim/flightmodel/position/psi": self.hdg_true,
+            "sim/flightmodel/position/theta": self.pitch,
+            "sim/flightmodel/position/phi": self.roll,
+            "sim/flightmodel/position/latitude": self.lat,
+            "sim/flightmodel/position/longitude": self.lon,
+            "sim/flightmodel/position/elevation": self.alt_ft * 0.3048,
+            "sim/cockpit2/gauges/indicators/altitude_ft_pilot": self.alt_ft,
+            "sim/flightmodel/position/indicated_airspeed": self.kias,
+            "sim/flightmodel/position/groundspeed": self.ktgs * 0.514444,
+        }.get(name, 0.0)
+
+class XPlaneSim:
+    def __init__(self, args):
+        self.args = args
+        self.fm = FlightModel()
+        self.tx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.tx_sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+        self.dest = (args.host, args.port)
+        self.becn_dest = (args.becn_host or args.host, args.becn_port)
+        self.types = [_ for _ in args.types.split(",") if _]
+        self.groups = [int(_) for _ in args.groups.split(",") if _]
+        self.data_buf = bytearray(5 + DATA_GRP_SIZE * len(self.groups))
+        self.data_buf[0:5] = b"DATA\x00"
+        self.becn_pkt = b"BECN\x00" + becn_struct.pack(1, 2, 1, args.xp_version, 1, args.xp_port) + args.hostname.encode() + b"\x00"
+        self.sent = {_: 0 for _ in PKT_TYPES + ("BECN", "RREF", "RPOS")}
+        self.lost = {_: 0 for _ in PKT_TYPES + ("BECN", "RREF", "RPOS")}
+        # RREF subscriptions. key: (address, index), value: [freq, name, next send time]
+        self.subs = {}
+        # RPOS subscriptions. key: address, value: [freq, next send time]
+        self.rpos_subs = {}
+        # Values written with DREF. key: dataref name, value: the value
+        self.drefs = {}
+        self.cmnd_cnt = 0
+        self.rx_sock = None
+        if args.xp_port > 0:
+            self.rx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.rx_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.rx_sock.bind((args.bind, args.xp_port))
+            self.rx_sock.setblocking(False)
+        self.rx_buf = bytearray(1500)
+
+    def send(self, kind, pkt, dest):
+        if self.args.loss > 0 and random.random() < self.args.loss:
+            self.lost[kind] += 1
+            return
+        try:
+            self.tx_sock.sendto(pkt, dest)
+            self.sent[kind] += 1
+        except OSError as e:
+            self.lost[kind] += 1
+            if self.args.verbose:
+                print("xplane_sim: sendto {} failed: {}".format(dest, e), file=sys.stderr)
+
+    def build_data(self):
+        ofs = 5
+        for grp_id in self.groups:
+            if grp_id == 17 and self.args.probe:
+                # The send time in usec (31 bits) in the unused int field. See: LatencyProbe in common.py
+                v = self.fm.data_group(17)
+                sent_us = (time.monotonic_ns() // 1000) & 0x7FFFFFFF
+                probe_grp_struct.pack_into(self.data_buf, ofs, 17, v[0], v[1], v[2], sent_us, v[4], v[5], 0, v[7])
+            else:
+                data_grp_struct.pack_into(self.data_buf, ofs, grp_id, *self.fm.data_group(grp_id))
+            ofs += DATA_GRP_SIZE
+        return self.data_buf
+
+    def send_type(self, kind):
+        if kind == "DATA":
+            self.send(kind, self.build_data(), self.dest)
+        elif kind == "XGPS":
+            self.send(kind, self.fm.xgps().encode(), self.dest)
+        elif kind == "XATT":
+            self.send(kind, self.fm.xatt().encode(), self.dest)
+        elif kind == "XTRA":
+            self.send(kind, self.fm.xtra().encode(), self.dest)
+
+    # Handle the RREF requests waiting in the socket
+    def poll_requests(self, t):
+        if self.rx_sock is None:
+            return
+        while True:
+            try:
+                size, addr = self.rx_sock.recvfrom_into(self.rx_buf)
+            except (BlockingIOError, InterruptedError):
+                return
+            if size == rref_req_struct.size and self.rx_buf[0:4] == b"RREF":
+                _, freq, idx, name = rref_req_struct.unpack_from(self.rx_buf)
+                name = name.split(b"\x00", 1)[0].decode()
+                key = (addr, idx)
+                if freq == 0:
+                    self.subs.pop(key, None)
+                else:
+                    self.subs[key] = [freq, name, t]
+                if self.args.verbose:
+                    print("xplane_sim: RREF from {}: idx {}, {} Hz, {}".format(addr, idx, freq, name), file=sys.stderr)
+            elif size == dref_struct.size and self.rx_buf[0:5] == b"DREF\x00":
+                _, value, name = dref_struct.unpack_from(self.rx_buf)
+                name = name.split(b"\x00", 1)[0].decode()
+                self.drefs[name] = value
+                print("xplane_sim: DREF from {}: {} = {}".format(addr, name, value), file=sys.stderr)
+            elif size > 5 and self.rx_buf[0:5] == b"CMND\x00":
+                self.cmnd_cnt += 1
+                print("xplane_sim: CMND from {}: {} (nr {})".format(addr, bytes(self.rx_buf[5:size]).decode(), self.cmnd_cnt), file=sys.stderr)
+            elif size >= 5 and self.rx_buf[0:5] == b"RPOS\x00":
+                # "RPOS" + NULL + the frequency as text + NULL
+                txt = bytes(self.rx_buf[5:size]).split(b"\x00", 1)[0]
+                freq = int(txt) if txt.isdigit() else 0
+                if freq == 0:
+                    self.rpos_subs.pop(addr, None)
+                else:
+                    self.rpos_subs[addr] = [freq, t]
+                print("xplane_sim: RPOS from {}: {} Hz".format(addr, freq), file=sys.stderr)
+            elif size >= 5 and self.rx_buf[0:5] in (b"DSEL\x00", b"USEL\x00"):
+                self.select_groups(self.rx_buf[0:4] == b"DSEL", self.rx_buf, size)
+            elif self.args.verbose:
+                print("xplane_sim: ignored {} bytes from {}: {}".format(size, addr, bytes(self.rx_buf[:8])), file=sys.stderr)
+
+    # DSEL / USEL: select or deselect DATA groups. The message has an int per group ID
+    def select_groups(self, select, buf, size):
+        for ofs in range(5, size - 3, 4):
+            grp_id = struct.unpack_from("<i", buf, ofs)[0]
+            if select and grp_id not in self.groups:
+                self.groups.append(grp_id)
+            elif not select and grp_id in self.groups:
+                self.groups.remove(grp_id)
+        self.data_buf = bytearray(5 + DATA_GRP_SIZE * len(self.groups))
+        self.data_buf[0:5] = b"DATA\x00"
+        print("xplane_sim: {}: DATA groups now: {}".format("DSEL" if select else "USEL",
+              ",".join(str(_) for _ in self.groups)), file=sys.stderr)
+
+    # Send the RPOS packets that are due
+    def send_rpos(self, t):
+        fm = self.fm
+        for addr, sub in self.rpos_subs.items():
+            freq, next_t = sub
+            if t >= next_t:
+                sub[1] = next_t + 1.0 / freq if t - next_t < 1.0 else t + 1.0 / freq
+                pkt = b"RPOS4" + rpos_struct.pack(fm.lon, fm.lat, fm.alt_ft * 0.3048, (fm.alt_ft - fm.terrain_ft) * 0.3048,
+                                                  fm.pitch, fm.hdg_true, fm.roll, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+                self.send("RPOS", pkt, addr)
+
+    # Send the RREF values that are due. One packet per subscriber address
+    def send_rref(self, t):
+        due = {}
+        for key, sub in self.subs.items():
+            freq, name, next_t = sub
+            if t >= next_t:
+                sub[2] = next_t + 1.0 / freq if t - next_t < 1.0 else t + 1.0 / freq
+                value = self.drefs[name] if name in self.drefs else self.fm.dataref(name)
+                due.setdefault(key[0], []).append((key[1], value))
+        for addr, values in due.items():
+            pkt = bytearray(b"RREF,")
+            for idx, value in values:
+                pkt += rref_val_struct.pack(idx, value)
+            self.send("RREF", pkt, addr)
+
+    def run(self):
+        args = self.args
+        period = 1.0 / args.rate
+        jitter = args.jitter / 1000
+        becn_period = 1.0 / args.becn_hz if args.becn_hz > 0 else 0
+        t_start = time.monotonic()
+        t_end = t_start + args.duration if args.duration > 0 else None
+        next_t = t_start
+        becn_t = t_start
+        report_t = t_start + args.report if args.report > 0 else None
+        n = 0
+        print("xplane_sim: sending {} (DATA groups {}) to {}:{} at {} pps, jitter {} ms, loss {}".format(
+            ",".join(self.types), ",".join(str(_) for _ in self.groups), args.host, args.port,
+            args.rate, args.jitter, args.loss), file=sys.stderr)
+        try:
+            while t_end is None or next_t < t_end:
+                if args.count > 0 and n >= args.count:
+                    break
+                # Wait for the next send time. Sleep for the long part, spin for the last msec
+                while True:
+                    t = time.monotonic()
+                    dt = next_t - t
+                    if dt <= 0:
+                        break
+                    if dt > 0.002:
+                        time.sleep(dt - 0.001)
+                self.fm.update()
+                self.poll_requests(t)
+                if becn_period and t >= becn_t:
+                    self.send("BECN", self.becn_pkt, self.becn_dest)
+                    becn_t += becn_period
+                if self.types:
+                    self.send_type(self.types[n % len(self.types)])
+                    n += 1
+                self.send_rref(t)
+                self.send_rpos(t)
+                if report_t is not None and t >= report_t:
+                    report_t += args.report
+                    self.report(t - t_start)
+                next_t += period
+                if jitter > 0:
+                    next_t += random.uniform(-jitter, jitter)
+        except KeyboardInterrupt:
+            pass
+        self.report(time.monotonic() - t_start)
+
+    def report(self, elapsed_t):
+        total = sum(self.sent[_] for _ in PKT_TYPES)
+        s = ", ".join("{} {}/{}".format(_, self.sent[_], self.lost[_]) for _ in self.sent if self.sent[_] or self.lost[_])
+        print("xplane_sim: {:.1f} s, {:.1f} pps, sent/lost: {}".format(
+            elapsed_t, total / elapsed_t if elapsed_t > 0 else 0, s), file=sys.stderr)
+
+def get_args(argv=None):
+    p = argparse.ArgumentParser(description="Send simulated X-Plane UDP traffic")
+    p.add_argument("--host", default="127.0.0.1", help="destination of the DATA/XGPS/XATT/XTRA packets")
+    p.add_argument("--port", type=int, default=49707, help="destination port (settings.toml: MULTICAST_PORT1)")
+    p.add_argument("--types", default="DATA", help="comma separated: DATA,XGPS,XATT,XTRA (empty: none)")
+    p.add_argument("--groups", default="3,17,20,102", help="comma separated DATA group IDs")
+    p.add_argument("--rate", type=float, default=50, help="packets/sec of DATA/XGPS/XATT/XTRA (the types take turns)")
+    p.add_argument("--jitter", type=float, default=0, help="random deviation of the send time, msec")
+    p.add_argument("--loss", type=float, default=0, help="fraction of the packets not sent (0..1)")
+    p.add_argument("--duration", type=float, default=0, help="seconds to run (0: until Ctrl+C)")
+    p.add_argument("--count", type=int, default=0, help="nr of DATA/XGPS/XATT/XTRA packets to send (0: no limit)")
+    p.add_argument("--becn-host", default=None, help="destination of the beacon (default: --host). X-Plane: " + BECN_GROUP)
+    p.add_argument("--becn-port", type=int, default=BECN_PORT, help="beacon port")
+    p.add_argument("--becn-hz", type=float, default=1, help="beacons/sec (0: no beacon)")
+    p.add_argument("--xp-port", type=int, default=XP_PORT, help="port to receive RREF requests on (0: no RREF)")
+    p.add_argument("--xp-version", type=int, default=120100, help="X-Plane version in the beacon")
+    p.add_argument("--hostname", default="xplane-sim", help="computer name in the beacon")
+    p.add_argument("--bind", default="0.0.0.0", help="address to receive RREF requests on")
+    p.add_argument("--report", type=float, default=5, help="print the counters every nr of seconds (0: only at the end)")
+    p.add_argument("--probe", action="store_true", help="write the send time into DATA group 17, for LATENCY_PROBE=1")
+    p.add_argument("--verbose", action="store_true")
+    args = p.parse_args(argv)
+    if args.rate <= 0:
+        p.error("--rate must be > 0")
+    for _ in args.types.split(","):
+        if _ and _ not in PKT_TYPES:
+            p.error("unknown packet type: {}".format(_))
+    return args
+
+def main(argv=None):
+    XPlaneSim(get_args(argv)).run()
+
+if __name__ == "__main__":
+    main()